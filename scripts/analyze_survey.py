@@ -2,44 +2,115 @@
 """Generate descriptive statistics for the AI Chat Assistants in Scrum survey."""
 
 from pathlib import Path
-from typing import Dict, List, Tuple
+import argparse
+import html
+import os
+import re
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import sys
 import pandas as pd
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from data_processing.data_loader import load_survey_data  # noqa: E402
+from data_processing.bootstrap import (  # noqa: E402
+    BOOTSTRAP_SEED,
+    N_RESAMPLES,
+    bootstrap_cis,
+    bootstrap_job,
+    format_ci,
+)
+from data_processing.crosstabs import SEGMENTS, crosstab_frame, get_crosstabs  # noqa: E402
+from data_processing.frequency_store import (  # noqa: E402
+    frequency_series,
+    get_frequency_store,
+    response_count,
+)
+from data_processing.instrumentation import add_arguments, enable, span, traced  # noqa: E402
+from data_processing.likert_scales import scale_categories, scale_scores  # noqa: E402
+from data_processing.question_catalog import (  # noqa: E402
+    LIKERT,
+    MULTI_SELECT,
+    SINGLE_CHOICE,
+    QuestionCatalog,
+    get_question_catalog,
+)
+
+if TYPE_CHECKING:
+    # Bitmaps, multi-select matrices and the screening are imported where they are used
+    from data_processing.bitmap_index import Bitmap, BitmapIndex
+    from data_processing.multi_select import MultiSelectMatrix
+
 DATA_PATH = ROOT / "data" / "processed" / "merged_survey_data.xlsx"
 OUTPUT_DIR = ROOT / "outputs"
 OUTPUT_MD = OUTPUT_DIR / "descriptive_stats.md"
+# Segment report paths under OUTPUT_DIR; {segment} and {level} are file-name-safe
+DEFAULT_LAYOUT = "segments/{segment}/{level}.{ext}"
+SCALE_BLOCKS = ["093-095", "098-102", "106-109"]
 
 
 def load_data(path: Path) -> pd.DataFrame:
-    """Load the merged survey data."""
-    df = pd.read_excel(path, engine="openpyxl")
-    return df
+    """Load the merged survey data, using the columnar cache when fresh."""
+    return load_survey_data(str(path))
 
 
-def value_table(series: pd.Series, total: int) -> List[Dict[str, str]]:
-    """Create frequency table for a categorical variable."""
-    counts = series.value_counts(dropna=False)
+def value_table(counts: pd.Series, total: int, ci: Optional[Dict] = None) -> List[Dict[str, str]]:
+    """Create frequency table from answer counts (missing included under NaN)."""
     rows = []
-    for value, count in counts.items():
+    for i, (value, count) in enumerate(counts.items()):
         label = "Missing/No answer" if pd.isna(value) else str(value).strip()
         percent = (count / total) * 100 if total else 0
-        rows.append({
+        row = {
             "response": label,
             "count": int(count),
             "percent": f"{percent:.1f}%",
-        })
+        }
+        if ci and "pct_low" in ci:
+            row["ci"] = format_ci(ci["pct_low"][i], ci["pct_high"][i])
+        rows.append(row)
     return rows
 
 
+def question_counts(
+    col: str,
+    store: Dict,
+    matrices: Dict[str, "MultiSelectMatrix"],
+    total: int,
+) -> pd.Series:
+    """Answer counts with missing under NaN; multi-select questions per option."""
+    if col not in matrices:
+        return frequency_series(store, col, dropna=False)
+    
+    matrix = matrices[col]
+    counts = matrix.counts()
+    missing = total - matrix.respondents()
+    if missing:
+        counts = pd.concat([counts, pd.Series([missing], index=[float("nan")], dtype="int64")])
+    return counts.sort_values(ascending=False, kind="stable")
+
+
 def format_markdown_table(rows: List[Dict[str, str]]) -> str:
     """Format rows as markdown table."""
+    if rows and "ci" in rows[0]:
+        lines = ["| Response | Count | Percent | 95% CI |", "| --- | ---: | ---: | ---: |"]
+        for row in rows:
+            lines.append(f"| {row['response']} | {row['count']} | {row['percent']} | {row['ci']} |")
+        return "\n".join(lines)
+    
     lines = ["| Response | Count | Percent |", "| --- | ---: | ---: |"]
     for row in rows:
         lines.append(f"| {row['response']} | {row['count']} | {row['percent']} |")
     return "\n".join(lines)
 
 
+def mean_label(ci: Optional[Dict]) -> str:
+    """'3.42 [3.21–3.60]' label of a bootstrapped mean score."""
+    if not ci or "mean" not in ci:
+        return "–"
+    return f"{ci['mean']:.2f} " + format_ci(ci["mean_low"], ci["mean_high"], digits=2, unit="")
+
+
 def get_column_short_name(col: str) -> str:
     """Extract short name from long column name."""
     if '[' in col and ']' in col:
@@ -54,170 +125,537 @@ def get_column_short_name(col: str) -> str:
     return short[:80] + '...' if len(short) > 80 else short
 
 
-def build_report(df: pd.DataFrame) -> str:
-    """Build comprehensive markdown report."""
+def scale_table(
+    cols: List[str],
+    label: str,
+    store: Dict,
+    catalog: QuestionCatalog,
+    width: Optional[int] = None,
+    top: Optional[List[str]] = None,
+    cis: Optional[Dict] = None,
+) -> List[str]:
+    """Markdown table of answer counts in scale order, one row per item of a block."""
+    if not cols:
+        return []
+    categories = scale_categories(catalog.entry(cols[0])["scale"])
+    if categories is None:
+        return []
+    
+    header = f"| {label} | " + " | ".join(categories) + " | n |"
+    align = "| --- | " + " | ".join("---:" for _ in categories) + " | ---: |"
+    if cis is not None:
+        header += " Mean score (95% CI) |"
+        align += " ---: |"
+    if top:
+        header += f" % {' or '.join(top)} |"
+        align += " ---: |"
+    lines = [header, align]
+    
+    for col in cols:
+        name = get_column_short_name(col)
+        if width is not None and len(name) > width:
+            name = name[:width] + "..."
+        # Scale order; folded case variants are already merged at load time
+        counts = frequency_series(store, col).reindex(categories, fill_value=0)
+        total_valid = response_count(store, col)
+        row = f"| {name} | " + " | ".join(str(int(c)) for c in counts) + f" | {total_valid} |"
+        if cis is not None:
+            row += f" {mean_label(cis.get(('scale', col)))} |"
+        if top:
+            share = counts[top].sum() / total_valid * 100 if total_valid > 0 else 0
+            row += f" {share:.1f}% |"
+        lines.append(row)
+    
+    lines.append("")
+    return lines
+
+
+def segment_frames(crosstabs: Dict, question: str, max_levels: int = 10):
+    """(segment, table of the largest levels, level sizes) for every segment with answers."""
+    for segment in crosstabs["segments"]:
+        frame = crosstab_frame(crosstabs, segment, question)
+        frame = frame[frame.sum(axis=1) > 0]
+        if frame.empty:
+            continue
+        n = frame.sum(axis=1).sort_values(ascending=False, kind="stable")
+        yield segment, frame.loc[n.index[:max_levels]], n
+
+
+def segment_tables(
+    crosstabs: Dict,
+    question: str,
+    max_levels: int = 10,
+    cis: Optional[Dict] = None,
+) -> List[str]:
+    """Markdown tables of one question broken down by every segment (largest levels first)."""
+    lines: List[str] = []
+    for segment, frame, n in segment_frames(crosstabs, question, max_levels):
+        lines.append(f"### By {segment}")
+        lines.append("")
+        mean_header = " Mean score (95% CI) |" if cis is not None else ""
+        lines.append(f"| {segment} | " + " | ".join(frame.columns) + " | n |" + mean_header)
+        lines.append("| --- | " + " | ".join("---:" for _ in frame.columns) + " | ---: |"
+                     + (" ---: |" if cis is not None else ""))
+        for level, counts in frame.iterrows():
+            row = f"| {level} | " + " | ".join(str(int(c)) for c in counts) + f" | {int(n[level])} |"
+            if cis is not None:
+                row += f" {mean_label(cis.get(('segment', segment, question, level)))} |"
+            lines.append(row)
+        if len(n) > max_levels:
+            lines.append(f"_... and {len(n) - max_levels} more_")
+        lines.append("")
+    return lines
+
+
+class ReportStats(NamedTuple):
+    """Counts and bootstrap CIs behind one report: the whole sample or one segment level."""
+    segment: Optional[Tuple[str, str]]
+    total: int
+    total_questions: int
+    store: Dict
+    crosstabs: Dict
+    question_table: Dict[str, pd.Series]
+    multi_select: List[str]
+    cis: Dict
+    catalog: QuestionCatalog
+
+
+def report_questions(catalog: QuestionCatalog) -> Tuple[List[str], List[str], Optional[str]]:
+    """(demographic, AI usage, usage frequency) questions shown by the report."""
+    demographic = catalog.columns(group="Demographics", qtype=[SINGLE_CHOICE, MULTI_SELECT])
+    ai_usage = catalog.columns(group="AI Usage", qtype=[SINGLE_CHOICE, MULTI_SELECT, LIKERT])[:5]
+    return demographic, ai_usage, catalog.column("020")
+
+
+def population_jobs(
+    store: Dict,
+    catalog: QuestionCatalog,
+    crosstabs: Dict,
+    matrices: Dict[str, "MultiSelectMatrix"],
+    total: int,
+) -> Tuple[Dict[str, pd.Series], Dict]:
+    """Question tables and bootstrap jobs of one population."""
+    demographic, ai_usage, usage_col = report_questions(catalog)
+    question_table = {col: question_counts(col, store, matrices, total) for col in demographic + ai_usage}
+    jobs = {("pct", col): bootstrap_job(counts.to_numpy(), n=total, exclusive=col not in matrices)
+            for col, counts in question_table.items()}
+    for block in SCALE_BLOCKS:
+        for col in catalog.columns(block=block):
+            scale = catalog.entry(col)["scale"]
+            counts = frequency_series(store, col)
+            jobs[("scale", col)] = bootstrap_job(counts.to_numpy(), scores=scale_scores(counts.index, scale))
+    if usage_col in crosstabs["questions"]:
+        usage_scale = catalog.entry(usage_col)["scale"]
+        for segment, frame, _ in segment_frames(crosstabs, usage_col):
+            scores = scale_scores(frame.columns, usage_scale)
+            for level, counts in frame.iterrows():
+                jobs[("segment", segment, usage_col, level)] = bootstrap_job(counts.to_numpy(), scores=scores)
+    return question_table, jobs
+
+
+def level_bitmaps(index: "BitmapIndex", crosstabs: Dict) -> Dict[Tuple[str, str], "Bitmap"]:
+    """Respondents of every level of every segment."""
+    bitmaps = {}
+    for name, segment in crosstabs["segments"].items():
+        for label in segment["labels"]:
+            try:
+                bitmaps[(name, label)] = index.where(segment["column"], label)
+            except KeyError:
+                # Scale categories nobody chose
+                bitmaps[(name, label)] = ~index.all()
+    return bitmaps
+
+
+def segment_crosstabs(
+    crosstabs: Dict,
+    index: "BitmapIndex",
+    levels: Dict[Tuple[str, str], "Bitmap"],
+    question: str,
+    selection: "Bitmap",
+    exclude: Optional[str],
+) -> Dict:
+    """Crosstabs of one question restricted to the selected respondents (``exclude`` segment left out)."""
+    restricted = {"total_rows": selection.count(), "segments": {}, "tables": {}, "questions": {}}
+    if question not in crosstabs["questions"]:
+        return restricted
+    labels = crosstabs["questions"][question]["labels"]
+    restricted["questions"][question] = {"labels": labels}
+    for name, segment in crosstabs["segments"].items():
+        if name == exclude:
+            continue
+        counts, answers = index.crosstab(question, [levels[(name, label)] for label in segment["labels"]], selection)
+        restricted["segments"][name] = segment
+        restricted["tables"][name] = {
+            question: pd.DataFrame(counts, columns=answers).reindex(columns=labels, fill_value=0).to_numpy().tolist()
+        }
+    return restricted
+
+
+@traced()
+def compute_report_stats(
+    df: pd.DataFrame,
+    store: Optional[Dict] = None,
+    catalog: Optional[QuestionCatalog] = None,
+    crosstabs: Optional[Dict] = None,
+    segments: Sequence[str] = (),
+    min_responses: int = 1,
+    workers: int = 1,
+    data_path: Path = DATA_PATH,
+    screen: Optional["Bitmap"] = None,
+) -> Dict[Optional[Tuple[str, str]], ReportStats]:
+    """Count the tables of every report and bootstrap all their CIs in one batch."""
+    from data_processing.bitmap_index import get_bitmap_index
+    from data_processing.multi_select import build_multi_select_matrices
+
     total = len(df)
+    if store is None:
+        store = get_frequency_store(df, data_path=str(data_path))
+    if catalog is None:
+        catalog = get_question_catalog(df, data_path=str(data_path))
+    if crosstabs is None:
+        crosstabs = get_crosstabs(df, catalog, data_path=str(data_path))
+    populations = {None: (store, crosstabs, build_multi_select_matrices(df, catalog), total)}
+    
+    if segments or screen is not None:
+        index = get_bitmap_index(df, catalog, data_path=str(data_path))
+        demographic, ai_usage, usage_col = report_questions(catalog)
+        columns = ["source"] + demographic + ai_usage + [col for block in SCALE_BLOCKS
+                                                         for col in catalog.columns(block=block)]
+        levels = level_bitmaps(index, crosstabs)
+        if screen is not None:
+            populations[None] = (
+                index.frequency_store(screen, columns),
+                segment_crosstabs(crosstabs, index, levels, usage_col, screen, exclude=None),
+                index.multi_select_matrices(screen),
+                screen.count(),
+            )
+        with span("count segments") as counting:
+            for name in segments:
+                for label in crosstabs["segments"][name]["labels"]:
+                    selection = levels[(name, label)]
+                    if screen is not None:
+                        selection = selection & screen
+                    n = selection.count()
+                    if n < min_responses:
+                        continue
+                    populations[(name, label)] = (
+                        index.frequency_store(selection, columns),
+                        segment_crosstabs(crosstabs, index, levels, usage_col, selection, exclude=name),
+                        index.multi_select_matrices(selection),
+                        n,
+                    )
+            counting.set(populations=len(populations) - 1)
+    
+    # Collect every table of every population, then bootstrap them all at once
+    with span("collect bootstrap jobs"):
+        tables = {}
+        jobs = {}
+        for key, (pop_store, pop_crosstabs, matrices, n) in populations.items():
+            tables[key], pop_jobs = population_jobs(pop_store, catalog, pop_crosstabs, matrices, n)
+            jobs.update(((key, job_key), job) for job_key, job in pop_jobs.items())
+    cis = {key: {} for key in populations}
+    for (key, job_key), result in bootstrap_cis(jobs, workers=workers).items():
+        cis[key][job_key] = result
+    
+    return {
+        key: ReportStats(key, n, len(df.columns) - 1, pop_store, pop_crosstabs, tables[key],
+                         list(matrices), cis[key], catalog)
+        for key, (pop_store, pop_crosstabs, matrices, n) in populations.items()
+    }
+
+
+@traced()
+def render_report(stats: ReportStats) -> str:
+    """Markdown report of one population from its precomputed statistics."""
+    total = stats.total
+    store = stats.store
+    catalog = stats.catalog
+    cis = stats.cis
+    question_table = stats.question_table
+    demographic_questions, ai_usage_questions, usage_col = report_questions(catalog)
+    multi_select_note = "_Multiple selections allowed: counts are per option, so percentages do not add up to 100%._"
     
     # Count responses by source
-    source_counts = df['source'].value_counts()
+    source_counts = frequency_series(store, 'source')
     
+    title = "# Descriptive Statistics"
+    if stats.segment is not None:
+        title += f": {stats.segment[0]} = {stats.segment[1]}"
     lines: List[str] = [
-        "# Descriptive Statistics",
+        title,
         "",
         "## Survey Overview",
         "",
         f"- **Total responses**: {total}",
-        f"- **Survey 1 (respostas)**: {source_counts.get('Survey 1 (respostas)', 0)} ({source_counts.get('Survey 1 (respostas)', 0)/total*100:.1f}%)",
-        f"- **Survey 2 (Udemy)**: {source_counts.get('Survey 2 (Udemy)', 0)} ({source_counts.get('Survey 2 (Udemy)', 0)/total*100:.1f}%)",
-        f"- **Total questions**: {len(df.columns) - 1}",  # Excluding source
+    ]
+    # One line per source workbook in the store, in name order
+    for source, count in source_counts.sort_index().items():
+        lines.append(f"- **{source}**: {count} ({count/total*100:.1f}%)")
+    lines += [
+        f"- **Total questions**: {stats.total_questions}",  # Excluding source
         "",
     ]
     
     # Demographics
-    lines.append("## Demographics and Background")
-    lines.append("")
-    
-    demographic_questions = [
-        col for col in df.columns 
-        if any(x in col.lower() for x in ['role', 'experience', 'team size', 'industry', 'country', 'age'])
-    ]
-    
-    for col in demographic_questions:  # Limit to first 10
-        if col in ['Carimbo de data/hora', 'source']:
-            continue
-        
-        short_name = get_column_short_name(col)
-        lines.append(f"### {short_name}")
+    with span("section Demographics"):
+        lines.append("## Demographics and Background")
         lines.append("")
         
-        rows = value_table(df[col], total)
-        lines.append(format_markdown_table(rows[:10]))  # Top 10 responses
+        for col in demographic_questions:
+            short_name = get_column_short_name(col)
+            lines.append(f"### {short_name}")
+            lines.append("")
+            
+            rows = value_table(question_table[col], total, cis[("pct", col)])
+            lines.append(format_markdown_table(rows[:10]))  # Top 10 responses
+            if col in stats.multi_select:
+                lines.append("")
+                lines.append(multi_select_note)
         
     
     # AI Usage
-    lines.append("## AI Chat Assistant Usage")
-    lines.append("")
-    
-    ai_usage_questions = [
-        col for col in df.columns 
-        if any(x in col.lower() for x in ['which ai', 'how often', 'frequency'])
-    ]
-    
-    for col in ai_usage_questions[:5]:
-        short_name = get_column_short_name(col)
-        lines.append(f"### {short_name}")
+    with span("section AI usage"):
+        lines.append("## AI Chat Assistant Usage")
         lines.append("")
         
-        rows = value_table(df[col], total)
-        lines.append(format_markdown_table(rows[:15]))  # Top 15 responses
-        
-        if len(rows) > 15:
-            lines.append(f"_... and {len(rows) - 15} more responses_")
-        lines.append("")
-    
-    # Helpfulness ratings
-    lines.append("## Helpfulness of AI Chat Assistants by Role")
-    lines.append("")
-    
-    helpfulness_cols = [
-        col for col in df.columns 
-        if 'helpful' in col.lower() and 'scrum accountabilities' in col.lower()
-    ]
-    
-    if helpfulness_cols:
-        lines.append("| Role | Not at all helpful | Slightly helpful | Moderately helpful | Very helpful | Extremely helpful | n |")
-        lines.append("| --- | ---: | ---: | ---: | ---: | ---: | ---: |")
-        
-        for col in helpfulness_cols:
-            role_name = get_column_short_name(col)
-            counts = df[col].value_counts()
-            total_valid = df[col].notna().sum()
+        for col in ai_usage_questions:
+            short_name = get_column_short_name(col)
+            lines.append(f"### {short_name}")
+            lines.append("")
             
-            not_helpful = counts.get('Not at all helpful', 0)
-            slightly = counts.get('Slightly helpful', 0)
-            moderately = counts.get('Moderately helpful', 0)
-            very = counts.get('Very helpful', 0)
-            extremely = counts.get('Extremely helpful', 0)
+            rows = value_table(question_table[col], total, cis[("pct", col)])
+            lines.append(format_markdown_table(rows[:15]))  # Top 15 responses
             
-            lines.append(f"| {role_name} | {not_helpful} | {slightly} | {moderately} | {very} | {extremely} | {total_valid} |")
-        
-        lines.append("")
+            if len(rows) > 15:
+                lines.append(f"_... and {len(rows) - 15} more responses_")
+            if col in stats.multi_select:
+                lines.append("")
+                lines.append(multi_select_note)
+            lines.append("")
     
-    # Benefits
-    lines.append("## Perceived Benefits")
-    lines.append("")
+    # Usage frequency broken down by segment (from the crosstab cache)
+    with span("section Usage by segment"):
+        if usage_col in stats.crosstabs["questions"]:
+            lines.append("## AI Chat Assistant Usage Frequency by Segment")
+            lines.append("")
+            lines.extend(segment_tables(stats.crosstabs, usage_col, cis=cis))
     
-    benefit_cols = [
-        col for col in df.columns 
-        if 'benefit' in col.lower() and 'agree' in col.lower()
-    ]
+    # Helpfulness ratings
+    with span("section Helpfulness"):
+        lines.append("## Helpfulness of AI Chat Assistants by Role")
+        lines.append("")
+        lines.extend(scale_table(catalog.columns(block="093-095"), "Role", store, catalog, cis=cis))
     
-    if benefit_cols:
-        lines.append("| Statement | Strongly Disagree | Disagree | Neutral | Agree | Strongly Agree | n |")
-        lines.append("| --- | ---: | ---: | ---: | ---: | ---: | ---: |")
-        
-        for col in benefit_cols[:5]:
-            statement = get_column_short_name(col)
-            counts = df[col].value_counts()
-            total_valid = df[col].notna().sum()
-            
-            sd = counts.get('Strongly Disagree', 0) + counts.get('Strongly disagree', 0)
-            d = counts.get('Disagree', 0)
-            n = counts.get('Neutral', 0)
-            a = counts.get('Agree', 0)
-            sa = counts.get('Strongly Agree', 0) + counts.get('Strongly agree', 0)
-            
-            lines.append(f"| {statement[:60]}... | {sd} | {d} | {n} | {a} | {sa} | {total_valid} |")
-        
+    # Benefits
+    with span("section Benefits"):
+        lines.append("## Perceived Benefits")
         lines.append("")
+        lines.extend(scale_table(catalog.columns(block="098-102"), "Statement", store, catalog, width=60,
+                                 cis=cis))
     
     # Risks
-    lines.append("## Perceived Risks of Intensive Use")
-    lines.append("")
-    
-    risk_cols = [
-        col for col in df.columns 
-        if 'intensive use' in col.lower() and 'could cause' in col.lower()
-    ]
-    
-    if risk_cols:
-        lines.append("| Risk | Yes | No | Maybe | n | % Yes |")
-        lines.append("| --- | ---: | ---: | ---: | ---: | ---: |")
-        
-        for col in risk_cols:
-            risk_name = get_column_short_name(col)
-            counts = df[col].value_counts()
-            total_valid = df[col].notna().sum()
-            
-            yes = counts.get('Yes', 0)
-            no = counts.get('No', 0)
-            maybe = counts.get('Maybe', 0)
-            pct_yes = (yes / total_valid * 100) if total_valid > 0 else 0
-            
-            lines.append(f"| {risk_name[:50]}... | {yes} | {no} | {maybe} | {total_valid} | {pct_yes:.1f}% |")
-        
+    with span("section Risks"):
+        lines.append("## Perceived Risks of Intensive Use")
         lines.append("")
+        lines.extend(scale_table(catalog.columns(block="106-109"), "Risk", store, catalog,
+                                 width=50, top=["Agree", "Strongly Agree"], cis=cis))
     
     # Footer
     lines.append("---")
     lines.append("")
     lines.append(f"_All percentages are calculated over the {total} total responses._")
     lines.append(f"_Tables show frequency distributions. Missing/No answer responses are included in totals._")
+    lines.append(f"_95% CIs are percentile bootstrap intervals ({N_RESAMPLES} resamples, seed {BOOTSTRAP_SEED}); "
+                 f"mean scores rank each scale from 1 (lowest answer), excluding Not Applicable._")
     lines.append("")
     lines.append(f"**Generated from**: `{DATA_PATH.name}`")
     
     return "\n".join(lines)
 
 
-def main(data_path: Path = DATA_PATH, output_path: Path = OUTPUT_MD) -> None:
+@traced()
+def build_report(
+    df: pd.DataFrame,
+    store: Optional[Dict] = None,
+    catalog: Optional[QuestionCatalog] = None,
+    crosstabs: Optional[Dict] = None,
+    workers: int = 1,
+) -> str:
+    """Build comprehensive markdown report from the shared frequency store."""
+    stats = compute_report_stats(df, store, catalog, crosstabs, workers=workers)
+    return render_report(stats[None])
+
+
+def _inline_html(text: str) -> str:
+    text = html.escape(text, quote=False)
+    text = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", text)
+    return re.sub(r"`(.+?)`", r"<code>\1</code>", text)
+
+
+def markdown_to_html(markdown: str) -> str:
+    """Standalone HTML page of a report (covers the markdown the reports use)."""
+    body: List[str] = []
+    table: List[List[str]] = []
+    align: List[str] = []
+    items: List[str] = []
+    
+    def cells(row: List[str], tag: str) -> str:
+        return "".join(f'<{tag}{" style=text-align:right" if i < len(align) and align[i] == "right" else ""}>'
+                       f"{_inline_html(cell)}</{tag}>" for i, cell in enumerate(row))
+    
+    def flush() -> None:
+        if table:
+            body.append("<table>\n<thead><tr>" + cells(table[0], "th") + "</tr></thead>\n<tbody>\n"
+                        + "\n".join("<tr>" + cells(row, "td") + "</tr>" for row in table[1:]) + "\n</tbody>\n</table>")
+            table.clear()
+            align.clear()
+        if items:
+            body.append("<ul>\n" + "\n".join(f"<li>{_inline_html(item)}</li>" for item in items) + "\n</ul>")
+            items.clear()
+    
+    for line in markdown.splitlines():
+        if line.startswith("|"):
+            row = [cell.strip() for cell in line.strip().strip("|").split("|")]
+            if table and not align and all(set(cell) <= set("-:") for cell in row):
+                align.extend("right" if cell.endswith(":") else "left" for cell in row)
+            else:
+                table.append(row)
+            continue
+        if line.startswith("- "):
+            items.append(line[2:])
+            continue
+        flush()
+        heading = re.match(r"(#{1,6}) (.*)", line)
+        if heading:
+            level = len(heading.group(1))
+            body.append(f"<h{level}>{_inline_html(heading.group(2))}</h{level}>")
+        elif line == "---":
+            body.append("<hr>")
+        elif line.startswith("_") and line.endswith("_") and len(line) > 1:
+            body.append(f"<p><em>{_inline_html(line[1:-1])}</em></p>")
+        elif line.strip():
+            body.append(f"<p>{_inline_html(line)}</p>")
+    flush()
+    
+    title = markdown.splitlines()[0].lstrip("# ") if markdown else "Descriptive Statistics"
+    return ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+            f"<title>{html.escape(title)}</title>\n"
+            "<style>body{font-family:sans-serif;max-width:60em;margin:auto}"
+            "table{border-collapse:collapse;margin-bottom:1em}th,td{border:1px solid #ccc;padding:2px 6px}</style>\n"
+            "</head>\n<body>\n" + "\n".join(body) + "\n</body>\n</html>\n")
+
+
+def slugify(text: str) -> str:
+    """File-name-safe form of a segment name or level."""
+    return re.sub(r"[^\w]+", "-", str(text).strip().lower()).strip("-") or "blank"
+
+
+def segment_report_paths(
+    stats: Dict[Optional[Tuple[str, str]], ReportStats],
+    layout: str = DEFAULT_LAYOUT,
+    formats: Sequence[str] = ("md",),
+) -> List[Tuple[ReportStats, Path, str]]:
+    """(statistics, output path, format) of every segment report."""
+    tasks = []
+    used = set()
+    for key, population in stats.items():
+        if key is None:
+            continue
+        for fmt in formats:
+            path = OUTPUT_DIR / layout.format(segment=slugify(key[0]), level=slugify(key[1]), ext=fmt)
+            base, suffix = path, 2
+            while path in used:
+                path = base.with_name(f"{base.stem}-{suffix}{base.suffix}")
+                suffix += 1
+            used.add(path)
+            tasks.append((population, path, fmt))
+    return tasks
+
+
+def render_to_file(task: Tuple[ReportStats, Path, str]) -> Path:
+    """Worker entry point: render one report and write it."""
+    stats, path, fmt = task
+    report = render_report(stats)
+    if fmt == "html":
+        report = markdown_to_html(report)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(report, encoding="utf-8")
+    return path
+
+
+@traced()
+def write_segment_reports(
+    stats: Dict[Optional[Tuple[str, str]], ReportStats],
+    layout: str = DEFAULT_LAYOUT,
+    formats: Sequence[str] = ("md",),
+    workers: int = 1,
+) -> List[Path]:
+    """Render every segment report concurrently (``workers`` processes, 0 = one per CPU)."""
+    tasks = segment_report_paths(stats, layout, formats)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(render_to_file, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    return [render_to_file(task) for task in tasks]
+
+
+@traced()
+def main(
+    data_path: Path = DATA_PATH,
+    output_path: Path = OUTPUT_MD,
+    workers: int = 1,
+    segments: Sequence[str] = (),
+    layout: str = DEFAULT_LAYOUT,
+    formats: Sequence[str] = ("md",),
+    min_responses: int = 1,
+    exclude_flagged: bool = False,
+) -> None:
     """Main execution function."""
     df = load_data(data_path)
     OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
-    report = build_report(df)
-    output_path.write_text(report, encoding="utf-8")
+    store = get_frequency_store(df, data_path=str(data_path))
+    catalog = get_question_catalog(df, data_path=str(data_path))
+    crosstabs = get_crosstabs(df, catalog, data_path=str(data_path))
+    screen = None
+    if exclude_flagged:
+        from data_processing.quality_screening import kept_respondents
+
+        screen = kept_respondents(str(data_path))
+    stats = compute_report_stats(df, store, catalog, crosstabs, segments=segments,
+                                 min_responses=min_responses, workers=workers, data_path=data_path, screen=screen)
+    output_path.write_text(render_report(stats[None]), encoding="utf-8")
     print(f"✓ Saved descriptive statistics to {output_path.relative_to(ROOT)}")
-    print(f"  Total responses analyzed: {len(df)}")
+    print(f"  Total responses analyzed: {stats[None].total}"
+          + (f" ({len(df) - stats[None].total} flagged responses excluded)" if exclude_flagged else ""))
+    if segments:
+        written = write_segment_reports(stats, layout, formats, workers=workers)
+        print(f"✓ Saved {len(written)} segment reports ({len(stats) - 1} segment levels) under "
+              f"{OUTPUT_DIR.relative_to(ROOT)}/")
 
 
 if __name__ == "__main__":
-    main()
+    segment_names = [name for name, _ in SEGMENTS]
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes for bootstrap resampling and report rendering "
+                             "(0 = one per CPU; default: 1)")
+    parser.add_argument("--segments", nargs="+", metavar="SEGMENT", choices=segment_names + ["all"], default=[],
+                        help=f"also write one report per level of these segments ({', '.join(segment_names)}, or all)")
+    parser.add_argument("--layout", default=DEFAULT_LAYOUT,
+                        help=f"segment report path under outputs/, with {{segment}}, {{level}} and {{ext}} "
+                             f"(default: {DEFAULT_LAYOUT})")
+    parser.add_argument("--format", dest="formats", nargs="+", choices=["md", "html"], default=["md"],
+                        help="segment report formats (default: md)")
+    parser.add_argument("--min-responses", type=int, default=1,
+                        help="skip segment levels with fewer respondents (default: 1)")
+    parser.add_argument("--exclude-flagged", action="store_true",
+                        help="leave out respondents flagged by the quality screening")
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+    segments = segment_names if "all" in args.segments else args.segments
+    main(workers=args.jobs, segments=segments, layout=args.layout, formats=args.formats,
+         min_responses=args.min_responses, exclude_flagged=args.exclude_flagged)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Time the analysis pipeline on synthetic surveys of increasing size."""
+
+from pathlib import Path
+import argparse
+from datetime import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from data_processing.memory_usage import peak_rss_mb  # noqa: E402
+from data_processing.synthetic_data import SYNTHETIC_SEED, generate_raw_exports  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+RESULTS_DIR = ROOT / "outputs" / "benchmarks"
+MERGED = "data/processed/merged_survey_data.xlsx"
+
+# Slower than the baseline by more than this factor is reported as a regression
+REGRESSION_RATIO = 1.2
+
+
+def run_merge(jobs: int) -> None:
+    from data_processing.merge_datasets import merge_survey_data
+    merge_survey_data(jobs=jobs)
+
+
+def run_frequency_tables(jobs: int) -> None:
+    from data_processing.descriptive_analysis import create_frequency_tables
+    create_frequency_tables()
+
+
+def run_build_report(jobs: int) -> float:
+    """Load the report inputs, then time ``build_report`` alone."""
+    import analyze_survey
+    from data_processing.crosstabs import get_crosstabs
+    from data_processing.data_loader import load_survey_data
+    from data_processing.frequency_store import get_frequency_store
+    from data_processing.question_catalog import get_question_catalog
+
+    df = load_survey_data(MERGED)
+    store = get_frequency_store(df, data_path=MERGED)
+    catalog = get_question_catalog(df, data_path=MERGED)
+    crosstabs = get_crosstabs(df, catalog, data_path=MERGED)
+    start = time.perf_counter()
+    analyze_survey.build_report(df, store, catalog, crosstabs, workers=jobs)
+    return time.perf_counter() - start
+
+
+def run_visualizations(jobs: int) -> None:
+    from visualization.create_plots import create_all_visualizations
+    create_all_visualizations(jobs=jobs, force=True)
+
+
+def run_summary_report(jobs: int) -> None:
+    from generate_summary_report import generate_summary_report
+    generate_summary_report()
+
+
+# Stage name -> runner; a runner may return its own timed section in seconds
+STAGES: Dict[str, Callable[[int], Optional[float]]] = {
+    "merge_survey_data": run_merge,
+    "create_frequency_tables": run_frequency_tables,
+    "build_report": run_build_report,
+    "create_all_visualizations": run_visualizations,
+    "generate_summary_report": run_summary_report,
+}
+
+
+def _round_mb(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+def _stage_worker(name: str, workdir: str, jobs: int, log_path: str, queue) -> None:
+    """Run one stage in a fresh process and report its time and memory."""
+    os.chdir(workdir)
+    with open(log_path, "a", encoding="utf-8") as log:
+        # At the descriptor level so worker pools of the stage log there too
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        print(f"--- {name} ---", flush=True)
+        rss_start = peak_rss_mb()
+        start = time.perf_counter()
+        timed = STAGES[name](jobs)
+        seconds = time.perf_counter() - start
+        queue.put({
+            "seconds": round(timed if timed is not None else seconds, 4),
+            "stage_seconds": round(seconds, 4),
+            "peak_rss_mb": _round_mb(peak_rss_mb()),
+            "start_rss_mb": _round_mb(rss_start),
+        })
+        sys.stdout.flush()
+
+
+def run_stage(name: str, workdir: Path, jobs: int, log_path: Path) -> Dict:
+    """Run a stage in a freshly spawned process so its peak RSS is its own."""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_stage_worker, args=(name, str(workdir), jobs, str(log_path), queue))
+    process.start()
+    process.join()
+    result = queue.get(timeout=5) if process.exitcode == 0 else None
+    if process.exitcode != 0 or result is None:
+        raise RuntimeError(f"stage {name} failed (exit code {process.exitcode}); see {log_path}")
+    return result
+
+
+def prepare_workspace(workdir: Path, rows: int, seed: int) -> float:
+    """Lay out data/ and outputs/ and write the synthetic raw exports."""
+    for sub in ("data/raw", "data/processed", "outputs/plots"):
+        (workdir / sub).mkdir(parents=True, exist_ok=True)
+    cwd = os.getcwd()
+    # The real exports are the model for the synthetic ones
+    os.chdir(ROOT)
+    try:
+        start = time.perf_counter()
+        generate_raw_exports(rows, str(workdir / "data" / "raw"), seed)
+        return time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+
+
+def benchmark_size(rows: int, stages: List[str], workdir: Path, jobs: int, seed: int) -> Dict:
+    """Generate one synthetic survey and time every stage on it."""
+    print(f"\n=== {rows:,} rows ===")
+    generate_seconds = prepare_workspace(workdir, rows, seed)
+    results = {}
+    for name in stages:
+        result = run_stage(name, workdir, jobs, workdir / "benchmark.log")
+        result["rows_per_sec"] = round(rows / result["seconds"], 1) if result["seconds"] else None
+        results[name] = result
+        print(f"  {name:<28} {result['seconds']:9.2f}s  peak RSS {result['peak_rss_mb'] or 0:8.1f} MB")
+    return {"rows": rows, "generate_seconds": round(generate_seconds, 4), "stages": results}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current: Dict, baseline: Dict) -> List[str]:
+    """Per-stage time ratios against a previous results file."""
+    previous = {(run["rows"], name): stage
+                for run in baseline["runs"] for name, stage in run["stages"].items()}
+    lines = [f"Compared with {baseline.get('commit') or 'baseline'} ({baseline.get('created', '?')}):"]
+    for run in current["runs"]:
+        for name, stage in run["stages"].items():
+            old = previous.get((run["rows"], name))
+            if not old or not old["seconds"]:
+                continue
+            ratio = stage["seconds"] / old["seconds"]
+            flag = "  ⚠ regression" if ratio > REGRESSION_RATIO else ""
+            lines.append(f"  {run['rows']:>9,} {name:<28} {old['seconds']:9.2f}s -> "
+                         f"{stage['seconds']:9.2f}s  x{ratio:.2f}{flag}")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="synthetic survey sizes in rows (default: 10000 100000 1000000)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES),
+                        help="stages to time, in pipeline order (default: all)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes passed to the report and plot stages (default: 1)")
+    parser.add_argument("--seed", type=int, default=SYNTHETIC_SEED, help="synthetic data seed")
+    parser.add_argument("--workdir", type=Path,
+                        help="keep the synthetic workspaces here (default: a temporary directory)")
+    parser.add_argument("--output", type=Path,
+                        help="results file (default: outputs/benchmarks/benchmark_<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    stages = [name for name in STAGES if name in args.stages]
+    if stages[0] != "merge_survey_data":
+        parser.error("later stages read the merged dataset, so merge_survey_data must be included")
+
+    created = datetime.now()
+    output = args.output or RESULTS_DIR / f"benchmark_{created:%Y%m%d-%H%M%S}.json"
+    root = args.workdir or Path(tempfile.mkdtemp(prefix="survey-benchmark-"))
+
+    results = {
+        "created": created.isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "jobs": args.jobs,
+        "seed": args.seed,
+        "runs": [],
+    }
+    try:
+        for rows in args.sizes:
+            results["runs"].append(benchmark_size(rows, stages, root / f"rows_{rows}", args.jobs, args.seed))
+            # Written after every size so a long run keeps its finished sizes
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(f"\n✓ Saved benchmark results to {output}")
+    if args.baseline:
+        print("\n".join(compare_results(results, json.loads(args.baseline.read_text(encoding="utf-8")))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Check that the entry points start fast and import no plotting or workbook libraries."""
+
+from pathlib import Path
+import argparse
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Libraries only the drawing and workbook-writing code paths may import
+HEAVY_MODULES = ("matplotlib", "seaborn", "openpyxl", "scipy")
+# Imported by every stage; their time is not charged to the entry point
+BASE_MODULES = ("pandas", "numpy")
+
+# Entry module -> import overhead budget (ms) on top of pandas and numpy
+IMPORT_BUDGETS: Dict[str, float] = {
+    "analyze_survey": 150.0,
+    "generate_summary_report": 150.0,
+    "visualization.create_plots": 150.0,
+    "data_processing.descriptive_analysis": 150.0,
+    "data_processing.merge_datasets": 150.0,
+}
+
+
+def import_trace(module: str) -> List[Tuple[str, int, int]]:
+    """(module, nesting depth, cumulative us) of every import made by ``import module``."""
+    code = f"import sys; sys.path[:0] = [{str(ROOT / 'src')!r}, {str(ROOT / 'scripts')!r}]; import {module}"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    trace = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        trace.append((name.strip(), depth, int(cumulative_us)))
+    return trace
+
+
+def base_import_time(trace: List[Tuple[str, int, int]]) -> int:
+    """Cumulative us of the outermost pandas/numpy imports (nested ones are already included)."""
+    total = 0
+    ancestors: List[Tuple[int, bool]] = []
+    # Reversed, every module comes before the modules it imported
+    for name, depth, cumulative in reversed(trace):
+        while ancestors and ancestors[-1][0] >= depth:
+            ancestors.pop()
+        inside_base = bool(ancestors) and ancestors[-1][1]
+        is_base = name.split(".")[0] in BASE_MODULES
+        if is_base and not inside_base:
+            total += cumulative
+        ancestors.append((depth, inside_base or is_base))
+    return total
+
+
+def measure(module: str) -> Tuple[float, float, List[str]]:
+    """(total ms, overhead ms, heavy modules imported) of one fresh import."""
+    trace = import_trace(module)
+    total = next(cumulative for name, _, cumulative in trace if name == module)
+    base = base_import_time(trace)
+    heavy = sorted({name.split(".")[0] for name, _, _ in trace
+                    if name.split(".")[0] in HEAVY_MODULES})
+    return total / 1000, (total - base) / 1000, heavy
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="imports per module; the fastest one counts (default: 3)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply every budget, e.g. for slow CI machines (default: 1.0)")
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'module':<40} {'total':>9} {'overhead':>9} {'budget':>8}")
+    for module, budget in IMPORT_BUDGETS.items():
+        runs = [measure(module) for _ in range(max(args.repeat, 1))]
+        total, overhead, heavy = min(runs, key=lambda run: run[1])
+        budget *= args.scale
+        problems = []
+        if heavy:
+            problems.append(f"imports {', '.join(heavy)}")
+        if overhead > budget:
+            problems.append("over budget")
+        failures += bool(problems)
+        status = "✗ " + "; ".join(problems) if problems else "✓"
+        print(f"{module:<40} {total:7.0f}ms {overhead:7.0f}ms {budget:6.0f}ms  {status}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Query or load-test the local survey-statistics service."""
+
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Segment questions the load mix filters on (see crosstabs.SEGMENTS)
+SEGMENT_CODES = ["014", "003", "007", "012"]
+LOAD_SEED = 20240601
+
+
+class StatsClient:
+    """One keep-alive HTTP/1.1 connection to the service."""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self) -> "StatsClient":
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.writer = None
+
+    async def request(self, path: str, payload: Optional[Dict] = None) -> Tuple[int, Dict]:
+        """(status, decoded JSON body); a payload is sent as a POST body."""
+        if self.writer is None:
+            await self.connect()
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        method = "POST" if payload is not None else "GET"
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+        )
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if not line.strip():
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        data = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, json.loads(data) if data else {}
+
+    async def stats(self, question: str, where=None, top: int = 10) -> Tuple[int, Dict]:
+        return await self.request("/stats", {"question": question, "filter": where, "top": top})
+
+
+async def build_queries(client: StatsClient, distinct: int, seed: int) -> List[Dict]:
+    """Distinct (question, filter) queries: every question, with and without segment filters."""
+    _, listing = await client.request("/questions")
+    questions = [q["code"] or q["column"] for q in listing["questions"]]
+    segments = {}
+    for code in SEGMENT_CODES:
+        status, table = await client.stats(code, top=5)
+        if status == 200:
+            segments[code] = [row["response"] for row in table["rows"] if row["response"] != "Others"]
+
+    rng = random.Random(seed)
+    queries = [{"question": question} for question in questions]
+    while len(queries) < distinct and segments:
+        chosen = rng.sample(sorted(segments), k=rng.choice([1, 1, 2]))
+        where = {code: rng.choice(segments[code]) for code in chosen if segments[code]}
+        queries.append({"question": rng.choice(questions), "filter": where})
+    return queries[:distinct] if distinct else queries
+
+
+async def load_test(host: str, port: int, requests: int, concurrency: int, distinct: int, seed: int) -> Dict:
+    """Replay ``requests`` random queries from ``concurrency`` connections."""
+    setup = await StatsClient(host, port).connect()
+    queries = await build_queries(setup, distinct, seed)
+    rng = random.Random(seed + 1)
+    plan = [rng.choice(queries) for _ in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker(offset: int) -> None:
+        nonlocal errors
+        client = await StatsClient(host, port).connect()
+        try:
+            for query in plan[offset::concurrency]:
+                start = time.perf_counter()
+                status, _ = await client.stats(query["question"], query.get("filter"))
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    _, metrics = await setup.request("/metrics")
+    await setup.close()
+
+    ms = sorted(latency * 1000 for latency in latencies)
+    quantiles = statistics.quantiles(ms, n=100) if len(ms) > 1 else ms * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "distinct_queries": len(queries),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(quantiles[49], 3),
+        "p95_ms": round(quantiles[94], 3),
+        "p99_ms": round(quantiles[98], 3),
+        "max_ms": round(ms[-1], 3),
+        "server": metrics,
+    }
+
+
+async def show(host: str, port: int, question: str, where: Optional[str], top: int) -> int:
+    client = await StatsClient(host, port).connect()
+    try:
+        status, table = await client.stats(question, where, top)
+    finally:
+        await client.close()
+    if status != 200:
+        print(f"✗ {status}: {table.get('error')}")
+        return 1
+    print(f"{table['question']}")
+    print(f"{table['answered']} of {table['respondents']} respondents answered (data version {table['version']})")
+    for row in table["rows"]:
+        print(f"  {row['frequency']:>8}  {row['percentage']:6.2f}%  {row['response']}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("question", nargs="?", help="question code or column to show")
+    parser.add_argument("--filter", help="segment filter, e.g. '014=\"Scrum Master\" & 003=Brazil'")
+    parser.add_argument("--top", type=int, default=10, help="answers to show (default: 10)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--requests", type=int, default=0, help="run a load test of this many requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="connections of the load test (default: 8)")
+    parser.add_argument("--distinct", type=int, default=500,
+                        help="distinct queries in the load mix (default: 500)")
+    parser.add_argument("--seed", type=int, default=LOAD_SEED)
+    parser.add_argument("--output", type=Path, help="write the load test results to a JSON file")
+    args = parser.parse_args()
+
+    if not args.requests:
+        if not args.question:
+            parser.error("give a question or --requests")
+        return asyncio.run(show(args.host, args.port, args.question, args.filter, args.top))
+
+    results = asyncio.run(load_test(args.host, args.port, args.requests, args.concurrency, args.distinct, args.seed))
+    cache = results["server"]["cache"]
+    print(f"✓ {results['requests']} requests ({results['errors']} errors) in {results['elapsed_s']}s: "
+          f"{results['requests_per_s']} req/s")
+    print(f"  latency p50 {results['p50_ms']} ms, p95 {results['p95_ms']} ms, "
+          f"p99 {results['p99_ms']} ms, max {results['max_ms']} ms")
+    print(f"  server cache: {cache['entries']} entries, {cache['bytes']} bytes, hit rate {cache['hit_rate']}, "
+          f"{cache['evictions']} evictions")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"✓ Saved load test results to {args.output}")
+    return 1 if results["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
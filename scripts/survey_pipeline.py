@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""Run the survey pipeline as a dependency graph, rebuilding only stale stages."""
+
+from pathlib import Path
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+PIPELINE_STATE = ROOT / "data" / "processed" / "pipeline_state.json"
+LOG_DIR = ROOT / "outputs" / "logs"
+
+MERGED = "data/processed/merged_survey_data.xlsx"
+QUALITY_FLAGS = "data/processed/merged_survey_data.quality.parquet"
+# Caches every analysis stage reads; built once so parallel stages never race to write them
+SHARED_CACHES = [
+    "data/processed/merged_survey_data.catalog.json",
+    "data/processed/frequency_store.json",
+    "data/processed/crosstabs.json",
+    "data/processed/merged_survey_data.bitmaps.npz",
+    "data/processed/merged_survey_data.codes/labels.json",
+]
+LOADER_CODE = [
+    "src/data_processing/data_loader.py",
+    "src/data_processing/response_matrix.py",
+    "src/data_processing/question_catalog.py",
+    "src/data_processing/likert_scales.py",
+    "src/data_processing/frequency_store.py",
+    "src/data_processing/multi_select.py",
+    "columns.md",
+]
+
+
+def raw_exports() -> List[str]:
+    """Every workbook the merge reads, plus its optional header map."""
+    return sorted(str(path.relative_to(ROOT)) for path in (ROOT / "data" / "raw").glob("*.xlsx")) \
+        + ["data/raw/header_map.json"]
+
+
+def run_merge(incremental: bool = False) -> None:
+    from data_processing.merge_datasets import merge_survey_data, merge_survey_data_incremental
+    if incremental:
+        merge_survey_data_incremental()
+    else:
+        merge_survey_data()
+
+
+def run_caches() -> None:
+    from data_processing.bitmap_index import get_bitmap_index
+    from data_processing.crosstabs import get_crosstabs
+    from data_processing.data_loader import load_survey_data
+    from data_processing.frequency_store import get_frequency_store
+    from data_processing.question_catalog import get_question_catalog
+
+    # Also writes the response matrix the later stages memory-map
+    df = load_survey_data(MERGED)
+    get_frequency_store(df, data_path=MERGED)
+    catalog = get_question_catalog(df, data_path=MERGED)
+    get_crosstabs(df, catalog, data_path=MERGED)
+    get_bitmap_index(df, catalog, data_path=MERGED)
+
+
+def run_screening() -> None:
+    from data_processing.quality_screening import screen_survey
+    screen_survey()
+
+
+def run_frequency_tables(exclude_flagged: bool = False) -> None:
+    from data_processing.descriptive_analysis import create_crosstab_tables, create_frequency_tables
+    create_frequency_tables(exclude_flagged=exclude_flagged)
+    create_crosstab_tables(exclude_flagged=exclude_flagged)
+
+
+def run_plots(exclude_flagged: bool = False) -> None:
+    from visualization.create_plots import create_all_visualizations
+    create_all_visualizations(exclude_flagged=exclude_flagged)
+
+
+def run_report(exclude_flagged: bool = False) -> None:
+    import analyze_survey
+    analyze_survey.main(exclude_flagged=exclude_flagged)
+
+
+def run_text(exclude_flagged: bool = False) -> None:
+    from data_processing.text_analytics import analyze_text, write_text_analysis
+    write_text_analysis(analyze_text(exclude_flagged=exclude_flagged))
+
+
+def run_associations(exclude_flagged: bool = False) -> None:
+    from data_processing.associations import analyze_associations
+    analyze_associations(exclude_flagged=exclude_flagged)
+
+
+def run_missingness(exclude_flagged: bool = False) -> None:
+    from data_processing.missingness import analyze_missingness
+    analyze_missingness(exclude_flagged=exclude_flagged)
+
+
+def run_summary(exclude_flagged: bool = False) -> None:
+    from generate_summary_report import generate_summary_report
+    generate_summary_report(exclude_flagged=exclude_flagged)
+
+
+class Stage(NamedTuple):
+    name: str
+    run: Callable[..., None]
+    inputs: List[str]
+    outputs: List[str]
+    deps: List[str]
+    # Where the stage's console output goes (default: outputs/logs/<name>.log)
+    log: Optional[str] = None
+    # Pipeline options passed to ``run`` as keywords (exclude_flagged, incremental)
+    options: Tuple[str, ...] = ()
+
+
+STAGES: List[Stage] = [
+    Stage("merge", run_merge,
+          inputs=raw_exports() + ["src/data_processing/merge_datasets.py", "src/data_processing/data_loader.py",
+                                  "src/data_processing/schema_alignment.py"],
+          outputs=[MERGED],
+          deps=[], options=("incremental",)),
+    Stage("caches", run_caches,
+          inputs=[MERGED, "src/data_processing/crosstabs.py", "src/data_processing/bitmap_index.py"]
+          + LOADER_CODE,
+          outputs=SHARED_CACHES,
+          deps=["merge"]),
+    # Flags respondents for the analyses to include or exclude; reads the response matrix the caches stage wrote
+    Stage("screening", run_screening,
+          inputs=[MERGED, "src/data_processing/quality_screening.py"] + SHARED_CACHES + LOADER_CODE,
+          outputs=[QUALITY_FLAGS, "data/processed/quality_screening.xlsx"],
+          deps=["caches"]),
+    Stage("frequency_tables", run_frequency_tables,
+          inputs=[MERGED, "src/data_processing/descriptive_analysis.py"] + SHARED_CACHES + LOADER_CODE,
+          outputs=["data/processed/frequency_analysis.xlsx", "data/processed/crosstab_analysis.xlsx"],
+          deps=["caches"], options=("exclude_flagged",)),
+    Stage("plots", run_plots,
+          inputs=[MERGED, "src/visualization/create_plots.py", "src/data_processing/bootstrap.py"]
+          + SHARED_CACHES + LOADER_CODE,
+          outputs=["outputs/plots/plot_manifest.json"],
+          deps=["caches"], options=("exclude_flagged",)),
+    Stage("report", run_report,
+          inputs=[MERGED, "scripts/analyze_survey.py", "src/data_processing/bootstrap.py"]
+          + SHARED_CACHES + LOADER_CODE,
+          outputs=["outputs/descriptive_stats.md"],
+          deps=["caches"], options=("exclude_flagged",)),
+    Stage("text", run_text,
+          inputs=[MERGED, "src/data_processing/text_analytics.py", "src/data_processing/crosstabs.py"]
+          + SHARED_CACHES + LOADER_CODE,
+          outputs=["data/processed/text_analysis.xlsx"],
+          deps=["caches"], options=("exclude_flagged",)),
+    Stage("associations", run_associations,
+          inputs=[MERGED, "src/data_processing/associations.py", "src/data_processing/crosstabs.py"]
+          + SHARED_CACHES + LOADER_CODE,
+          outputs=["data/processed/association_analysis.xlsx", "outputs/plots/association_heatmap.png"],
+          deps=["caches"], options=("exclude_flagged",)),
+    Stage("missingness", run_missingness,
+          inputs=[MERGED, "src/data_processing/missingness.py"] + SHARED_CACHES + LOADER_CODE,
+          outputs=["data/processed/missingness_analysis.xlsx", "outputs/plots/missingness_patterns.png"],
+          deps=["caches"], options=("exclude_flagged",)),
+    # The summary lists the workbook and plots, so it runs after them
+    Stage("summary", run_summary,
+          inputs=[MERGED, "src/generate_summary_report.py", "src/data_processing/missingness.py",
+                  "data/processed/frequency_analysis.xlsx",
+                  "outputs/plots/plot_manifest.json"] + SHARED_CACHES + LOADER_CODE,
+          outputs=["outputs/summary_report.txt"],
+          deps=["frequency_tables", "plots"],
+          log="outputs/summary_report.txt", options=("exclude_flagged",)),
+]
+
+
+def with_screening(stages: List[Stage]) -> List[Stage]:
+    """The stages with every screened analysis waiting for, and reading, the quality flags."""
+    return [stage._replace(deps=stage.deps + ["screening"], inputs=stage.inputs + [QUALITY_FLAGS])
+            if "exclude_flagged" in stage.options else stage for stage in stages]
+
+
+def load_state(path: Path = PIPELINE_STATE) -> Dict:
+    if not path.exists():
+        return {"files": {}, "stages": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_state(state: Dict, path: Path = PIPELINE_STATE) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(state, indent=1, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+def file_digest(path: str, state: Dict) -> Optional[str]:
+    """Content hash of a file, re-read only when its size or mtime changed."""
+    full = ROOT / path
+    if not full.exists():
+        return None
+    stat = full.stat()
+    known = state["files"].get(path)
+    if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+        return known["sha256"]
+    digest = hashlib.sha256()
+    with open(full, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    state["files"][path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+    return digest.hexdigest()
+
+
+def input_digests(stage: Stage, state: Dict) -> Dict[str, Optional[str]]:
+    return {path: file_digest(path, state) for path in stage.inputs}
+
+
+def stale_reason(stage: Stage, state: Dict, rebuilding: set, force: bool = False,
+                 exclude_flagged: bool = False) -> Optional[str]:
+    """Why a stage has to run, or None when it is up to date."""
+    if force:
+        return "forced"
+    upstream = [dep for dep in stage.deps if dep in rebuilding]
+    if upstream:
+        return f"upstream {', '.join(upstream)} rebuilds"
+    missing = [path for path in stage.outputs if not (ROOT / path).exists()]
+    if missing:
+        return f"missing output {missing[0]}"
+    previous = state["stages"].get(stage.name)
+    if previous is None:
+        return "never run"
+    if "exclude_flagged" in stage.options and previous.get("exclude_flagged", False) != exclude_flagged:
+        return "flagged respondents now " + ("excluded" if exclude_flagged else "included")
+    for path, digest in input_digests(stage, state).items():
+        if previous["inputs"].get(path) != digest:
+            return f"input changed: {path}"
+    return None
+
+
+def select_stages(targets: Optional[List[str]], stages: List[Stage] = STAGES) -> List[Stage]:
+    """Requested stages and everything they depend on, in pipeline order."""
+    by_name = {stage.name: stage for stage in stages}
+    if not targets:
+        return list(stages)
+    needed = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(by_name[name].deps)
+    return [stage for stage in stages if stage.name in needed]
+
+
+def plan(stages: List[Stage], state: Dict, force: bool = False,
+         exclude_flagged: bool = False) -> List[Tuple[Stage, Optional[str]]]:
+    """(stage, reason to rebuild or None) for every stage, in dependency order."""
+    rebuilding = set()
+    planned = []
+    for stage in stages:
+        reason = stale_reason(stage, state, rebuilding, force, exclude_flagged)
+        if reason:
+            rebuilding.add(stage.name)
+        planned.append((stage, reason))
+    return planned
+
+
+def _stage_process(name: str, log_path: str, options: Dict[str, bool]) -> None:
+    """Run one stage from the repository root with its output sent to its log."""
+    os.chdir(ROOT)
+    with open(log_path, "w", encoding="utf-8") as log:
+        # At the descriptor level so worker pools started by the stage log there too
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        stage = next(stage for stage in STAGES if stage.name == name)
+        stage.run(**{key: value for key, value in options.items() if key in stage.options})
+        sys.stdout.flush()
+
+
+def run_stage(stage: Stage, options: Optional[Dict[str, bool]] = None) -> float:
+    """Run a stage in a fresh process; returns its wall time."""
+    log_path = ROOT / stage.log if stage.log else LOG_DIR / f"{stage.name}.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    process = multiprocessing.get_context("spawn").Process(target=_stage_process,
+                                                           args=(stage.name, str(log_path), options or {}))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"stage {stage.name} failed (exit code {process.exitcode}); "
+                           f"see {log_path.relative_to(ROOT)}")
+    return time.perf_counter() - start
+
+
+def execute(planned: List[Tuple[Stage, Optional[str]]], state: Dict, jobs: int,
+            options: Optional[Dict[str, bool]] = None) -> bool:
+    """Run the stale stages, each as soon as the stages it depends on have finished."""
+    pending = {stage.name: stage for stage, reason in planned if reason}
+    done = {stage.name for stage, reason in planned if not reason}
+    failed = set()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(dep in failed for dep in stage.deps):
+                    print(f"✗ {name}: skipped, a dependency failed")
+                    failed.add(name)
+                    del pending[name]
+                elif all(dep in done for dep in stage.deps):
+                    print(f"▶ {name}")
+                    # Inputs are hashed as the stage starts: its dependencies have written them
+                    running[pool.submit(run_stage, stage, options)] = (stage, input_digests(stage, state))
+                    del pending[name]
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, digests = running.pop(future)
+                try:
+                    seconds = future.result()
+                except RuntimeError as exc:
+                    print(f"✗ {exc}")
+                    failed.add(stage.name)
+                    continue
+                state["stages"][stage.name] = {"inputs": digests, "seconds": round(seconds, 3)}
+                if "exclude_flagged" in stage.options:
+                    state["stages"][stage.name]["exclude_flagged"] = bool((options or {}).get("exclude_flagged"))
+                save_state(state)
+                done.add(stage.name)
+                print(f"✓ {stage.name} ({seconds:.1f}s)")
+    return not failed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("targets", nargs="*", metavar="STAGE",
+                        help=f"stages to bring up to date, with their dependencies "
+                             f"(default: all of {', '.join(stage.name for stage in STAGES)})")
+    parser.add_argument("--dry-run", action="store_true", help="show what would rebuild and why, then stop")
+    parser.add_argument("--force", action="store_true", help="rebuild every selected stage")
+    parser.add_argument("--jobs", type=int, default=3, help="stages run at the same time (default: 3)")
+    parser.add_argument("--exclude-flagged", action="store_true",
+                        help="leave out the respondents flagged by the quality screening in every analysis")
+    parser.add_argument("--incremental", action="store_true",
+                        help="merge only the responses not merged yet instead of re-merging every export")
+    args = parser.parse_args()
+    unknown = [name for name in args.targets if name not in {stage.name for stage in STAGES}]
+    if unknown:
+        parser.error(f"unknown stage: {', '.join(unknown)}")
+
+    state = load_state()
+    stages = with_screening(STAGES) if args.exclude_flagged else STAGES
+    planned = plan(select_stages(args.targets, stages), state, force=args.force, exclude_flagged=args.exclude_flagged)
+    for stage, reason in planned:
+        print(f"  {'rebuild' if reason else 'up to date':<10} {stage.name:<17} {reason or ''}".rstrip())
+    if args.dry_run:
+        return 0
+    if not any(reason for _, reason in planned):
+        print("\nNothing to do.")
+        return 0
+
+    print()
+    options = {"exclude_flagged": args.exclude_flagged, "incremental": args.incremental}
+    ok = execute(planned, state, max(args.jobs, 1), options)
+    print("\n✓ Pipeline up to date" if ok else "\n✗ Pipeline finished with failures")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
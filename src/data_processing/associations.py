@@ -0,0 +1,299 @@
+"""
+All-pairs association analysis: chi-square, Cramér's V and FDR-adjusted p-values
+"""
+import argparse
+import math
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_processing.crosstabs import _one_hot_layout
+from data_processing.data_loader import MERGED_XLSX, load_survey_data
+from data_processing.instrumentation import add_arguments, enable, span, traced
+from data_processing.quality_screening import screen_frame
+from data_processing.question_catalog import LIKERT, SINGLE_CHOICE, get_question_catalog
+from data_processing.response_matrix import matrix_of
+
+ASSOCIATIONS = 'data/processed/association_analysis.xlsx'
+ASSOCIATION_HEATMAP = 'outputs/plots/association_heatmap.png'
+HEATMAP_DPI = 200
+
+# Question pairs (codes or catalog blocks) the researchers follow up on
+FOCUS_PAIRS = [
+    ('014', '093-095'),   # primary role vs helpfulness by role
+    ('007', '106-109'),   # experience vs perceived risks
+    ('025', '026'),       # AI policy vs formality of use
+]
+
+# Chi-square is unreliable when some expected cell count is below this
+MIN_EXPECTED = 5
+FDR_ALPHA = 0.05
+
+
+def association_columns(df, catalog):
+    """Single-choice and Likert questions, plus the survey source"""
+    columns = catalog.columns(qtype=[LIKERT, SINGLE_CHOICE])
+    if 'source' in df.columns:
+        columns.append('source')
+    return columns
+
+
+@traced()
+def gram_matrix(df, columns, chunk_size=16384, responses=None):
+    """Answer x answer co-occurrence counts of all columns, from one one-hot product"""
+    codes, layout, slots = _one_hot_layout(df, columns, responses)
+    gram = np.zeros((slots, slots), dtype=np.int64)
+    # About one answer in seven is set, which float32 BLAS handles faster than sparse products
+    for start in range(0, len(df), chunk_size):
+        stop = min(start + chunk_size, len(df))
+        hot = np.zeros((stop - start, slots), dtype=np.float32)
+        hot[np.arange(stop - start)[:, None], codes[start:stop]] = 1
+        # Exact: no count of one chunk exceeds chunk_size
+        gram += (hot.T @ hot).astype(np.int64)
+
+    # Drop the missing slot after each column's answers
+    keep = np.concatenate([np.arange(offset, offset + len(labels)) for _, offset, labels in layout])
+    starts = np.cumsum([0] + [len(labels) for _, _, labels in layout])
+    return gram[np.ix_(keep, keep)], starts, [labels for _, _, labels in layout]
+
+
+def chi2_sf(x, dof):
+    """Chi-square survival function P(X >= x), vectorized"""
+    x, dof = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(dof, dtype=float))
+    try:
+        from scipy.special import gammaincc
+    except ImportError:
+        return _gammaincc(dof / 2, x / 2)
+    return gammaincc(dof / 2, x / 2)
+
+
+def _gammaincc(a, x, iterations=1000, eps=1e-15):
+    """Q(a, x): power series below a + 1, Lentz continued fraction above (Numerical Recipes 6.2)"""
+    q = np.full(a.shape, np.nan)
+    valid = (a > 0) & (x >= 0)
+    q[valid & (x == 0)] = 1.0
+    todo = valid & (x > 0)
+    if not todo.any():
+        return q
+    lgamma = np.array([math.lgamma(value) for value in a[todo]])
+    a_, x_ = a[todo], x[todo]
+    log_front = a_ * np.log(x_) - x_ - lgamma
+    result = np.empty_like(a_)
+
+    series = x_ < a_ + 1
+    if series.any():
+        a_s, x_s = a_[series], x_[series]
+        term = 1 / a_s
+        total = term.copy()
+        ap = a_s.copy()
+        for _ in range(iterations):
+            ap += 1
+            term *= x_s / ap
+            total += term
+            if np.all(np.abs(term) < np.abs(total) * eps):
+                break
+        result[series] = 1 - total * np.exp(log_front[series])
+
+    fraction = ~series
+    if fraction.any():
+        a_f, x_f = a_[fraction], x_[fraction]
+        tiny = 1e-300
+        b = x_f + 1 - a_f
+        c = np.full_like(b, 1 / tiny)
+        d = 1 / b
+        h = d.copy()
+        for i in range(1, iterations + 1):
+            an = -i * (i - a_f)
+            b += 2
+            d = an * d + b
+            d = np.where(np.abs(d) < tiny, tiny, d)
+            c = b + an / c
+            c = np.where(np.abs(c) < tiny, tiny, c)
+            d = 1 / d
+            delta = d * c
+            h *= delta
+            if np.all(np.abs(delta - 1) < eps):
+                break
+        result[fraction] = np.exp(log_front[fraction]) * h
+
+    q[todo] = np.clip(result, 0, 1)
+    return q
+
+
+def fdr_bh(p_values):
+    """Benjamini-Hochberg adjusted p-values (q-values); NaN stays NaN"""
+    p_values = np.asarray(p_values, dtype=float)
+    q_values = np.full(p_values.shape, np.nan)
+    valid = ~np.isnan(p_values)
+    p = p_values[valid]
+    if not len(p):
+        return q_values
+    order = np.argsort(p, kind='stable')
+    ranked = p[order] * len(p) / np.arange(1, len(p) + 1)
+    # Monotone: a q-value never exceeds the one of a larger p-value
+    ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+    adjusted = np.empty_like(p)
+    adjusted[order] = np.minimum(ranked, 1)
+    q_values[valid] = adjusted
+    return q_values
+
+
+def association_statistics(gram, starts):
+    """Question x question matrices of n, chi-square, dof, Cramér's V, p-value and min expected count"""
+    slot_question = np.repeat(np.arange(len(starts) - 1), np.diff(starts))
+    bounds = starts[:-1]
+    # margins[q, b]: respondents who answered question q and gave answer b
+    margins = np.add.reduceat(gram, bounds, axis=0)
+    n = np.add.reduceat(margins, bounds, axis=1)
+
+    rows = margins.T[:, slot_question]      # R_a of the table of (question of a, question of b)
+    cols = margins[slot_question, :]        # C_b of the same table
+    denominator = rows * cols
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(denominator > 0, gram.astype(float) ** 2 / denominator, 0.0)
+    fraction = np.add.reduceat(np.add.reduceat(ratio, bounds, axis=0), bounds, axis=1)
+
+    observed = np.add.reduceat((margins > 0).astype(np.int64), bounds, axis=1)
+    levels_a, levels_b = observed.T, observed
+    dof = (levels_a - 1) * (levels_b - 1)
+    smallest = np.minimum.reduceat(np.where(margins > 0, margins, np.inf), bounds, axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        chi2 = np.where(n > 0, n * (fraction - 1), np.nan)
+        chi2 = np.maximum(chi2, 0)  # rounding can leave -1e-12 for independent tables
+        k = np.minimum(levels_a, levels_b) - 1
+        cramers_v = np.where((k > 0) & (n > 0), np.sqrt(chi2 / n / k), np.nan)
+        min_expected = np.where(n > 0, smallest.T * smallest / n, np.nan)
+    p_value = np.where(dof > 0, chi2_sf(np.nan_to_num(chi2), np.maximum(dof, 1)), np.nan)
+
+    # A question against itself is not a pair
+    for matrix in (chi2, cramers_v, p_value, min_expected):
+        np.fill_diagonal(matrix, np.nan)
+    return {'n': n, 'chi2': chi2, 'dof': dof, 'cramers_v': cramers_v, 'p_value': p_value,
+            'levels_a': levels_a, 'levels_b': levels_b, 'min_expected': min_expected}
+
+
+@traced()
+def compute_associations(df, catalog, columns=None, chunk_size=16384, responses=None):
+    """(ranked pairs, Cramér's V matrix) of every pair of coded questions"""
+    columns = association_columns(df, catalog) if columns is None else columns
+    gram, starts, _ = gram_matrix(df, columns, chunk_size, responses)
+    with span('association statistics', questions=len(columns)):
+        stats = association_statistics(gram, starts)
+
+    first, second = np.triu_indices(len(columns), k=1)
+    labels = [catalog.code(col) or col for col in columns]
+    pairs = pd.DataFrame({
+        'code_a': [labels[i] for i in first],
+        'question_a': [columns[i] for i in first],
+        'code_b': [labels[j] for j in second],
+        'question_b': [columns[j] for j in second],
+        'n': stats['n'][first, second],
+        'levels_a': stats['levels_a'][first, second],
+        'levels_b': stats['levels_b'][first, second],
+        'chi2': stats['chi2'][first, second],
+        'dof': stats['dof'][first, second],
+        'p_value': stats['p_value'][first, second],
+        'cramers_v': stats['cramers_v'][first, second],
+        'min_expected': stats['min_expected'][first, second],
+    })
+    pairs = pairs[pairs['dof'] > 0].reset_index(drop=True)
+    pairs['q_value'] = fdr_bh(pairs['p_value'].to_numpy())
+    pairs = pairs.sort_values(['cramers_v', 'chi2'], ascending=False, kind='stable').reset_index(drop=True)
+
+    matrix = pd.DataFrame(stats['cramers_v'], index=labels, columns=labels)
+    return pairs, matrix
+
+
+def focus_pairs(pairs, catalog, focus=FOCUS_PAIRS):
+    """Rows of ``pairs`` for the focus questions (codes or catalog blocks)"""
+    def codes(name):
+        block = catalog.columns(block=name)
+        return {catalog.code(col) for col in block} if block else {name}
+
+    selected = []
+    for left, right in focus:
+        a, b = codes(left), codes(right)
+        match = ((pairs['code_a'].isin(a) & pairs['code_b'].isin(b))
+                 | (pairs['code_a'].isin(b) & pairs['code_b'].isin(a)))
+        selected.append(pairs[match].assign(focus=f'{left} x {right}'))
+    return pd.concat(selected, ignore_index=True) if selected else pairs.iloc[:0]
+
+
+def write_associations(pairs, matrix, focus, output_file=ASSOCIATIONS):
+    """Write the ranked pairs, the focus pairs and the Cramér's V matrix to a workbook"""
+    from data_processing.descriptive_analysis import clean_column_name
+
+    def readable(frame):
+        frame = frame.copy()
+        for col in ('question_a', 'question_b'):
+            frame[col] = frame[col].map(clean_column_name)
+        return frame.round({'chi2': 3, 'p_value': 6, 'q_value': 6, 'cramers_v': 4, 'min_expected': 2})
+
+    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        readable(pairs).to_excel(writer, sheet_name='Ranked Pairs', index=False)
+        readable(focus).to_excel(writer, sheet_name='Focus Pairs', index=False)
+        matrix.round(4).to_excel(writer, sheet_name="Cramér's V")
+    print(f"✓ Associations saved to: {output_file}")
+    return output_file
+
+
+def plot_association_heatmap(matrix, output_file=ASSOCIATION_HEATMAP):
+    """Heatmap of the Cramér's V matrix (questions in catalog order)"""
+    import matplotlib.pyplot as plt
+
+    size = max(8, len(matrix) * 0.12)
+    fig, ax = plt.subplots(figsize=(size + 2, size))
+    image = ax.imshow(matrix.to_numpy(dtype=float), cmap='viridis', vmin=0, vmax=1)
+    ax.set_xticks(range(len(matrix)))
+    ax.set_yticks(range(len(matrix)))
+    ax.set_xticklabels(matrix.columns, rotation=90, fontsize=5)
+    ax.set_yticklabels(matrix.index, fontsize=5)
+    ax.set_title("Association between questions (Cramér's V)")
+    fig.colorbar(image, ax=ax, fraction=0.04, pad=0.02, label="Cramér's V")
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    fig.savefig(output_file, dpi=HEATMAP_DPI, bbox_inches='tight')
+    plt.close(fig)
+    print(f"✓ Association heatmap saved to: {output_file}")
+    return output_file
+
+
+@traced()
+def analyze_associations(input_file=MERGED_XLSX, output_file=ASSOCIATIONS, heatmap=ASSOCIATION_HEATMAP,
+                         top_n=15, alpha=FDR_ALPHA, exclude_flagged=False):
+    """Compute, write and plot the associations of the merged dataset"""
+    df = load_survey_data(input_file)
+    catalog = get_question_catalog(df, data_path=input_file)
+    if exclude_flagged:
+        df = screen_frame(df, data_path=input_file)
+        print(f"Flagged responses excluded: {len(df)} kept")
+    pairs, matrix = compute_associations(df, catalog, responses=matrix_of(df, input_file))
+    focus = focus_pairs(pairs, catalog)
+    write_associations(pairs, matrix, focus, output_file)
+    if heatmap:
+        plot_association_heatmap(matrix, heatmap)
+
+    significant = pairs['q_value'] < alpha
+    print(f"  {len(pairs)} pairs tested, {int(significant.sum())} significant at FDR {alpha}")
+    for row in pairs.head(top_n).itertuples():
+        flag = '' if row.min_expected >= MIN_EXPECTED else '  (expected < 5)'
+        print(f"  {row.code_a:>7} x {row.code_b:<7} V={row.cramers_v:.3f}  q={row.q_value:.2g}  n={row.n}{flag}")
+    return pairs, matrix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--top', type=int, default=15, help='strongest pairs to print (default: 15)')
+    parser.add_argument('--alpha', type=float, default=FDR_ALPHA,
+                        help=f'false discovery rate for the significance count (default: {FDR_ALPHA})')
+    parser.add_argument('--no-plot', action='store_true', help='skip the heatmap')
+    parser.add_argument('--exclude-flagged', action='store_true',
+                        help='leave out respondents flagged by the quality screening')
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+    analyze_associations(heatmap=None if args.no_plot else ASSOCIATION_HEATMAP, top_n=args.top, alpha=args.alpha,
+                         exclude_flagged=args.exclude_flagged)
@@ -0,0 +1,396 @@
+"""
+Bitmap index over respondents: one packed bit array per (column, answer)
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_processing.data_loader import MERGED_XLSX, TIMESTAMP_COLUMNS, load_survey_data
+from data_processing.instrumentation import add_arguments, enable, span, traced
+from data_processing.multi_select import MultiSelectMatrix, build_multi_select_matrices, pack_mask, popcount
+from data_processing.question_catalog import MULTI_SELECT, OPEN_TEXT, get_question_catalog
+from data_processing.response_matrix import matrix_of
+
+# Free text and joined multi-select answers are nearly unique per respondent,
+# so they keep integer codes instead of one bitmap per answer (multi-select
+# options get bitmaps of their own)
+CODED_QTYPES = (OPEN_TEXT, MULTI_SELECT)
+
+# Bitmaps ANDed with a selection at a time when counting (bounds the temporary copy)
+_COUNT_BLOCK = 64
+
+_QUERY_TOKEN = re.compile(r"""\s*(?:(?P<op>[&|~(),=])|"(?P<double>[^"]*)"|'(?P<single>[^']*)'"""
+                          r"""|(?P<word>[^&|~(),="'\s][^&|~(),="']*))""")
+
+
+class Bitmap:
+    """A set of respondents as packed bits; combine with ``&``, ``|`` and ``~``"""
+
+    __slots__ = ('bits', 'n_rows')
+
+    def __init__(self, bits, n_rows):
+        self.bits = bits
+        self.n_rows = n_rows
+
+    @classmethod
+    def from_mask(cls, mask):
+        mask = np.asarray(mask, dtype=bool)
+        return cls(pack_mask(mask), len(mask))
+
+    def __and__(self, other):
+        return Bitmap(self.bits & other.bits, self.n_rows)
+
+    def __or__(self, other):
+        return Bitmap(self.bits | other.bits, self.n_rows)
+
+    def __invert__(self):
+        bits = ~self.bits
+        # Keep the padding after the last respondent clear
+        if self.n_rows % 8:
+            bits[-1] &= np.uint8((0xFF << (8 - self.n_rows % 8)) & 0xFF)
+        return Bitmap(bits, self.n_rows)
+
+    def count(self):
+        """Number of respondents in the set"""
+        return int(popcount(self.bits))
+
+    def mask(self):
+        """Boolean respondent mask (e.g. to filter the DataFrame)"""
+        return np.unpackbits(self.bits, count=self.n_rows).astype(bool)
+
+
+class BitmapIndex:
+    """Packed bitmaps of every answer of every question"""
+
+    def __init__(self, n_rows, bits, entries, codes, aliases):
+        self.n_rows = n_rows
+        self.bits = bits
+        self.entries = entries
+        self.codes = codes
+        self.aliases = aliases
+
+    def column(self, name):
+        """Column header of a column or question code"""
+        if name in self.entries:
+            return name
+        if name in self.aliases:
+            return self.aliases[name]
+        raise KeyError(f"Unknown column or question code: {name!r}")
+
+    def _bitmap(self, row):
+        return Bitmap(self.bits[row], self.n_rows)
+
+    def all(self):
+        """Every respondent"""
+        return ~Bitmap(np.zeros((self.n_rows + 7) // 8, dtype=np.uint8), self.n_rows)
+
+    def missing(self, name):
+        """Respondents who did not answer a question"""
+        return self._bitmap(self.entries[self.column(name)]['missing'])
+
+    def where(self, name, *values):
+        """Respondents who gave any of ``values`` (selected any of them, for multi-select questions)"""
+        col = self.column(name)
+        entry = self.entries[col]
+        labels = entry['options'] if 'options' in entry else entry['values']
+        positions = []
+        for value in values:
+            try:
+                positions.append(labels.index(str(value)))
+            except ValueError:
+                raise KeyError(f"{value!r} is not an answer to {col!r}") from None
+
+        if 'options' in entry:
+            rows = [entry['option_start'] + i for i in positions]
+        elif col in self.codes:
+            return Bitmap.from_mask(np.isin(self.codes[col], positions))
+        else:
+            rows = [entry['start'] + i for i in positions]
+        bits = np.bitwise_or.reduce(self.bits[rows], axis=0) if rows else np.zeros_like(self.bits[0])
+        return Bitmap(bits, self.n_rows)
+
+    def query(self, expression):
+        """Evaluate a filter expression such as ``014="Scrum Master" & 003=Brazil & ~(007="No experience")``"""
+        tokens = []
+        position = 0
+        expression = expression.strip()
+        while position < len(expression):
+            match = _QUERY_TOKEN.match(expression, position)
+            if match is None or match.end() == position:
+                raise ValueError(f"Cannot parse filter at: {expression[position:]!r}")
+            if match.group('op'):
+                tokens.append(('op', match.group('op')))
+            else:
+                text = next(group for group in match.group('double', 'single', 'word') if group is not None)
+                tokens.append(('text', text.strip() if match.group('word') else text))
+            position = match.end()
+            while position < len(expression) and expression[position].isspace():
+                position += 1
+
+        selection, position = self._parse_or(tokens, 0)
+        if position != len(tokens):
+            raise ValueError(f"Unexpected {tokens[position][1]!r} in filter {expression!r}")
+        return selection
+
+    def _parse_or(self, tokens, position):
+        selection, position = self._parse_and(tokens, position)
+        while position < len(tokens) and tokens[position] == ('op', '|'):
+            other, position = self._parse_and(tokens, position + 1)
+            selection = selection | other
+        return selection, position
+
+    def _parse_and(self, tokens, position):
+        selection, position = self._parse_term(tokens, position)
+        while position < len(tokens) and tokens[position] == ('op', '&'):
+            other, position = self._parse_term(tokens, position + 1)
+            selection = selection & other
+        return selection, position
+
+    def _parse_term(self, tokens, position):
+        def expect(kind, text=None):
+            if position >= len(tokens) or tokens[position][0] != kind or text not in (None, tokens[position][1]):
+                found = repr(tokens[position][1]) if position < len(tokens) else 'end of filter'
+                raise ValueError(f"Expected {text or 'a name or answer'} in filter, found {found}")
+            return tokens[position][1]
+
+        if position < len(tokens) and tokens[position] == ('op', '~'):
+            selection, position = self._parse_term(tokens, position + 1)
+            return ~selection, position
+        if position < len(tokens) and tokens[position] == ('op', '('):
+            selection, position = self._parse_or(tokens, position + 1)
+            expect('op', ')')
+            return selection, position + 1
+
+        name = expect('text')
+        position += 1
+        expect('op', '=')
+        position += 1
+        values = [expect('text')]
+        position += 1
+        while position < len(tokens) and tokens[position] == ('op', ','):
+            position += 1
+            values.append(expect('text'))
+            position += 1
+        return self.where(name, *values), position
+
+    def _selected_counts(self, selection):
+        """Popcount of every bitmap ANDed with the selection"""
+        counts = np.empty(len(self.bits), dtype=np.int64)
+        for start in range(0, len(self.bits), _COUNT_BLOCK):
+            block = self.bits[start:start + _COUNT_BLOCK]
+            counts[start:start + len(block)] = popcount(block & selection.bits, axis=1)
+        return counts
+
+    def counts(self, name, selection=None):
+        """Answer counts of a question within a selection, most frequent first"""
+        col = self.column(name)
+        entry = self.entries[col]
+        selection = self.all() if selection is None else selection
+        if 'options' in entry:
+            start, labels = entry['option_start'], entry['options']
+            counts = popcount(self.bits[start:start + len(labels)] & selection.bits, axis=1)
+        elif col in self.codes:
+            labels = entry['values']
+            counts = self._coded_counts(col, selection.mask())
+        else:
+            start, labels = entry['start'], entry['values']
+            counts = popcount(self.bits[start:start + len(labels)] & selection.bits, axis=1)
+        series = pd.Series(counts, index=labels, dtype='int64', name='count')
+        return series[series > 0].sort_values(ascending=False, kind='stable')
+
+    def crosstab(self, name, groups, selection=None):
+        """Answer counts of a question within every bitmap of ``groups`` (one row each)"""
+        col = self.column(name)
+        entry = self.entries[col]
+        if 'options' in entry:
+            start, labels = entry['option_start'], entry['options']
+        elif col in self.codes:
+            labels = entry['values']
+            counts = np.zeros((len(groups), len(labels)), dtype=np.int64)
+            for i, group in enumerate(groups):
+                counts[i] = self._coded_counts(col, (group if selection is None else group & selection).mask())
+            return counts, labels
+        else:
+            start, labels = entry['start'], entry['values']
+        rows = self.bits[start:start + len(labels)]
+        if selection is not None:
+            rows = rows & selection.bits
+        counts = np.zeros((len(groups), len(labels)), dtype=np.int64)
+        for i, group in enumerate(groups):
+            counts[i] = popcount(rows & group.bits, axis=1)
+        return counts, labels
+
+    def respondents(self, name, selection=None):
+        """Respondents within a selection who answered a question (selected any option, for multi-select)"""
+        col = self.column(name)
+        entry = self.entries[col]
+        selection = self.all() if selection is None else selection
+        if 'options' in entry:
+            return (self._bitmap(entry['answered']) & selection).count()
+        return (selection & ~self.missing(col)).count()
+
+    def _coded_counts(self, col, mask):
+        codes = self.codes[col][mask]
+        return np.bincount(codes[codes >= 0], minlength=len(self.entries[col]['values']))
+
+    @traced()
+    def frequency_store(self, selection, columns=None):
+        """Frequency store (see ``frequency_store``) of the selected respondents"""
+        if columns is None:
+            counts = self._selected_counts(selection)
+            entries = self.entries
+        else:
+            # Only the bitmaps of the requested columns are counted
+            entries = {col: self.entries[col] for col in map(self.column, columns)}
+            counts = np.zeros(len(self.bits), dtype=np.int64)
+            for entry in entries.values():
+                counts[entry['missing']] = (self._bitmap(entry['missing']) & selection).count()
+                if 'start' in entry:
+                    rows = slice(entry['start'], entry['start'] + len(entry['values']))
+                    counts[rows] = popcount(self.bits[rows] & selection.bits, axis=1)
+        mask = selection.mask() if any(col in self.codes for col in entries) else None
+        store = {}
+        for col, entry in entries.items():
+            if col in self.codes:
+                answer_counts = self._coded_counts(col, mask)
+            else:
+                answer_counts = counts[entry['start']:entry['start'] + len(entry['values'])]
+            store[col] = {
+                'counts': {value: int(count) for value, count in zip(entry['values'], answer_counts) if count},
+                'missing': int(counts[entry['missing']]),
+            }
+        return {'total_rows': selection.count(), 'columns': store}
+
+    def multi_select_matrices(self, selection=None):
+        """Multi-select matrices (see ``multi_select``) restricted to the selection"""
+        selection = self.all() if selection is None else selection
+        matrices = {}
+        for col, entry in self.entries.items():
+            if 'options' in entry:
+                start = entry['option_start']
+                bits = self.bits[start:start + len(entry['options'])] & selection.bits
+                answered = self.bits[entry['answered']] & selection.bits
+                matrices[col] = MultiSelectMatrix(col, entry['options'], bits, answered, self.n_rows)
+        return matrices
+
+
+def _answer_codes(series):
+    """Integer codes (missing as -1) and string labels of a column"""
+    codes, uniques = pd.factorize(series, sort=False)
+    label_codes, labels = pd.factorize(pd.Index([str(value) for value in uniques]), sort=False)
+    codes = np.where(codes >= 0, label_codes[codes] if len(uniques) else codes, -1)
+    return codes.astype(np.int32), [str(label) for label in labels]
+
+
+@traced()
+def build_bitmap_index(df, catalog, responses=None):
+    """Index every answer column of a dataset (timestamps are left out)"""
+    matrices = build_multi_select_matrices(df, catalog)
+    rows = []
+    entries = {}
+    coded = {}
+    for col in df.columns:
+        if col in TIMESTAMP_COLUMNS:
+            continue
+        if responses is not None and 'labels' in responses.layout[col]:
+            codes, values = responses.observed_codes(col)
+        else:
+            codes, values = _answer_codes(df[col])
+        entry = {'values': values, 'missing': len(rows)}
+        rows.append(pack_mask(codes < 0))
+        if catalog.entry(col)['qtype'] in CODED_QTYPES:
+            coded[col] = codes
+        else:
+            entry['start'] = len(rows)
+            rows.extend(pack_mask(codes == k) for k in range(len(values)))
+        if col in matrices:
+            matrix = matrices[col]
+            entry.update(options=matrix.options, option_start=len(rows), answered=len(rows) + len(matrix.options))
+            rows.extend(matrix.bits)
+            rows.append(matrix.answered)
+        entries[col] = entry
+
+    bits = np.vstack(rows) if rows else np.zeros((0, (len(df) + 7) // 8), dtype=np.uint8)
+    aliases = {entry['code']: entry['column'] for entry in reversed(catalog.entries)
+               if entry['code'] is not None and entry['column'] in entries}
+    return BitmapIndex(len(df), bits, entries, coded, aliases)
+
+
+def bitmap_index_path_for(xlsx_path):
+    """Bitmap index file that sits next to the dataset"""
+    return os.path.splitext(xlsx_path)[0] + '.bitmaps.npz'
+
+
+def save_bitmap_index(index, path):
+    """Write the bitmaps, codes and column layout to one .npz file"""
+    coded = list(index.codes)
+    meta = {'n_rows': index.n_rows, 'entries': index.entries, 'aliases': index.aliases, 'coded': coded}
+    arrays = {f'codes_{i}': index.codes[col] for i, col in enumerate(coded)}
+    with open(path, 'wb') as f:
+        np.savez(f, bits=index.bits, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+    return path
+
+
+def load_bitmap_index(data_path=MERGED_XLSX, path=None):
+    """Load the persisted index, or None if it is missing or older than the data"""
+    path = path or bitmap_index_path_for(data_path)
+    if not os.path.exists(path):
+        return None
+    if os.path.exists(data_path) and os.path.getmtime(path) < os.path.getmtime(data_path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        codes = {col: data[f'codes_{i}'] for i, col in enumerate(meta['coded'])}
+        return BitmapIndex(meta['n_rows'], data['bits'], meta['entries'], codes, meta['aliases'])
+
+
+def get_bitmap_index(df, catalog, data_path=MERGED_XLSX, path=None):
+    """Load the persisted index when it matches ``df``, otherwise build and persist it"""
+    path = path or bitmap_index_path_for(data_path)
+    index = load_bitmap_index(data_path, path)
+    columns = {col for col in df.columns if col not in TIMESTAMP_COLUMNS}
+    if index is None or index.n_rows != len(df) or set(index.entries) != columns:
+        index = build_bitmap_index(df, catalog, matrix_of(df, data_path))
+        save_bitmap_index(index, path)
+    return index
+
+
+def open_bitmap_index(data_path=MERGED_XLSX):
+    """The dataset's index, loading the dataset only when the index must be (re)built"""
+    index = load_bitmap_index(data_path)
+    if index is None:
+        df = load_survey_data(data_path)
+        index = get_bitmap_index(df, get_question_catalog(df, data_path=data_path), data_path=data_path)
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('filter', help='e.g. \'014="Scrum Master" & 003=Brazil & ~007="No experience"\'')
+    parser.add_argument('--show', action='append', default=[], metavar='QUESTION',
+                        help='print the answer counts of a question within the segment (repeatable)')
+    parser.add_argument('--output', metavar='PATH',
+                        help='write the frequency workbook of the segment to PATH')
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+
+    index = open_bitmap_index()
+    start = time.perf_counter()
+    with span('query', filter=args.filter):
+        selection = index.query(args.filter)
+    print(f"✓ {selection.count()} of {index.n_rows} respondents match "
+          f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+    for name in args.show:
+        print(f"\n{index.column(name)}")
+        print(index.counts(name, selection).to_string())
+    if args.output:
+        from data_processing.descriptive_analysis import create_frequency_tables
+        create_frequency_tables(output_file=args.output, where=args.filter)
@@ -0,0 +1,98 @@
+"""
+Bootstrap confidence intervals for reported percentages and mean Likert scores
+"""
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from data_processing.instrumentation import traced
+
+N_RESAMPLES = 2000
+CONFIDENCE = 0.95
+BOOTSTRAP_SEED = 20260101
+
+
+def bootstrap_job(counts, n=None, scores=None, exclusive=True):
+    """Describe one table to resample"""
+    counts = np.asarray(counts, dtype=np.int64)
+    return {
+        'counts': counts,
+        'n': int(counts.sum()) if n is None else int(n),
+        'scores': None if scores is None else np.asarray(scores, dtype=float),
+        'exclusive': exclusive,
+    }
+
+
+def resample_counts(rng, job, n_resamples):
+    """(n_resamples x answers) matrix of resampled counts"""
+    counts, n = job['counts'], job['n']
+    if n == 0:
+        return np.zeros((n_resamples, len(counts)), dtype=np.int64)
+    p = counts / n
+    if job['exclusive']:
+        return rng.multinomial(n, p / p.sum(), size=n_resamples)
+    return rng.binomial(n, p, size=(n_resamples, len(counts)))
+
+
+def _interval(samples, confidence):
+    tail = (1 - confidence) / 2 * 100
+    with np.errstate(all='ignore'):
+        low, high = np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+    return low, high
+
+
+def bootstrap_one(job, rng, n_resamples=N_RESAMPLES, confidence=CONFIDENCE):
+    """Percentile CIs of the percentages (and mean score) of one job"""
+    draws = resample_counts(rng, job, n_resamples)
+    result = {}
+    if job['n']:
+        pct_low, pct_high = _interval(draws / job['n'] * 100, confidence)
+        result.update(pct_low=pct_low.tolist(), pct_high=pct_high.tolist())
+
+    scores = job['scores']
+    if scores is not None:
+        scored = ~np.isnan(scores)
+        counts = job['counts'][scored]
+        if counts.sum():
+            scored_draws = draws[:, scored]
+            with np.errstate(all='ignore'):
+                means = scored_draws @ scores[scored] / scored_draws.sum(axis=1)
+            mean_low, mean_high = _interval(means, confidence)
+            result.update(mean=float(counts @ scores[scored] / counts.sum()),
+                          mean_low=float(mean_low), mean_high=float(mean_high))
+    return result
+
+
+def _bootstrap_chunk(args):
+    """Worker entry point: resample a chunk of jobs with their own seeds"""
+    keys, jobs, seeds, n_resamples, confidence = args
+    return {key: bootstrap_one(job, np.random.default_rng(seed), n_resamples, confidence)
+            for key, job, seed in zip(keys, jobs, seeds)}
+
+
+@traced()
+def bootstrap_cis(jobs, n_resamples=N_RESAMPLES, confidence=CONFIDENCE, seed=BOOTSTRAP_SEED,
+                  workers=1, chunk_size=64):
+    """Bootstrap every job of ``{key: bootstrap_job(...)}``"""
+    keys = list(jobs)
+    seeds = np.random.SeedSequence(seed).spawn(len(keys))
+    chunks = [(keys[i:i + chunk_size], [jobs[key] for key in keys[i:i + chunk_size]],
+               seeds[i:i + chunk_size], n_resamples, confidence)
+              for i in range(0, len(keys), chunk_size)]
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    results = {}
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_result in pool.map(_bootstrap_chunk, chunks):
+                results.update(chunk_result)
+    else:
+        for chunk in chunks:
+            results.update(_bootstrap_chunk(chunk))
+    return results
+
+
+def format_ci(low, high, digits=1, unit='%'):
+    """'[low–high]' label of an interval"""
+    return f"[{low:.{digits}f}–{high:.{digits}f}{unit}]"
@@ -0,0 +1,134 @@
+"""
+Crosstab engine: every segment x question table from one batched one-hot product, cached as JSON
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from data_processing.data_loader import MERGED_XLSX
+from data_processing.instrumentation import traced
+from data_processing.question_catalog import LIKERT, SINGLE_CHOICE
+from data_processing.response_matrix import matrix_of
+
+CROSSTABS = 'data/processed/crosstabs.json'
+
+# Segmenting variables: (name, catalog code); 'source' is the dataset column itself
+SEGMENTS = [
+    ('Primary role', '014'),
+    ('Country', '003'),
+    ('Experience', '007'),
+    ('Organization size', '012'),
+    ('Source', 'source'),
+]
+
+
+def encode_column(series, responses=None):
+    """Integer codes and labels of a column, missing values as -1"""
+    entry = responses.layout[series.name] if responses is not None else {}
+    if entry.get('kind') == 'category':
+        return responses.codes(series.name), list(entry['labels'])
+    if 'labels' in entry:
+        return responses.observed_codes(series.name, sort=True)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # The Categorical's own codes, not the copy .cat.codes makes
+        return series.array.codes, [str(label) for label in series.cat.categories]
+    codes, uniques = pd.factorize(series, sort=True)
+    return codes, [str(label) for label in uniques]
+
+
+def segment_columns(df, catalog):
+    """(segment name, column) of the segmenting variables present in the dataset"""
+    segments = []
+    for name, code in SEGMENTS:
+        column = code if code == 'source' else catalog.column(code)
+        if column is not None and column in df.columns:
+            segments.append((name, column))
+    return segments
+
+
+def _one_hot_layout(df, columns, responses=None):
+    """Codes shifted into one shared slot range per column (missing gets the last slot)"""
+    codes = np.empty((len(df), len(columns)), dtype=np.int64)
+    layout = []
+    offset = 0
+    for j, col in enumerate(columns):
+        col_codes, labels = encode_column(df[col], responses)
+        col_codes = np.where(col_codes < 0, len(labels), col_codes).astype(np.int64)
+        codes[:, j] = col_codes + offset
+        layout.append((col, offset, labels))
+        offset += len(labels) + 1
+    return codes, layout, offset
+
+
+@traced()
+def build_crosstabs(df, catalog, chunk_size=16384, responses=None):
+    """Count every segment x question table in one pass"""
+    segments = segment_columns(df, catalog)
+    questions = catalog.columns(qtype=[LIKERT, SINGLE_CHOICE])
+
+    seg_codes, seg_layout, seg_slots = _one_hot_layout(df, [col for _, col in segments], responses)
+    q_codes, q_layout, q_slots = _one_hot_layout(df, questions, responses)
+
+    counts = np.zeros((seg_slots, q_slots), dtype=np.int64)
+    for start in range(0, len(df), chunk_size):
+        stop = min(start + chunk_size, len(df))
+        rows = np.arange(stop - start)[:, None]
+        seg_hot = np.zeros((stop - start, seg_slots), dtype=np.float32)
+        seg_hot[rows, seg_codes[start:stop]] = 1
+        q_hot = np.zeros((stop - start, q_slots), dtype=np.float32)
+        q_hot[rows, q_codes[start:stop]] = 1
+        # float32 BLAS is exact here: no cell of one chunk exceeds chunk_size
+        counts += (seg_hot.T @ q_hot).astype(np.int64)
+
+    tables = {}
+    for (name, _), (_, seg_offset, seg_labels) in zip(segments, seg_layout):
+        seg_rows = slice(seg_offset, seg_offset + len(seg_labels))
+        tables[name] = {
+            col: counts[seg_rows, q_offset:q_offset + len(q_labels)].tolist()
+            for col, q_offset, q_labels in q_layout
+        }
+
+    return {
+        'total_rows': len(df),
+        'segments': {name: {'column': col, 'labels': labels}
+                     for (name, col), (_, _, labels) in zip(segments, seg_layout)},
+        'questions': {col: {'labels': labels} for col, _, labels in q_layout},
+        'tables': tables,
+    }
+
+
+def crosstab_frame(crosstabs, segment, question):
+    """One segment x answer table as a DataFrame (segment levels as rows)"""
+    return pd.DataFrame(crosstabs['tables'][segment][question],
+                        index=crosstabs['segments'][segment]['labels'],
+                        columns=crosstabs['questions'][question]['labels'])
+
+
+def save_crosstabs(crosstabs, path=CROSSTABS):
+    """Write the crosstab cache as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(crosstabs, f, ensure_ascii=False)
+    return path
+
+
+def load_crosstabs(path=CROSSTABS, data_path=MERGED_XLSX):
+    """Load the crosstab cache, or None if it is missing or older than the data"""
+    if not os.path.exists(path):
+        return None
+    if os.path.exists(data_path) and os.path.getmtime(path) < os.path.getmtime(data_path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_crosstabs(df, catalog, data_path=MERGED_XLSX, path=None):
+    """Load the cached crosstabs when they match ``df``, otherwise compute and cache them"""
+    path = path or os.path.join(os.path.dirname(data_path), os.path.basename(CROSSTABS))
+    crosstabs = load_crosstabs(path, data_path)
+    questions = set(catalog.columns(qtype=[LIKERT, SINGLE_CHOICE]))
+    if (crosstabs is None or crosstabs['total_rows'] != len(df)
+            or set(crosstabs['questions']) != questions):
+        crosstabs = build_crosstabs(df, catalog, responses=matrix_of(df, data_path))
+        save_crosstabs(crosstabs, path)
+    return crosstabs
@@ -0,0 +1,107 @@
+"""
+Shared loader for the merged survey dataset with a columnar on-disk cache
+"""
+import os
+import pandas as pd
+
+from data_processing.instrumentation import span
+
+MERGED_XLSX = 'data/processed/merged_survey_data.xlsx'
+
+# Submission timestamp headers used by the Portuguese and English form exports
+TIMESTAMP_COLUMNS = ['Carimbo de data/hora', 'Timestamp']
+
+# Cell texts pd.read_excel reads as missing (its default na_values); cells
+# read chunk by chunk with openpyxl are matched against the same list
+NA_STRINGS = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+              '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def cache_path_for(xlsx_path):
+    """Return the Parquet cache path that sits next to an xlsx file"""
+    return os.path.splitext(xlsx_path)[0] + '.parquet'
+
+
+def normalize_column(series, col):
+    """Type a column the same way in every merge path: datetimes for submission timestamps, text otherwise"""
+    if col in TIMESTAMP_COLUMNS:
+        return pd.to_datetime(series, errors='coerce')
+    if series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+        series = series.mask(series.isin(NA_STRINGS))
+        if pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty'):
+            # pd.read_excel reads a whole-number cell as an int, openpyxl as a float
+            series = series.map(lambda value: int(value) if isinstance(value, float) and value.is_integer()
+                                else value)
+    elif pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        if (values == values.round()).all():
+            series = series.astype('Int64')
+    # Free-text columns can mix numbers and strings (e.g. a model name typed as "4")
+    return series.astype('string')
+
+
+def prepare_for_cache(df):
+    """Give every column a stable type so the data round-trips through Parquet"""
+    df = df.copy()
+    for col in df.columns:
+        df[col] = normalize_column(df[col], col)
+    return df
+
+
+def write_cache(df, cache_path):
+    """Write the typed columnar copy of the merged dataset"""
+    try:
+        prepare_for_cache(df).to_parquet(cache_path, index=False)
+    except ImportError as exc:
+        print(f"⚠ Columnar cache not written ({exc}); stages will read the xlsx")
+        return None
+    return cache_path
+
+
+def cache_is_fresh(xlsx_path, cache_path):
+    """Check that the cache exists and is not older than its xlsx source"""
+    if not os.path.exists(cache_path):
+        return False
+    if not os.path.exists(xlsx_path):
+        return True
+    return os.path.getmtime(cache_path) >= os.path.getmtime(xlsx_path)
+
+
+def load_survey_data(xlsx_path=MERGED_XLSX, cache_path=None, ordered_scales=True):
+    """Load the merged survey, preferring the columnar cache over the xlsx"""
+    cache_path = cache_path or cache_path_for(xlsx_path)
+
+    with span('load_survey_data') as load:
+        if ordered_scales:
+            # Imported here: the matrix depends on the catalog, which depends on this module
+            from data_processing.response_matrix import load_response_matrix
+            matrix = load_response_matrix(xlsx_path)
+            if matrix is not None:
+                df = matrix.to_frame()
+                load.set(source='response matrix', rows=len(df), columns=len(df.columns))
+                return df
+
+        df = None
+        if cache_is_fresh(xlsx_path, cache_path):
+            try:
+                df = pd.read_parquet(cache_path)
+                load.set(source='parquet')
+            except (ImportError, OSError, ValueError) as exc:
+                print(f"⚠ Could not read cache {cache_path} ({exc}); falling back to xlsx")
+
+        if df is None:
+            # Cache missing or stale: parse the xlsx once and rebuild the cache
+            df = prepare_for_cache(pd.read_excel(xlsx_path))
+            write_cache(df, cache_path)
+            load.set(source='xlsx')
+
+        if ordered_scales:
+            # Imported here: the catalog module itself depends on this one
+            from data_processing.likert_scales import apply_likert_scales
+            from data_processing.question_catalog import get_question_catalog
+            from data_processing.response_matrix import write_response_matrix
+            with span('apply_likert_scales'):
+                df = apply_likert_scales(df, get_question_catalog(df, data_path=xlsx_path))
+            write_response_matrix(df, xlsx_path)
+        load.set(rows=len(df), columns=len(df.columns))
+    return df
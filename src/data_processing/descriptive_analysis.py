@@ -1,10 +1,28 @@
 """
 Descriptive analysis of survey data with frequency tables
 """
+import argparse
 import pandas as pd
 import numpy as np
 from collections import Counter
+import os
 import re
+import sys
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_processing.bitmap_index import get_bitmap_index
+from data_processing.crosstabs import build_crosstabs, crosstab_frame, get_crosstabs
+from data_processing.data_loader import load_survey_data
+from data_processing.frequency_store import frequency_series, get_frequency_store
+from data_processing.instrumentation import add_arguments, enable, span, traced
+from data_processing.multi_select import answer_counts, build_multi_select_matrices
+from data_processing.quality_screening import kept_respondents, screen_frame
+from data_processing.question_catalog import get_question_catalog
+
+# Question catalog groups that get their own sheet
+FREQUENCY_GROUPS = ['Demographics', 'AI Usage', 'Scrum Activities', 'Benefits',
+                    'Challenges', 'Future Perspectives']
 
 def clean_column_name(col):
     """Shorten column names for better readability"""
@@ -19,20 +37,19 @@ def clean_column_name(col):
     parts = col.split('?')[0].split('\n')
     return parts[0][:80] + '...' if len(parts[0]) > 80 else parts[0]
 
-def analyze_column(df, col_name, top_n=10):
-    """Analyze a single column and return frequency statistics"""
+def analyze_column(df, col_name, top_n=10, freq=None):
+    """Analyze a single column and return frequency statistics (from ``freq`` when given)"""
     
-    # Remove NaN values
-    valid_responses = df[col_name].dropna()
+    if freq is None:
+        # Remove NaN values and count frequencies
+        freq = df[col_name].dropna().value_counts()
     
-    if len(valid_responses) == 0:
+    total_valid = freq.sum()
+    if total_valid == 0:
         return None
     
-    # Count frequencies
-    freq = valid_responses.value_counts()
-    
     # Calculate percentages
-    percentages = (freq / len(valid_responses) * 100).round(2)
+    percentages = (freq / total_valid * 100).round(2)
     
     # Create summary dataframe
     summary = pd.DataFrame({
@@ -55,29 +72,81 @@ def analyze_column(df, col_name, top_n=10):
     
     return summary
 
-def generate_descriptive_statistics(df):
+def generate_descriptive_statistics(df, store=None):
     """Generate comprehensive descriptive statistics"""
     
+    source_counts = frequency_series(store, 'source') if store else df['source'].value_counts()
     stats = {
-        'total_responses': len(df),
+        'total_responses': store['total_rows'] if store else len(df),
         'total_questions': len(df.columns) - 1,  # Excluding source column
-        'response_rate_by_source': df['source'].value_counts().to_dict(),
+        'response_rate_by_source': source_counts.to_dict(),
     }
     
     return stats
 
+def frequency_records(freq, top_n=10, total_valid=None):
+    """(response, frequency, percentage) rows for a column's answer counts, as ``analyze_column`` computes them"""
+    total_valid = int(freq.sum()) if total_valid is None else int(total_valid)
+    if total_valid == 0:
+        return []
+    
+    counts = freq.to_numpy()
+    percentages = np.round(counts / total_valid * 100, 2)
+    rows = [(str(response), int(count), float(pct))
+            for response, count, pct in zip(freq.index[:top_n], counts[:top_n], percentages[:top_n])]
+    
+    if len(counts) > top_n:
+        rows.append(('Others', int(counts[top_n:].sum()), float(percentages[top_n:].sum())))
+    
+    return rows
+
+def _append_header(ws, names):
+    """Write a bold header row to a write-only sheet"""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    
+    cells = []
+    for name in names:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    ws.append(cells)
+
+@traced()
 def create_frequency_tables(input_file='data/processed/merged_survey_data.xlsx', 
-                           output_file='data/processed/frequency_analysis.xlsx'):
+                           output_file='data/processed/frequency_analysis.xlsx', where=None,
+                           exclude_flagged=False):
     """Create detailed frequency tables for all survey questions"""
+    from openpyxl import Workbook
     
     print("Loading merged dataset...")
-    df = pd.read_excel(input_file)
+    df = load_survey_data(input_file)
     
     print(f"Total responses: {len(df)}")
     print(f"Total columns: {len(df.columns)}")
     
+    # Counts shared with the other stages (and kept current by incremental merges)
+    store = get_frequency_store(df, data_path=input_file)
+    catalog = get_question_catalog(df, data_path=input_file)
+    if where is None and not exclude_flagged:
+        # Check-all-that-apply questions are tabulated per option
+        matrices = build_multi_select_matrices(df, catalog)
+    else:
+        # Segment tables are popcounts of the bitmap index, not a refiltered DataFrame
+        index = get_bitmap_index(df, catalog, data_path=input_file)
+        if where is None:
+            selection = index.all()
+        else:
+            selection = index.query(where) if isinstance(where, str) else where
+        if exclude_flagged:
+            selection = selection & kept_respondents(input_file)
+        store = index.frequency_store(selection)
+        matrices = index.multi_select_matrices(selection)
+        label = 'All responses' if where is None else f"Segment {where}"
+        print(f"{label}{' (flagged excluded)' if exclude_flagged else ''}: {store['total_rows']} responses")
+    
     # Generate overall statistics
-    stats = generate_descriptive_statistics(df)
+    stats = generate_descriptive_statistics(df, store)
     print(f"\nDescriptive Statistics:")
     print(f"Total responses: {stats['total_responses']}")
     print(f"Total questions: {stats['total_questions']}")
@@ -85,112 +154,123 @@ def create_frequency_tables(input_file='data/processed/merged_survey_data.xlsx',
     for source, count in stats['response_rate_by_source'].items():
         print(f"  - {source}: {count}")
     
-    # Create Excel writer
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        
-        # Write summary statistics
-        summary_df = pd.DataFrame([
-            ['Total Responses', stats['total_responses']],
-            ['Total Questions', stats['total_questions']],
-            ['', ''],
-            ['Responses by Source', ''],
-        ])
-        
+    # Write-only workbooks stream rows to disk instead of keeping every cell in memory
+    wb = Workbook(write_only=True)
+    
+    # Write summary statistics
+    with span('sheet Summary'):
+        ws = wb.create_sheet('Summary')
+        _append_header(ws, ['Metric', 'Value'])
+        ws.append(['Total Responses', stats['total_responses']])
+        ws.append(['Total Questions', stats['total_questions']])
+        ws.append([None, None])
+        ws.append(['Responses by Source', None])
         for source, count in stats['response_rate_by_source'].items():
-            summary_df = pd.concat([
-                summary_df,
-                pd.DataFrame([[source, count]])
-            ], ignore_index=True)
-        
-        summary_df.columns = ['Metric', 'Value']
-        summary_df.to_excel(writer, sheet_name='Summary', index=False)
-        
-        # Analyze each column (excluding timestamp and source)
-        columns_to_analyze = [col for col in df.columns 
-                             if col not in ['Carimbo de data/hora', 'source']]
-        
-        print(f"\nAnalyzing {len(columns_to_analyze)} questions...")
-        
-        # Create frequency tables for key questions
-        # Group similar questions together
-        
-        # Demographics and background
-        demographic_cols = [col for col in columns_to_analyze if any(x in col.lower() for x in 
-                           ['role', 'experience', 'team size', 'industry', 'country', 'age', 'gender'])]
-        
-        # AI usage patterns
-        usage_cols = [col for col in columns_to_analyze if any(x in col.lower() for x in 
-                     ['which ai', 'how often', 'frequency', 'use ai'])]
-        
-        # Scrum activities
-        scrum_cols = [col for col in columns_to_analyze if any(x in col.lower() for x in 
-                     ['sprint', 'backlog', 'planning', 'retrospective', 'daily'])]
-        
-        # Benefits and challenges
-        benefit_cols = [col for col in columns_to_analyze if any(x in col.lower() for x in 
-                       ['benefit', 'helpful', 'advantage', 'positive'])]
-        
-        challenge_cols = [col for col in columns_to_analyze if any(x in col.lower() for x in 
-                         ['risk', 'problem', 'challenge', 'negative', 'frustration'])]
+            ws.append([source, count])
+    
+    # Analyze each column (excluding timestamps and source)
+    columns_to_analyze = catalog.question_columns()
+    
+    print(f"\nAnalyzing {len(columns_to_analyze)} questions...")
+    
+    # Frequency tables for every question, grouped by the question
+    # catalog (columns.md sections), one sheet per group
+    for group_name in FREQUENCY_GROUPS:
+        cols = catalog.columns(group=group_name)
+        if not cols:
+            continue
         
-        # Process each group
-        groups = {
-            'Demographics': demographic_cols[:20],  # Limit to avoid too many sheets
-            'AI Usage': usage_cols[:20],
-            'Scrum Activities': scrum_cols[:20],
-            'Benefits': benefit_cols[:20],
-            'Challenges': challenge_cols[:20],
-        }
+        print(f"\nProcessing {group_name} ({len(cols)} questions)...")
         
-        for group_name, cols in groups.items():
-            if not cols:
-                continue
-                
-            print(f"\nProcessing {group_name} ({len(cols)} questions)...")
-            
-            # Create a combined sheet for this group
-            combined_df = pd.DataFrame()
-            
+        with span(f'sheet {group_name}', columns=len(cols)) as sheet:
+            ws = None
+            written = 0
             for i, col in enumerate(cols):
-                freq_table = analyze_column(df, col, top_n=15)
+                freq, respondents = answer_counts(col, store, matrices)
+                rows = frequency_records(freq, top_n=15, total_valid=respondents)
+                if not rows:
+                    continue
                 
-                if freq_table is not None:
-                    # Add question header
-                    question_short = clean_column_name(col)
-                    
-                    # Add to combined dataframe
-                    header_df = pd.DataFrame({
-                        'Response': [f"Q{i+1}: {question_short}"],
-                        'Frequency': [''],
-                        'Percentage': ['']
-                    })
-                    
-                    combined_df = pd.concat([combined_df, header_df, freq_table, 
-                                           pd.DataFrame({'Response': [''], 'Frequency': [''], 'Percentage': ['']})], 
-                                          ignore_index=True)
-            
-            if not combined_df.empty:
-                # Write to Excel (sheet name max 31 chars)
-                sheet_name = group_name[:31]
-                combined_df.to_excel(writer, sheet_name=sheet_name, index=False)
-        
-        # Create a detailed frequency table for ALL columns
-        print("\nCreating comprehensive frequency table...")
-        all_freq_data = []
-        
-        for col in columns_to_analyze[:50]:  # Limit to first 50 to avoid huge file
-            freq_table = analyze_column(df, col, top_n=10)
-            if freq_table is not None:
-                freq_table['Question'] = clean_column_name(col)
-                all_freq_data.append(freq_table)
-        
-        if all_freq_data:
-            all_freq_df = pd.concat(all_freq_data, ignore_index=True)
-            all_freq_df = all_freq_df[['Question', 'Response', 'Frequency', 'Percentage']]
-            all_freq_df.to_excel(writer, sheet_name='All Frequencies', index=False)
+                if ws is None:
+                    # Sheet name max 31 chars
+                    ws = wb.create_sheet(group_name[:31])
+                    _append_header(ws, ['Response', 'Frequency', 'Percentage'])
+                
+                # Question header, its answers, then a blank separator row
+                ws.append([f"Q{i+1}: {clean_column_name(col)}", None, None])
+                for row in rows:
+                    ws.append(row)
+                ws.append([None, None, None])
+                written += len(rows) + 2
+            sheet.set(rows=written)
+    
+    # Create a detailed frequency table for ALL columns
+    print("\nCreating comprehensive frequency table...")
+    with span('sheet All Frequencies', columns=len(columns_to_analyze)) as sheet:
+        ws = wb.create_sheet('All Frequencies')
+        _append_header(ws, ['Question', 'Response', 'Frequency', 'Percentage'])
+        written = 0
+        for col in columns_to_analyze:
+            question = clean_column_name(col)
+            freq, respondents = answer_counts(col, store, matrices)
+            for row in frequency_records(freq, top_n=10, total_valid=respondents):
+                ws.append((question,) + row)
+                written += 1
+        sheet.set(rows=written)
+    
+    with span('save workbook'):
+        wb.save(output_file)
     
     print(f"\nFrequency analysis saved to: {output_file}")
     return output_file
 
+@traced()
+def create_crosstab_tables(input_file='data/processed/merged_survey_data.xlsx',
+                           output_file='data/processed/crosstab_analysis.xlsx', exclude_flagged=False):
+    """Write every Likert/single-choice question broken down by each segment"""
+    from openpyxl import Workbook
+    
+    df = load_survey_data(input_file)
+    catalog = get_question_catalog(df, data_path=input_file)
+    if exclude_flagged:
+        # The shared crosstabs cover every respondent, so the kept ones are counted afresh
+        df = screen_frame(df, data_path=input_file)
+        crosstabs = build_crosstabs(df, catalog)
+    else:
+        crosstabs = get_crosstabs(df, catalog, data_path=input_file)
+    
+    wb = Workbook(write_only=True)
+    for segment in crosstabs['segments']:
+        print(f"Writing crosstabs by {segment}...")
+        with span(f'sheet {segment}', columns=len(crosstabs['questions'])):
+            ws = wb.create_sheet(segment[:31])
+            for i, question in enumerate(crosstabs['questions']):
+                frame = crosstab_frame(crosstabs, segment, question)
+                frame = frame[frame.sum(axis=1) > 0]
+                if frame.empty:
+                    continue
+                
+                # Question title, answer header, one row per segment level, blank separator
+                _append_header(ws, [f"Q{i+1}: {clean_column_name(question)}"])
+                ws.append([segment] + list(frame.columns) + ['n'])
+                for level, counts in zip(frame.index, frame.to_numpy()):
+                    ws.append([level] + [int(c) for c in counts] + [int(counts.sum())])
+                ws.append([])
+    
+    with span('save workbook'):
+        wb.save(output_file)
+    print(f"Crosstab analysis saved to: {output_file}")
+    return output_file
+
 if __name__ == "__main__":
-    create_frequency_tables()
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--where', metavar='EXPR',
+                        help='restrict the frequency tables to a segment, e.g. \'014="Scrum Master" & 003=Brazil\' '
+                             '(see bitmap_index)')
+    parser.add_argument('--exclude-flagged', action='store_true',
+                        help='leave out respondents flagged by the quality screening')
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+    create_frequency_tables(where=args.where, exclude_flagged=args.exclude_flagged)
+    create_crosstab_tables(exclude_flagged=args.exclude_flagged)
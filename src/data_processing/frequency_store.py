@@ -0,0 +1,114 @@
+"""
+Shared frequency engine: per-column answer counts persisted as JSON, updated by incremental merges
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from data_processing.data_loader import MERGED_XLSX, TIMESTAMP_COLUMNS
+from data_processing.instrumentation import span
+from data_processing.response_matrix import matrix_of
+
+FREQUENCY_STORE = 'data/processed/frequency_store.json'
+
+
+def count_columns(df, columns=None, responses=None):
+    """Count answers and missing values of every column, one factorize and bincount per column"""
+    if columns is None:
+        columns = [col for col in df.columns if col not in TIMESTAMP_COLUMNS]
+    if len(df) == 0:
+        return {col: {'counts': {}, 'missing': 0} for col in columns}
+
+    with span('count_columns', rows=len(df), columns=len(columns)):
+        return _count_columns(df, columns, responses)
+
+
+def _count_columns(df, columns, responses=None):
+    counted = {}
+    for col in columns:
+        if responses is not None and 'labels' in responses.layout[col]:
+            codes, uniques = responses.observed_codes(col)
+        else:
+            codes, uniques = pd.factorize(df[col], sort=False)
+        # Missing values (-1) go to the slot just after the column's answers
+        codes[codes < 0] = len(uniques)
+        slot_counts = np.bincount(codes, minlength=len(uniques) + 1)
+        counts = {}
+        for value, count in zip(uniques, slot_counts[:len(uniques)]):
+            # Different raw values can share a label (e.g. 5 and '5')
+            key = str(value)
+            counts[key] = counts.get(key, 0) + int(count)
+        counted[col] = {'counts': counts, 'missing': int(slot_counts[len(uniques)])}
+    return counted
+
+
+def build_frequency_store(df, responses=None):
+    """Build a frequency store from the full dataset"""
+    return {'total_rows': len(df), 'columns': count_columns(df, responses=responses)}
+
+
+def update_frequency_store(store, delta_df):
+    """Add the counts of newly appended rows to an existing store"""
+    previous_rows = store['total_rows']
+    for col, delta in count_columns(delta_df).items():
+        entry = store['columns'].setdefault(col, {'counts': {}, 'missing': previous_rows})
+        for value, count in delta['counts'].items():
+            entry['counts'][value] = entry['counts'].get(value, 0) + count
+        entry['missing'] += delta['missing']
+
+    # Columns the new rows do not have are missing for every new row
+    for col, entry in store['columns'].items():
+        if col not in delta_df.columns:
+            entry['missing'] += len(delta_df)
+
+    store['total_rows'] = previous_rows + len(delta_df)
+    return store
+
+
+def frequency_series(store, col, dropna=True):
+    """Answer counts for a column, most frequent first (like value_counts)"""
+    entry = store['columns'][col]
+    freq = pd.Series(entry['counts'], dtype='int64', name='count')
+    if not dropna and entry['missing']:
+        missing = pd.Series([entry['missing']], index=[np.nan], dtype='int64', name='count')
+        freq = pd.concat([freq, missing])
+    return freq.sort_values(ascending=False, kind='stable')
+
+
+def response_count(store, col):
+    """Number of non-missing answers to a column"""
+    return store['total_rows'] - store['columns'][col]['missing']
+
+
+def frequency_store_path_for(data_path):
+    """Frequency store that sits next to the dataset it counts"""
+    return os.path.join(os.path.dirname(data_path), os.path.basename(FREQUENCY_STORE))
+
+
+def save_frequency_store(store, path=FREQUENCY_STORE):
+    """Write the frequency store as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(store, f, ensure_ascii=False)
+    return path
+
+
+def load_frequency_store(path=FREQUENCY_STORE, data_path=MERGED_XLSX):
+    """Load the frequency store, or None if it is missing or older than the data"""
+    if not os.path.exists(path):
+        return None
+    if os.path.exists(data_path) and os.path.getmtime(path) < os.path.getmtime(data_path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_frequency_store(df, data_path=MERGED_XLSX, path=None):
+    """Load the persisted store when it matches ``df``, otherwise count and persist it"""
+    path = path or frequency_store_path_for(data_path)
+    store = load_frequency_store(path, data_path)
+    columns = {col for col in df.columns if col not in TIMESTAMP_COLUMNS}
+    if store is None or store['total_rows'] != len(df) or set(store['columns']) != columns:
+        store = build_frequency_store(df, matrix_of(df, data_path))
+        save_frequency_store(store, path)
+    return store
@@ -0,0 +1,212 @@
+"""
+Opt-in instrumentation for the pipeline scripts: nested spans, a JSON or CSV trace and cProfile dumps
+"""
+import atexit
+import csv
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+TRACE_ENV = 'SURVEY_TRACE'
+PROFILE_ENV = 'SURVEY_PROFILE'
+# Set to 0 to keep timings but skip tracemalloc (which slows allocation-heavy code)
+TRACE_MEMORY_ENV = 'SURVEY_TRACE_MEMORY'
+
+_tracer = None
+
+
+class _NullSpan:
+    """Stand-in returned by ``span`` while instrumentation is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed region; ``set`` attaches counts such as rows or columns"""
+
+    def __init__(self, tracer, name, fields):
+        self.tracer = tracer
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.tracer._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer._exit(self, failed=exc_type is not None)
+        return False
+
+
+class Tracer:
+    """Collects finished spans and writes them out when the process exits"""
+
+    def __init__(self, trace_path=None, profile_path=None, memory=True):
+        self.trace_path = trace_path
+        self.profile_path = profile_path
+        self.memory = memory
+        self.records = []
+        self.stack = []
+        self.started = datetime.now()
+        self.origin = time.perf_counter()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.profiler = None
+        if profile_path:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def span(self, name, **fields):
+        return Span(self, name, fields)
+
+    def _enter(self, span):
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The enclosing span keeps the peak reached so far before it is reset
+            if self.stack:
+                self.stack[-1].mem_peak = max(self.stack[-1].mem_peak, peak)
+            tracemalloc.reset_peak()
+            span.mem_start = span.mem_peak = current
+        span.path = '/'.join([outer.name for outer in self.stack] + [span.name])
+        self.stack.append(span)
+        span.cpu_start = time.process_time()
+        span.wall_start = time.perf_counter()
+
+    def _exit(self, span, failed=False):
+        wall = time.perf_counter() - span.wall_start
+        cpu = time.process_time() - span.cpu_start
+        self.stack.pop()
+
+        record = {
+            'name': span.name,
+            'path': span.path,
+            'depth': len(self.stack),
+            'start_s': round(span.wall_start - self.origin, 6),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+        }
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            span_peak = max(span.mem_peak, peak)
+            record['alloc_peak_kb'] = round((span_peak - span.mem_start) / 1024, 1)
+            record['alloc_net_kb'] = round((current - span.mem_start) / 1024, 1)
+            if self.stack:
+                self.stack[-1].mem_peak = max(self.stack[-1].mem_peak, span_peak)
+        record.update(span.fields)
+        if failed:
+            record['error'] = True
+        self.records.append(record)
+
+    def record(self, name, **fields):
+        """Add a span measured elsewhere (e.g. in a worker process)"""
+        path = '/'.join([outer.name for outer in self.stack] + [name])
+        self.records.append({'name': name, 'path': path, 'depth': len(self.stack), **fields})
+
+    def write(self):
+        """Write the trace and the profile dump"""
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile_path)
+            print(f"✓ Profile saved to: {self.profile_path}", file=sys.stderr)
+        if not self.trace_path:
+            return
+
+        spans = sorted(self.records, key=lambda record: record.get('start_s', float('inf')))
+        if self.trace_path.endswith('.csv'):
+            fields = []
+            for record in spans:
+                fields += [key for key in record if key not in fields]
+            with open(self.trace_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(spans)
+        else:
+            trace = {
+                'started': self.started.isoformat(timespec='seconds'),
+                'argv': sys.argv,
+                'pid': os.getpid(),
+                'memory': self.memory,
+                'spans': spans,
+            }
+            with open(self.trace_path, 'w', encoding='utf-8') as f:
+                json.dump(trace, f, indent=1, ensure_ascii=False, default=str)
+        print(f"✓ Trace saved to: {self.trace_path}", file=sys.stderr)
+
+
+def enable(trace_path=None, profile_path=None, memory=None):
+    """Turn instrumentation on (paths default to the environment variables)"""
+    global _tracer
+    trace_path = trace_path or os.environ.get(TRACE_ENV)
+    profile_path = profile_path or os.environ.get(PROFILE_ENV)
+    if not (trace_path or profile_path):
+        return None
+    if memory is None:
+        memory = os.environ.get(TRACE_MEMORY_ENV, '1') != '0'
+    if _tracer is None:
+        _tracer = Tracer(trace_path, profile_path, memory=memory)
+        atexit.register(_tracer.write)
+    return _tracer
+
+
+def enabled():
+    return _tracer is not None
+
+
+def span(name, **fields):
+    """Context manager timing a region (a no-op while instrumentation is off)"""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, **fields)
+
+
+def record(name, **fields):
+    """Add an externally measured span to the trace"""
+    if _tracer is not None:
+        _tracer.record(name, **fields)
+
+
+def traced(name=None):
+    """Decorator form of ``span``, named after the function by default"""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def add_arguments(parser):
+    """--trace/--profile options for a script's argument parser"""
+    parser.add_argument('--trace', metavar='PATH',
+                        help=f'write a timing/memory trace (.json or .csv; env: {TRACE_ENV})')
+    parser.add_argument('--profile', metavar='PATH',
+                        help=f'write a cProfile dump (env: {PROFILE_ENV})')
+
+
+# Only the main process honours the environment: pool workers inherit it too
+if multiprocessing.parent_process() is None:
+    enable()
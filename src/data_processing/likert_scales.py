@@ -0,0 +1,94 @@
+"""
+Canonical answer scales: Likert-type columns as ordered Categoricals, case and spacing variants folded
+"""
+import re
+import numpy as np
+import pandas as pd
+
+# Scale name (as used by the question catalog) -> answers from lowest to highest
+LIKERT_SCALES = {
+    'usage_frequency': [
+        'Never',
+        'Occasionally (less than once a month)',
+        'Monthly',
+        'Weekly',
+        'Daily or almost daily',
+    ],
+    'agreement': [
+        'Strongly Disagree',
+        'Disagree',
+        'Neutral',
+        'Agree',
+        'Strongly Agree',
+    ],
+    'helpfulness': [
+        # Off the scale (unscored); kept first so it never sorts between two ratings
+        'Not Applicable',
+        'Neutral',
+        'Slightly Helpful',
+        'Helpful',
+        'Very Helpful',
+    ],
+    'yes_no': [
+        'No',
+        'Maybe',
+        'Yes',
+    ],
+    'adoption': [
+        "Don't Plan to Use AI Chat Assistant for This Task",
+        'Plan to Partially Use AI Chat Assistant',
+        'Plan to Mostly Use AI Chat Assistant',
+        'Currently Partially AI Chat Assistant',
+        'Currently Mostly AI Chat Assistant',
+    ],
+}
+
+
+def fold_label(value):
+    """Case- and whitespace-insensitive key of an answer"""
+    return re.sub(r'\s+', ' ', str(value)).strip().casefold()
+
+
+def scale_categories(scale):
+    """Ordered answers of a scale, or None for columns without a registered scale"""
+    return LIKERT_SCALES.get(scale)
+
+
+def to_scale(series, scale):
+    """Convert a column to the ordered Categorical of its scale, off-scale answers last"""
+    categories = list(LIKERT_SCALES[scale])
+    canonical = {fold_label(label): i for i, label in enumerate(categories)}
+
+    codes, uniques = pd.factorize(series, sort=False)
+    unique_codes = np.empty(len(uniques) + 1, dtype=np.int64)
+    for i, value in enumerate(uniques):
+        key = fold_label(value)
+        if key not in canonical:
+            canonical[key] = len(categories)
+            categories.append(str(value).strip())
+        unique_codes[i] = canonical[key]
+    # Missing values (-1) index the trailing slot
+    unique_codes[-1] = -1
+
+    dtype = pd.CategoricalDtype(categories, ordered=True)
+    return pd.Series(pd.Categorical.from_codes(unique_codes[codes], dtype=dtype),
+                     index=series.index, name=series.name)
+
+
+def apply_likert_scales(df, catalog):
+    """Convert every catalog column with a registered scale to its ordered Categorical"""
+    for entry in catalog.entries:
+        if entry['scale'] in LIKERT_SCALES and entry['column'] in df.columns:
+            df[entry['column']] = to_scale(df[entry['column']], entry['scale'])
+    return df
+
+
+# Answers that sit on a scale but carry no score (left out of mean scores)
+UNSCORED_ANSWERS = {'Not Applicable'}
+
+
+def scale_scores(labels, scale):
+    """Score (1 = lowest scale answer) of each label; NaN for unscored or off-scale answers"""
+    scored = [label for label in LIKERT_SCALES.get(scale, []) if label not in UNSCORED_ANSWERS]
+    rank = {label: i + 1 for i, label in enumerate(scored)}
+    return [float(rank.get(label, np.nan)) for label in labels]
@@ -0,0 +1,17 @@
+"""
+Process memory helpers shared by the pipeline scripts
+"""
+import sys
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB (None if unavailable)"""
+    try:
+        import resource
+    except ImportError:  # Windows has no resource module
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
@@ -1,36 +1,465 @@
 """
 Merge survey datasets and create unified Excel file
 """
+import numpy as np
 import pandas as pd
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
 import os
+import sys
+import time
 
-def merge_survey_data():
-    """Merge the two survey datasets into a unified Excel file"""
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_processing.data_loader import (TIMESTAMP_COLUMNS, cache_is_fresh, cache_path_for, load_survey_data,
+                                         normalize_column, prepare_for_cache, write_cache)
+from data_processing.frequency_store import (build_frequency_store, frequency_store_path_for,
+                                             load_frequency_store, save_frequency_store,
+                                             update_frequency_store)
+from data_processing.instrumentation import add_arguments, enable, span, traced
+from data_processing.memory_usage import peak_rss_mb
+from data_processing.likert_scales import apply_likert_scales
+from data_processing.question_catalog import get_question_catalog, write_question_catalog
+from data_processing.schema_alignment import (KNOWN_SOURCES, RAW_DIR, align_headers, discover_sources,
+                                              load_header_map, print_alignment, save_alignment)
+
+# The original exports (the synthetic data is modelled on them); merges read
+# every workbook in data/raw/
+RAW_SOURCES = [(os.path.join(RAW_DIR, name), source) for name, source in KNOWN_SOURCES]
+
+MERGED_OUTPUT = 'data/processed/merged_survey_data.xlsx'
+MERGE_STATE = 'data/processed/merge_state.json'
+
+def read_sources(sources, jobs=0):
+    """Read every raw export, in parallel worker processes when there are several (0 = one per CPU)"""
+    paths = [path for path, _ in sources]
+    workers = min(jobs or os.cpu_count() or 1, len(paths))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(pd.read_excel, paths))
+    return [pd.read_excel(path) for path in paths]
+
+def align_sources(headers_by_source, raw_dir=RAW_DIR):
+    """Align the exports' headers, report what did not match and save the mapping"""
+    columns, renames, unmatched = align_headers(headers_by_source, load_header_map(raw_dir))
+    renames.pop(None, None)
+    unmatched.pop(None, None)
+    print("Aligning columns:")
+    print_alignment(renames, unmatched)
+    save_alignment(renames, unmatched)
+    return columns, renames
+
+@traced()
+def merge_survey_data(raw_dir=RAW_DIR, jobs=0, output_path=MERGED_OUTPUT, state_path=MERGE_STATE):
+    """Merge every survey export in ``raw_dir`` into a unified Excel file"""
+    
+    sources = discover_sources(raw_dir)
+    if not sources:
+        raise FileNotFoundError(f"No survey exports (.xlsx) in {raw_dir}")
     
-    # Read both datasets
-    df1 = pd.read_excel('data/raw/Exploring the Use of AI Chat Assistants in Scrum (respostas).xlsx')
-    df2 = pd.read_excel('data/raw/Exploring the Use of AI Chat Assistants in Scrum - Udemy (Responses).xlsx')
+    # Read all datasets
+    with span('read raw exports', sources=len(sources)) as read:
+        frames = read_sources(sources, jobs)
+        read.set(rows=sum(len(df) for df in frames), columns=sum(len(df.columns) for df in frames))
     
     # Add source column to identify origin
-    df1['source'] = 'Survey 1 (respostas)'
-    df2['source'] = 'Survey 2 (Udemy)'
+    for df, (_, source) in zip(frames, sources):
+        df['source'] = source
     
-    # Merge datasets
-    df_merged = pd.concat([df1, df2], ignore_index=True)
+    # Same question, same column, whatever each form called it
+    columns, renames = align_sources({source: list(df.columns) for df, (_, source) in zip(frames, sources)},
+                                     raw_dir)
+    frames = [df.rename(columns=renames[source]) for df, (_, source) in zip(frames, sources)]
     
-    print(f"Dataset 1 shape: {df1.shape}")
-    print(f"Dataset 2 shape: {df2.shape}")
+    # Merge datasets, typed like the streaming and incremental merges type their chunks
+    df_merged = prepare_for_cache(pd.concat(frames, ignore_index=True).reindex(columns=columns))
+    
+    for df, (_, source) in zip(frames, sources):
+        print(f"{source} shape: {df.shape}")
     print(f"Merged dataset shape: {df_merged.shape}")
     print(f"\nTotal responses: {len(df_merged)}")
-    print(f"Responses from Survey 1: {len(df1)}")
-    print(f"Responses from Survey 2: {len(df2)}")
+    for df, (_, source) in zip(frames, sources):
+        print(f"Responses from {source}: {len(df)}")
     
     # Save merged dataset
-    output_path = 'data/processed/merged_survey_data.xlsx'
-    df_merged.to_excel(output_path, index=False)
+    with span('write merged xlsx', rows=len(df_merged), columns=len(df_merged.columns)):
+        df_merged.to_excel(output_path, index=False)
     print(f"\nMerged dataset saved to: {output_path}")
     
+    # Typed columnar copy so later stages skip the slow xlsx parse
+    with span('write columnar cache'):
+        cache_path = write_cache(df_merged, cache_path_for(output_path))
+    if cache_path:
+        print(f"Columnar cache saved to: {cache_path}")
+    write_question_catalog(list(df_merged.columns), output_path)
+    
+    # Later incremental runs only append rows this state does not cover
+    save_merge_state(advance_merge_state({}, df_merged), state_path)
+    
     return df_merged
 
+def read_header(path):
+    """Read only the header row of a workbook, named the way pd.read_excel names it"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        first_row = next(wb.active.iter_rows(max_row=1, values_only=True), ())
+    finally:
+        wb.close()
+
+    header = []
+    seen = {}
+    for i, name in enumerate(first_row):
+        name = f'Unnamed: {i}' if name is None else str(name)
+        # Duplicate headers get a numeric suffix, as in pandas
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        header.append(name)
+    return header
+
+def iter_workbook_chunks(path, chunk_size):
+    """Yield DataFrame chunks of a workbook without loading the whole sheet"""
+    from openpyxl import load_workbook
+
+    header = read_header(path)
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(min_row=2, values_only=True)
+        chunk = []
+        for row in rows:
+            # Read-only sheets can report trailing formatted-but-empty rows
+            if all(value is None for value in row):
+                continue
+            chunk.append(row[:len(header)])
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        wb.close()
+
+def normalize_chunk(chunk, columns, source):
+    """Align a chunk to the merged column order, tag its source and fix column types"""
+    chunk = chunk.copy()
+    chunk['source'] = source
+    chunk = chunk.reindex(columns=columns)
+    for col in columns:
+        chunk[col] = normalize_column(chunk[col], col)
+    return chunk
+
+def _parquet_schema(columns):
+    """Fixed Parquet schema so every chunk appends to the same file and reads back like the cache"""
+    import pyarrow as pa
+
+    template = pd.DataFrame({col: pd.Series(dtype='datetime64[us]' if col in TIMESTAMP_COLUMNS else 'string')
+                             for col in columns})
+    return pa.Schema.from_pandas(template, preserve_index=False)
+
+def _excel_value(value):
+    """Convert a pandas cell to something openpyxl can write"""
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+@traced()
+def merge_survey_data_streaming(chunk_size=5000, output_path=MERGED_OUTPUT, raw_dir=RAW_DIR,
+                                state_path=MERGE_STATE):
+    """Merge the raw exports chunk by chunk, never holding a full workbook in memory"""
+    from openpyxl import Workbook
+
+    # Aligned union of headers in the same order merge_survey_data produces
+    sources = discover_sources(raw_dir)
+    columns, renames = align_sources({source: read_header(path) + ['source'] for path, source in sources},
+                                     raw_dir)
+
+    cache_path = cache_path_for(output_path)
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        parquet_writer = pq.ParquetWriter(cache_path, _parquet_schema(columns))
+    except ImportError as exc:
+        print(f"⚠ Columnar cache not written ({exc}); stages will read the xlsx")
+        parquet_writer = None
+
+    # Write-only workbooks flush rows to disk as they are appended
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(columns)
+
+    start = time.perf_counter()
+    rows_by_source = {}
+    state = {}
+    try:
+        for path, source in sources:
+            rows_by_source[source] = 0
+            for chunk in iter_workbook_chunks(path, chunk_size):
+                chunk = normalize_chunk(chunk.rename(columns=renames[source]), columns, source)
+                for row in chunk.itertuples(index=False, name=None):
+                    ws.append([_excel_value(value) for value in row])
+                if parquet_writer is not None:
+                    table = pa.Table.from_pandas(chunk, schema=parquet_writer.schema, preserve_index=False)
+                    parquet_writer.write_table(table)
+                rows_by_source[source] += len(chunk)
+                advance_merge_state(state, chunk)
+                print(f"  {source}: {rows_by_source[source]} rows ingested")
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+    wb.save(output_path)
+    if parquet_writer is not None:
+        # The cache must not look older than the xlsx it mirrors
+        os.utime(cache_path)
+    elapsed = time.perf_counter() - start
+    save_merge_state(state, state_path)
+    write_question_catalog(columns, output_path)
+
+    total_rows = sum(rows_by_source.values())
+    stats = {
+        'rows': total_rows,
+        'columns': len(columns),
+        'rows_by_source': rows_by_source,
+        'seconds': elapsed,
+        'rows_per_sec': total_rows / elapsed if elapsed else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+    print(f"\nMerged dataset shape: ({total_rows}, {len(columns)})")
+    for source, count in rows_by_source.items():
+        print(f"Responses from {source}: {count}")
+    print(f"\nMerged dataset saved to: {output_path}")
+    if parquet_writer is not None:
+        print(f"Columnar cache saved to: {cache_path}")
+    print(f"Throughput: {stats['rows_per_sec']:.0f} rows/sec ({elapsed:.2f}s)")
+    if stats['peak_rss_mb'] is not None:
+        print(f"Peak RSS: {stats['peak_rss_mb']:.1f} MB")
+
+    return stats
+
+def submission_timestamps(df):
+    """Submission time of every row, whichever timestamp header its source used"""
+    ts_cols = [col for col in TIMESTAMP_COLUMNS if col in df.columns]
+    if not ts_cols:
+        return pd.Series(pd.NaT, index=df.index)
+    stamps = df[ts_cols].apply(pd.to_datetime, errors='coerce')
+    return stamps.bfill(axis=1).iloc[:, 0]
+
+def row_fingerprint(row):
+    """Content hash of one merged row's answered cells (unaffected by columns added later)"""
+    cells = {col: str(value) for col, value in row.items() if not pd.isna(value)}
+    text = json.dumps(cells, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+def advance_merge_state(state, chunk):
+    """Fold merged rows into the merge state: per source the watermark and the fingerprints of rows at it or undated"""
+    watermarks = state.setdefault('watermarks', {})
+    boundary = state.setdefault('boundary', {})
+    undated = state.setdefault('undated', {})
+    stamps = submission_timestamps(chunk)
+    for source in chunk['source'].dropna().unique():
+        in_source = (chunk['source'] == source).to_numpy()
+        rows, times = chunk[in_source], stamps[in_source]
+        dated = times.notna().to_numpy()
+        if not dated.all():
+            undated.setdefault(source, []).extend(row_fingerprint(row) for _, row in rows[~dated].iterrows())
+        if not dated.any():
+            continue
+        latest = times[dated].max()
+        mark = pd.Timestamp(watermarks[source]) if source in watermarks else None
+        if mark is not None and latest < mark:
+            continue
+        if mark is None or latest > mark:
+            watermarks[source] = latest.isoformat()
+            boundary[source] = []
+        at_latest = (times == latest).to_numpy()
+        boundary.setdefault(source, []).extend(row_fingerprint(row) for _, row in rows[at_latest].iterrows())
+    return state
+
+def unmerged_rows(chunk, mark, at_mark, undated):
+    """Mask of the export rows not merged yet: after the watermark, or at it or undated and not fingerprinted"""
+    stamps = submission_timestamps(chunk)
+    dated = stamps.notna().to_numpy()
+    if mark is None:
+        keep = dated.copy()
+        ambiguous = ~dated
+    else:
+        keep = (stamps > mark).to_numpy().copy()
+        ambiguous = ~dated | (stamps == mark).to_numpy()
+    for position in np.flatnonzero(ambiguous):
+        seen = at_mark if dated[position] else undated
+        fingerprint = row_fingerprint(chunk.iloc[position])
+        if seen[fingerprint]:
+            seen[fingerprint] -= 1
+        else:
+            keep[position] = True
+    return keep
+
+def load_merge_state(path=MERGE_STATE):
+    """Load the per-source watermarks of the last merge, or None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_merge_state(state, path=MERGE_STATE):
+    """Persist the per-source watermarks and the fingerprints of the rows at them"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+
+def append_parquet_rows(cache_path, rows):
+    """Copy the cache's row groups plus the new rows to a new file, or return False if they do not fit"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cache = pq.ParquetFile(cache_path)
+    try:
+        table = pa.Table.from_pandas(rows, schema=cache.schema_arrow, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError):
+        return False
+    tmp_path = cache_path + '.tmp'
+    with pq.ParquetWriter(tmp_path, cache.schema_arrow) as writer:
+        for group in range(cache.num_row_groups):
+            writer.write_table(cache.read_row_group(group))
+        writer.write_table(table)
+    os.replace(tmp_path, cache_path)
+    return True
+
+def write_xlsx_from_cache(cache_path, output_path):
+    """Rewrite the merged workbook from the columnar cache, a row group at a time"""
+    import pyarrow.parquet as pq
+    from openpyxl import Workbook
+
+    cache = pq.ParquetFile(cache_path)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(cache.schema_arrow.names)
+    for group in range(cache.num_row_groups):
+        for row in cache.read_row_group(group).to_pandas().itertuples(index=False, name=None):
+            ws.append([_excel_value(value) for value in row])
+    tmp_path = output_path + '.tmp'
+    wb.save(tmp_path)
+    os.replace(tmp_path, output_path)
+
+def _rewrite_merged(delta, columns, output_path):
+    """Append by rewriting the whole merged dataset (new columns, or files this module cannot append to)"""
+    # Raw labels: the appended rows are plain strings too
+    df_merged = load_survey_data(output_path, ordered_scales=False)
+    df_merged = pd.concat([df_merged.reindex(columns=columns), delta], ignore_index=True)
+    df_merged.to_excel(output_path, index=False)
+    write_cache(df_merged, cache_path_for(output_path))
+    return len(df_merged)
+
+@traced()
+def merge_survey_data_incremental(chunk_size=5000, output_path=MERGED_OUTPUT, state_path=MERGE_STATE,
+                                  raw_dir=RAW_DIR):
+    """Append only the responses not merged yet, and return them"""
+    state = load_merge_state(state_path)
+    if state is None or 'boundary' not in state or not os.path.exists(output_path):
+        # Merge states from before the boundary fingerprints cannot place rows at the watermark
+        print("No previous merge state, running a full merge...")
+        df_merged = merge_survey_data(raw_dir, output_path=output_path, state_path=state_path)
+        catalog = get_question_catalog(df_merged, output_path)
+        save_frequency_store(build_frequency_store(apply_likert_scales(df_merged.copy(), catalog)),
+                             frequency_store_path_for(output_path))
+        return df_merged
+
+    cache_path = cache_path_for(output_path)
+    if not cache_is_fresh(output_path, cache_path):
+        # The cache is what the rows are appended to
+        load_survey_data(output_path, ordered_scales=False)
+    merged_columns = read_header(output_path)
+    try:
+        import pyarrow.parquet as pq
+        merged_rows = pq.ParquetFile(cache_path).metadata.num_rows
+    except (ImportError, OSError):
+        merged_rows = None
+
+    # The merged columns come first, so new exports are aligned to them
+    sources = discover_sources(raw_dir)
+    headers = {None: merged_columns}
+    headers.update((source, read_header(path)) for path, source in sources)
+    columns, renames = align_sources(headers, raw_dir)
+
+    watermarks = state['watermarks']
+    deltas = []
+    for path, source in sources:
+        mark = pd.Timestamp(watermarks[source]) if source in watermarks else None
+        at_mark = Counter(state['boundary'].get(source, []))
+        undated = Counter(state.get('undated', {}).get(source, []))
+        new_rows = new_undated = 0
+        for chunk in iter_workbook_chunks(path, chunk_size):
+            chunk = normalize_chunk(chunk.rename(columns=renames[source]), columns, source)
+            chunk = chunk[unmerged_rows(chunk, mark, at_mark, undated)]
+            if len(chunk):
+                deltas.append(chunk)
+                new_rows += len(chunk)
+                new_undated += int(submission_timestamps(chunk).isna().sum())
+        note = f" ({new_undated} without a timestamp)" if new_undated else ""
+        print(f"  {source}: {new_rows} new responses since {watermarks.get(source, 'the beginning')}{note}")
+
+    if not deltas:
+        print("\nMerged dataset is up to date.")
+        return pd.DataFrame(columns=columns)
+
+    delta = pd.concat(deltas, ignore_index=True)
+    # Counts must describe the rows already merged before deltas can be added
+    store_path = frequency_store_path_for(output_path)
+    store = load_frequency_store(store_path, data_path=output_path)
+    if store is not None and store['total_rows'] != merged_rows:
+        store = None
+
+    if columns == merged_columns and merged_rows is not None and append_parquet_rows(cache_path, delta):
+        total_rows = merged_rows + len(delta)
+        write_xlsx_from_cache(cache_path, output_path)
+        # The cache must not look older than the xlsx it mirrors
+        os.utime(cache_path)
+    else:
+        print("Rewriting the merged dataset (new columns or rows that do not fit the cache)...")
+        total_rows = _rewrite_merged(delta, columns, output_path)
+    catalog = write_question_catalog(columns, output_path)
+
+    # Counts use the canonical scale labels, like every loaded dataset
+    if store is None:
+        store = build_frequency_store(apply_likert_scales(load_survey_data(output_path, ordered_scales=False),
+                                                          catalog))
+    else:
+        store = update_frequency_store(store, apply_likert_scales(delta.copy(), catalog))
+    save_frequency_store(store, store_path)
+
+    save_merge_state(advance_merge_state(state, delta), state_path)
+
+    print(f"\nAppended {len(delta)} responses; merged dataset now has {total_rows} rows")
+    print(f"Merged dataset saved to: {output_path}")
+    return delta
+
 if __name__ == "__main__":
-    df = merge_survey_data()
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--stream', action='store_true',
+                        help='ingest the raw exports in bounded-memory chunks')
+    parser.add_argument('--chunk-size', type=int, default=5000,
+                        help='rows per chunk in streaming/incremental mode (default: 5000)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='append only responses newer than the stored timestamp watermarks')
+    parser.add_argument('--raw-dir', default=RAW_DIR,
+                        help=f'directory whose .xlsx exports are merged (default: {RAW_DIR})')
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='worker processes reading exports (0 = one per CPU; default: 0)')
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+
+    if args.incremental:
+        merge_survey_data_incremental(chunk_size=args.chunk_size, raw_dir=args.raw_dir)
+    elif args.stream:
+        merge_survey_data_streaming(chunk_size=args.chunk_size, raw_dir=args.raw_dir)
+    else:
+        df = merge_survey_data(args.raw_dir, jobs=args.jobs)
@@ -0,0 +1,277 @@
+"""
+Completeness and missingness patterns from one bit-packed not-null matrix
+"""
+import argparse
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_processing.data_loader import MERGED_XLSX, load_survey_data
+from data_processing.instrumentation import add_arguments, enable, span, traced
+from data_processing.multi_select import popcount
+from data_processing.question_catalog import get_question_catalog
+
+MISSINGNESS = 'data/processed/missingness_analysis.xlsx'
+MISSINGNESS_HEATMAP = 'outputs/plots/missingness_patterns.png'
+HEATMAP_DPI = 200
+
+# Response-rate thresholds (%) of the completeness summary
+COMPLETENESS_THRESHOLDS = [90, 80, 70]
+# Patterns shown in the workbook and the heatmap
+TOP_PATTERNS = 30
+
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+class MissingnessMatrix:
+    """Answered (not-null) bits of every respondent, packed along the questions"""
+
+    def __init__(self, columns, packed, column_counts):
+        self.columns = list(columns)
+        self.packed = packed
+        self.column_counts = column_counts
+        self.n_rows = len(packed)
+
+    @classmethod
+    def from_frame(cls, df, columns=None, chunk_size=65536):
+        """Pack the not-null mask of ``columns`` (default: all) a chunk of rows at a time"""
+        columns = list(df.columns) if columns is None else list(columns)
+        packed = np.zeros((len(df), (len(columns) + 7) // 8), dtype=np.uint8)
+        counts = np.zeros(len(columns), dtype=np.int64)
+        frame = df[columns]
+        for start in range(0, len(df), chunk_size):
+            mask = frame.iloc[start:start + chunk_size].notna().to_numpy()
+            counts += mask.sum(axis=0)
+            packed[start:start + len(mask)] = np.packbits(mask, axis=1)
+        return cls(columns, packed, counts)
+
+    def mask(self, rows=slice(None)):
+        """Boolean not-null matrix of the given respondents"""
+        return np.unpackbits(self.packed[rows], axis=1, count=len(self.columns)).astype(bool)
+
+    def chunks(self, chunk_size=65536):
+        """Yield (start, not-null matrix) over the respondents"""
+        for start in range(0, self.n_rows, chunk_size):
+            yield start, self.mask(slice(start, start + chunk_size))
+
+    def completeness(self):
+        """Share of respondents who answered each question"""
+        return self.column_counts / max(self.n_rows, 1)
+
+    def answered(self):
+        """Questions each respondent answered"""
+        return popcount(self.packed, axis=1)
+
+    def threshold_counts(self, thresholds=COMPLETENESS_THRESHOLDS):
+        """Questions whose response rate (%) is above each threshold"""
+        rates = self.completeness() * 100
+        return (rates[:, None] > np.asarray(thresholds, dtype=float)).sum(axis=0)
+
+    def row_hashes(self):
+        """64-bit hash of every packed row (the row itself when it fits in one word)"""
+        width = (self.packed.shape[1] + 7) // 8
+        words = np.zeros((self.n_rows, width * 8), dtype=np.uint8)
+        words[:, :self.packed.shape[1]] = self.packed
+        words = words.view(np.uint64)
+        if width == 1:
+            return words[:, 0]
+        hashes = np.full(self.n_rows, _FNV_OFFSET, dtype=np.uint64)
+        for j in range(width):
+            hashes ^= words[:, j]
+            hashes *= _FNV_PRIME
+        return hashes
+
+    def patterns(self):
+        """(pattern id of every respondent, first respondent of each pattern, respondents per pattern)"""
+        ids, _ = pd.factorize(self.row_hashes())
+        counts = np.bincount(ids)
+        # factorize numbers patterns in order of appearance: pattern k starts at the k-th new hash
+        new = np.ones(self.n_rows, dtype=bool)
+        new[1:] = ids[1:] > np.maximum.accumulate(ids)[:-1]
+        first = np.flatnonzero(new)
+        order = np.argsort(-counts, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        return rank[ids], first[order], counts[order]
+
+    def last_answered(self, chunk_size=65536):
+        """Position of each respondent's last answered question (-1 if none)"""
+        last = np.full(self.n_rows, -1, dtype=np.int64)
+        for start, mask in self.chunks(chunk_size):
+            reverse = np.argmax(mask[:, ::-1], axis=1)
+            last[start:start + len(mask)] = np.where(mask.any(axis=1), len(self.columns) - 1 - reverse, -1)
+        return last
+
+    def skipped_together(self, units, chunk_size=65536):
+        """(respondents who skipped each unit, respondents who skipped each pair of units)"""
+        names = list(dict.fromkeys(units))
+        unit_of = np.array([names.index(unit) for unit in units])
+        order = np.argsort(unit_of, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(unit_of[order]) != 0])
+        pairs = np.zeros((len(names), len(names)), dtype=np.int64)
+        for _, mask in self.chunks(chunk_size):
+            skipped = ~np.logical_or.reduceat(mask[:, order], starts, axis=1)
+            hot = skipped.astype(np.float32)
+            pairs += np.rint(hot.T @ hot).astype(np.int64)
+        return names, np.diag(pairs).copy(), pairs
+
+
+def short_label(entry, width=40):
+    """Question code, or the start of the header for unmapped columns"""
+    return entry['code'] or ' '.join(entry['column'].split())[:width]
+
+
+def question_unit(entry):
+    """Block a question belongs to: its matrix block, else its catalog group"""
+    return f"{entry['block']} ({entry['group']})" if entry['block'] else entry['group']
+
+
+@traced()
+def build_missingness(df, catalog, chunk_size=65536):
+    """Missingness matrix of every answer column (timestamps and source are left out)"""
+    with span('build missingness', rows=len(df)):
+        return MissingnessMatrix.from_frame(df, catalog.question_columns(), chunk_size)
+
+
+def missingness_tables(missing, catalog, top_patterns=TOP_PATTERNS):
+    """DataFrames of question, block, pattern, drop-off and respondent completeness"""
+    n = max(missing.n_rows, 1)
+    entries = [catalog.entry(col) for col in missing.columns]
+    units = [question_unit(entry) for entry in entries]
+
+    questions = pd.DataFrame({
+        'code': [entry['code'] for entry in entries],
+        'question': missing.columns,
+        'block': units,
+        'answered': missing.column_counts,
+        'completeness': np.round(missing.completeness() * 100, 2),
+    })
+
+    names, skipped, pairs = missing.skipped_together(units)
+    blocks = questions.groupby('block', sort=False).agg(questions=('question', 'size'),
+                                                        completeness=('completeness', 'mean'))
+    blocks = blocks.reindex(names).reset_index()
+    blocks['completeness'] = blocks['completeness'].round(2)
+    blocks['skipped_by'] = skipped
+    blocks['skipped_pct'] = np.round(skipped / n * 100, 2)
+    # Row block skipped -> share (%) that also skipped the column block
+    with np.errstate(divide='ignore', invalid='ignore'):
+        together = pd.DataFrame(np.round(np.where(skipped[:, None] > 0, pairs / skipped[:, None] * 100, np.nan), 1),
+                                index=names, columns=names)
+
+    ids, first, counts = missing.patterns()
+    shown = slice(0, top_patterns)
+    pattern_masks = missing.mask(first[shown])
+    unit_index = np.array([names.index(unit) for unit in units])
+    patterns = pd.DataFrame({
+        'pattern': np.arange(1, len(counts[shown]) + 1),
+        'respondents': counts[shown],
+        'percentage': np.round(counts[shown] / n * 100, 2),
+        'answered': pattern_masks.sum(axis=1),
+        'skipped_blocks': ['; '.join(name for k, name in enumerate(names) if not row[unit_index == k].any())
+                           for row in pattern_masks],
+    })
+
+    last = missing.last_answered()
+    stops = np.bincount(last + 1, minlength=len(missing.columns) + 1)
+    remaining = n - np.cumsum(stops)
+    dropoff = pd.DataFrame({
+        'after': ['(nothing answered)'] + [short_label(entry) for entry in entries],
+        'question': [None] + missing.columns,
+        'stopped': stops,
+        'remaining': remaining,
+        'remaining_pct': np.round(remaining / n * 100, 2),
+    })
+    dropoff = dropoff[dropoff['stopped'] > 0].reset_index(drop=True)
+
+    share = missing.answered() / max(len(missing.columns), 1)
+    bins = np.bincount(np.minimum((share * 10).astype(int), 10), minlength=11)
+    respondents = pd.DataFrame({
+        'answered_share': [f'{10 * k}-{10 * k + 9}%' for k in range(10)] + ['100%'],
+        'respondents': bins,
+        'percentage': np.round(bins / n * 100, 2),
+    })
+    return {'questions': questions, 'blocks': blocks, 'together': together, 'patterns': patterns,
+            'dropoff': dropoff, 'respondents': respondents, 'n_patterns': len(counts)}
+
+
+def write_missingness(tables, output_file=MISSINGNESS):
+    """Write the completeness and missingness tables to a workbook"""
+    from data_processing.descriptive_analysis import clean_column_name
+
+    questions = tables['questions'].assign(question=tables['questions']['question'].map(clean_column_name))
+    dropoff = tables['dropoff'].assign(question=tables['dropoff']['question'].map(
+        lambda col: clean_column_name(col) if isinstance(col, str) else None))
+    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        questions.to_excel(writer, sheet_name='Questions', index=False)
+        tables['blocks'].to_excel(writer, sheet_name='Blocks', index=False)
+        tables['together'].to_excel(writer, sheet_name='Skipped Together')
+        tables['patterns'].to_excel(writer, sheet_name='Patterns', index=False)
+        dropoff.to_excel(writer, sheet_name='Drop-off', index=False)
+        tables['respondents'].to_excel(writer, sheet_name='Respondents', index=False)
+    print(f"✓ Missingness analysis saved to: {output_file}")
+    return output_file
+
+
+def plot_missingness_heatmap(missing, catalog, output_file=MISSINGNESS_HEATMAP, top_patterns=TOP_PATTERNS):
+    """Heatmap of the most common missingness patterns (answered questions dark)"""
+    import matplotlib.pyplot as plt
+
+    _, first, counts = missing.patterns()
+    masks = missing.mask(first[:top_patterns])
+    # Unmapped headers can carry emoji the default font lacks
+    labels = [short_label(catalog.entry(col), 20).encode('ascii', 'ignore').decode() for col in missing.columns]
+    fig, ax = plt.subplots(figsize=(max(10, len(labels) * 0.12), max(4, len(masks) * 0.3)))
+    ax.imshow(masks, aspect='auto', cmap='Greys', vmin=0, vmax=1, interpolation='nearest')
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels, rotation=90, fontsize=5)
+    ax.set_yticks(range(len(masks)))
+    ax.set_yticklabels([f"{count} ({count / max(missing.n_rows, 1):.1%})" for count in counts[:top_patterns]],
+                       fontsize=6)
+    ax.set_xlabel('Question')
+    ax.set_ylabel('Respondents with the pattern')
+    ax.set_title(f'Most common missingness patterns ({len(counts)} distinct; answered = dark)')
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    fig.savefig(output_file, dpi=HEATMAP_DPI, bbox_inches='tight')
+    plt.close(fig)
+    print(f"✓ Missingness heatmap saved to: {output_file}")
+    return output_file
+
+
+@traced()
+def analyze_missingness(input_file=MERGED_XLSX, output_file=MISSINGNESS, heatmap=MISSINGNESS_HEATMAP,
+                        top_patterns=TOP_PATTERNS, exclude_flagged=False):
+    """Compute, write and plot the missingness analysis of the merged dataset"""
+    df = load_survey_data(input_file)
+    if exclude_flagged:
+        from data_processing.quality_screening import screen_frame
+        df = screen_frame(df, data_path=input_file)
+        print(f"Flagged responses excluded: {len(df)} kept")
+    catalog = get_question_catalog(df, data_path=input_file)
+    missing = build_missingness(df, catalog)
+    tables = missingness_tables(missing, catalog, top_patterns)
+    write_missingness(tables, output_file)
+    if heatmap:
+        plot_missingness_heatmap(missing, catalog, heatmap, top_patterns)
+
+    print(f"  {len(missing.columns)} questions, {missing.n_rows} respondents, "
+          f"{tables['n_patterns']} distinct missingness patterns")
+    return missing, tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--top-patterns', type=int, default=TOP_PATTERNS,
+                        help=f'patterns in the workbook and heatmap (default: {TOP_PATTERNS})')
+    parser.add_argument('--no-plot', action='store_true', help='skip the heatmap')
+    parser.add_argument('--exclude-flagged', action='store_true',
+                        help='leave out respondents flagged by the quality screening')
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+    analyze_missingness(heatmap=None if args.no_plot else MISSINGNESS_HEATMAP, top_patterns=args.top_patterns,
+                        exclude_flagged=args.exclude_flagged)
@@ -0,0 +1,169 @@
+"""
+Multi-select ("check all that apply") engine: joined selections tokenized into a bit-packed respondent x option matrix
+"""
+import numpy as np
+import pandas as pd
+
+from data_processing.frequency_store import frequency_series, response_count
+from data_processing.instrumentation import span
+from data_processing.question_catalog import MULTI_SELECT
+
+# Number of set bits in every possible byte
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def popcount(packed, axis=-1):
+    """Number of set bits in a packed uint8 array along ``axis``"""
+    if not hasattr(np, 'bitwise_count'):
+        return _POPCOUNT[packed].sum(axis=axis, dtype=np.int64)
+    # NumPy 2 counts bits natively; whole 64-bit words are counted at once
+    packed = np.moveaxis(packed, axis, -1)
+    whole = packed.shape[-1] // 8 * 8
+    words = np.ascontiguousarray(packed[..., :whole]).view(np.uint64)
+    return (np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+            + np.bitwise_count(packed[..., whole:]).sum(axis=-1, dtype=np.int64))
+
+
+def pack_mask(mask):
+    """Pack a boolean respondent mask into bits"""
+    return np.packbits(np.asarray(mask, dtype=bool))
+
+
+def split_selections(text):
+    """Split a joined answer on the commas that are outside parentheses"""
+    fragments = []
+    current = []
+    depth = 0
+    for char in str(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(depth - 1, 0)
+        if char == ',' and depth == 0:
+            fragments.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    fragments.append(''.join(current))
+    return [fragment.strip() for fragment in fragments if fragment.strip()]
+
+
+def learn_continuations(fragment_lists, weights=None, min_support=2):
+    """Map each fragment that continues the option before it to that option"""
+    if weights is None:
+        weights = [1] * len(fragment_lists)
+
+    predecessors = {}
+    occurrences = {}
+    ends_selection = set()
+    for fragments, weight in zip(fragment_lists, weights):
+        if not weight:
+            continue
+        previous = None
+        for fragment in fragments:
+            predecessors.setdefault(fragment, set()).add(previous)
+            occurrences[fragment] = occurrences.get(fragment, 0) + int(weight)
+            previous = fragment
+        if previous is not None:
+            ends_selection.add(previous)
+
+    continuations = {}
+    for fragment, preds in predecessors.items():
+        if len(preds) != 1 or occurrences[fragment] < min_support:
+            continue
+        (previous,) = preds
+        if previous is None:
+            continue
+        # Only ever after ``previous``: a continuation if lower case or ``previous`` never ends a selection
+        if fragment[:1].islower() or (previous not in ends_selection
+                                      and occurrences[previous] >= min_support):
+            continuations[fragment] = previous
+    return continuations
+
+
+def tokenize_selections(fragments, continuations):
+    """Re-join split fragments into the options they belong to"""
+    options = []
+    previous = None
+    for fragment in fragments:
+        if options and continuations.get(fragment) == previous:
+            options[-1] = f'{options[-1]}, {fragment}'
+        else:
+            options.append(fragment)
+        previous = fragment
+    return options
+
+
+class MultiSelectMatrix:
+    """Bit-packed respondent x option indicator matrix of one multi-select column"""
+
+    def __init__(self, column, options, bits, answered, n_rows):
+        self.column = column
+        self.options = options
+        self.bits = bits
+        self.answered = answered
+        self.n_rows = n_rows
+
+    @classmethod
+    def from_series(cls, series, column=None):
+        """Tokenize a column of joined selections, each distinct answer once"""
+        codes, uniques = pd.factorize(series, sort=False)
+        fragment_lists = [split_selections(value) for value in uniques]
+        respondents_per_answer = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        continuations = learn_continuations(fragment_lists, respondents_per_answer)
+
+        vocabulary = {}
+        unique_options = []
+        for fragments in fragment_lists:
+            options = tokenize_selections(fragments, continuations)
+            unique_options.append([vocabulary.setdefault(option, len(vocabulary)) for option in options])
+
+        # Distinct answer x option indicators, plus a trailing all-False row for missing (-1)
+        by_unique = np.zeros((len(uniques) + 1, len(vocabulary)), dtype=bool)
+        for i, option_ids in enumerate(unique_options):
+            by_unique[i, option_ids] = True
+
+        bits = np.zeros((len(vocabulary), (len(series) + 7) // 8), dtype=np.uint8)
+        for j in range(len(vocabulary)):
+            bits[j] = np.packbits(by_unique[:, j][codes])
+        answered = np.packbits(by_unique.any(axis=1)[codes])
+        return cls(column if column is not None else series.name, list(vocabulary), bits, answered, len(series))
+
+    def segment(self, mask):
+        """Matrix restricted to the respondents selected by a boolean mask"""
+        packed = pack_mask(mask)
+        return MultiSelectMatrix(self.column, self.options, self.bits & packed,
+                                 self.answered & packed, self.n_rows)
+
+    def respondents(self):
+        """Number of respondents who selected at least one option"""
+        return int(popcount(self.answered))
+
+    def counts(self):
+        """Respondents per option, most selected first (like value_counts)"""
+        counts = pd.Series(popcount(self.bits, axis=1), index=self.options, dtype='int64', name='count')
+        return counts.sort_values(ascending=False, kind='stable')
+
+    def indicators(self):
+        """Dense boolean respondent x option matrix"""
+        return np.unpackbits(self.bits, axis=1, count=self.n_rows).T.astype(bool)
+
+    def co_selection(self):
+        """Option x option table of respondents who selected both options"""
+        indicators = self.indicators().astype(np.int32)
+        return pd.DataFrame(indicators.T @ indicators, index=self.options, columns=self.options)
+
+
+def build_multi_select_matrices(df, catalog):
+    """Tokenize every multi-select question of the catalog"""
+    columns = catalog.columns(qtype=MULTI_SELECT)
+    with span('build_multi_select_matrices', rows=len(df), columns=len(columns)):
+        return {col: MultiSelectMatrix.from_series(df[col], col) for col in columns}
+
+
+def answer_counts(col, store, matrices):
+    """(counts, respondents) of a question, per option for multi-select questions"""
+    if col in matrices:
+        matrix = matrices[col]
+        return matrix.counts(), matrix.respondents()
+    return frequency_series(store, col), response_count(store, col)
@@ -0,0 +1,326 @@
+"""
+Response-quality screening: flags respondents to leave out of the analyses
+"""
+import argparse
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_processing.bitmap_index import Bitmap
+from data_processing.data_loader import MERGED_XLSX, TIMESTAMP_COLUMNS, load_survey_data
+from data_processing.instrumentation import add_arguments, enable, span, traced
+from data_processing.question_catalog import LIKERT, get_question_catalog
+from data_processing.response_matrix import ResponseMatrix, load_response_matrix
+
+QUALITY_REPORT = 'data/processed/quality_screening.xlsx'
+
+CONSENT_CODE = '002'
+SCRUM_EXPERIENCE_CODE = '013'
+# Adoption matrices of the Scrum artifacts, events and roles (034-090)
+STRAIGHT_LINE_BLOCKS = ('034-053', '056-075', '078-090')
+
+# Answers to a straight-lined block before it counts (a few equal answers are plausible)
+MIN_STRAIGHT_LINE_ITEMS = 10
+# Answered questions before two identical submissions count as duplicates
+MIN_DUPLICATE_ANSWERS = 10
+# Submissions of one source closer than this are flagged
+RAPID_REPEAT_SECONDS = 60
+
+FLAGS = ['no_consent', 'not_scrum', 'duplicate', 'straight_lining', 'rapid_repeat']
+# Rapid repeats are only reported: a class filling in the form together submits seconds apart
+DEFAULT_EXCLUDE = ('no_consent', 'not_scrum', 'duplicate', 'straight_lining')
+# Parquet schema key that keeps the chosen exclude set with the flag table
+EXCLUDE_METADATA_KEY = b'quality_exclude'
+
+# Answers that decline consent or deny Scrum experience (compared case-insensitively)
+DECLINE_LABELS = {
+    CONSENT_CODE: ['No, I do not agree (end of survey)'],
+    SCRUM_EXPERIENCE_CODE: ['No, I have never worked in one'],
+}
+
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def _declined(matrix, catalog, code):
+    """Respondents who gave one of the ``DECLINE_LABELS`` answers of a question"""
+    col = catalog.column(code)
+    if col is None or col not in matrix.layout or 'labels' not in matrix.layout[col]:
+        return np.zeros(matrix.n_rows, dtype=bool)
+    declines = {' '.join(label.split()).casefold() for label in DECLINE_LABELS[code]}
+    refusals = [k for k, label in enumerate(matrix.labels(col)) if ' '.join(label.split()).casefold() in declines]
+    return np.isin(matrix.codes(col), refusals)
+
+
+def straight_lining(matrix, catalog, min_items=MIN_STRAIGHT_LINE_ITEMS):
+    """(flag, answered items, answer variance) over the Likert items of the task blocks"""
+    columns = [col for block in STRAIGHT_LINE_BLOCKS for col in catalog.columns(block=block, qtype=LIKERT)
+               if col in matrix.layout]
+    count = np.zeros(matrix.n_rows, dtype=np.int64)
+    total = np.zeros(matrix.n_rows, dtype=np.int64)
+    squares = np.zeros(matrix.n_rows, dtype=np.int64)
+    for col in columns:
+        codes = matrix.codes(col).astype(np.int64)
+        answered = codes >= 0
+        codes = np.where(answered, codes, 0)
+        count += answered
+        total += codes
+        squares += codes * codes
+    spread = count * squares - total * total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.where(count > 0, spread / (count * count).astype(float), np.nan)
+    return (count >= min_items) & (spread == 0), count, variance
+
+
+def answer_hashes(matrix, columns):
+    """64-bit FNV-1a hash of every respondent's answer codes, plus the number of answered columns"""
+    hashes = np.full(matrix.n_rows, _FNV_OFFSET, dtype=np.uint64)
+    answered = np.zeros(matrix.n_rows, dtype=np.int64)
+    for col in columns:
+        codes = matrix.codes(col).astype(np.int64)
+        answered += codes >= 0
+        hashes ^= (codes + 1).astype(np.uint64)
+        hashes *= _FNV_PRIME
+    return hashes, answered
+
+
+def duplicates(matrix, min_answers=MIN_DUPLICATE_ANSWERS):
+    """(flag, position of the first identical submission or -1) of every respondent"""
+    columns = [col for col in matrix.columns if col != 'source' and 'labels' in matrix.layout[col]]
+    hashes, answered = answer_hashes(matrix, columns)
+    eligible = np.flatnonzero(answered >= min_answers)
+    # A shared hash only makes rows candidates; they are compared code by code
+    candidates = eligible[pd.Series(hashes[eligible]).duplicated(keep=False).to_numpy()]
+    flag = np.zeros(matrix.n_rows, dtype=bool)
+    duplicate_of = np.full(matrix.n_rows, -1, dtype=np.int64)
+    if len(candidates):
+        codes = pd.DataFrame({col: matrix.codes(col)[candidates] for col in columns})
+        groups = codes.groupby(columns, sort=False).ngroup().to_numpy()
+        repeated = pd.Series(groups).duplicated().to_numpy()
+        # ngroup numbers groups in order of appearance, so group k starts at the k-th first occurrence
+        first = candidates[~repeated]
+        flag[candidates] = repeated
+        duplicate_of[candidates[repeated]] = first[groups[repeated]]
+    return flag, duplicate_of
+
+
+def submission_times(matrix):
+    """Submission timestamp of every respondent (the form exports name the column differently)"""
+    times = np.full(matrix.n_rows, np.datetime64('NaT'), dtype='datetime64[us]')
+    for col in TIMESTAMP_COLUMNS:
+        if col in matrix.values:
+            values = np.asarray(matrix.values[col]).astype('datetime64[us]')
+            times = np.where(np.isnat(times), values, times)
+    return times
+
+
+def rapid_repeats(matrix, seconds=RAPID_REPEAT_SECONDS):
+    """(flag, seconds since the previous submission of the same source) of every respondent"""
+    times = submission_times(matrix)
+    source = matrix.codes('source').astype(np.int64) if 'source' in matrix.layout else np.zeros(matrix.n_rows)
+    gaps = np.full(matrix.n_rows, np.nan)
+    known = np.flatnonzero(~np.isnat(times))
+    if len(known) > 1:
+        order = known[np.lexsort((times[known], source[known]))]
+        elapsed = np.diff(times[order]).astype('timedelta64[us]').astype(np.int64) / 1e6
+        same_source = source[order][1:] == source[order][:-1]
+        gaps[order[1:]] = np.where(same_source, elapsed, np.nan)
+    with np.errstate(invalid='ignore'):
+        return gaps < seconds, gaps
+
+
+@traced()
+def screen_responses(matrix, catalog, min_straight_line_items=MIN_STRAIGHT_LINE_ITEMS,
+                     min_duplicate_answers=MIN_DUPLICATE_ANSWERS, rapid_repeat_seconds=RAPID_REPEAT_SECONDS):
+    """Quality flags of every respondent, in dataset order (one boolean column per ``FLAGS`` entry)"""
+    with span('screen responses', rows=matrix.n_rows):
+        straight, items, variance = straight_lining(matrix, catalog, min_straight_line_items)
+        duplicate, duplicate_of = duplicates(matrix, min_duplicate_answers)
+        rapid, gaps = rapid_repeats(matrix, rapid_repeat_seconds)
+        return pd.DataFrame({
+            'no_consent': _declined(matrix, catalog, CONSENT_CODE),
+            'not_scrum': _declined(matrix, catalog, SCRUM_EXPERIENCE_CODE),
+            'duplicate': duplicate,
+            'straight_lining': straight,
+            'rapid_repeat': rapid,
+            'duplicate_of': duplicate_of,
+            'likert_items': items,
+            'likert_variance': variance,
+            'seconds_since_previous': gaps,
+        })
+
+
+def flagged_mask(flags, exclude=None):
+    """Respondents carrying any of the ``exclude`` flags (default: the set saved with the flags)"""
+    exclude = flags.attrs.get('exclude', DEFAULT_EXCLUDE) if exclude is None else exclude
+    unknown = [flag for flag in exclude if flag not in FLAGS]
+    if unknown:
+        raise KeyError(f"Unknown quality flag(s): {', '.join(unknown)}")
+    if not exclude:
+        return np.zeros(len(flags), dtype=bool)
+    return flags[list(exclude)].to_numpy().any(axis=1)
+
+
+def quality_flags_path_for(xlsx_path):
+    """Flag table that sits next to the dataset"""
+    return os.path.splitext(xlsx_path)[0] + '.quality.parquet'
+
+
+def save_quality_flags(flags, path, exclude=DEFAULT_EXCLUDE):
+    """Write the flag table with the exclude set in its schema metadata"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(flags, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[EXCLUDE_METADATA_KEY] = json.dumps(list(exclude)).encode('utf-8')
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+    flags.attrs['exclude'] = tuple(exclude)
+    return path
+
+
+def saved_exclude(path):
+    """Exclude set saved with a flag table (even a stale one), or None"""
+    try:
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(path).metadata or {}
+    except (ImportError, OSError, ValueError):
+        return None
+    if EXCLUDE_METADATA_KEY not in metadata:
+        return None
+    return tuple(flag for flag in json.loads(metadata[EXCLUDE_METADATA_KEY]) if flag in FLAGS)
+
+
+def load_quality_flags(data_path=MERGED_XLSX, path=None):
+    """The persisted flag table, or None if it is missing or older than the data"""
+    path = path or quality_flags_path_for(data_path)
+    if not os.path.exists(path):
+        return None
+    if os.path.exists(data_path) and os.path.getmtime(path) < os.path.getmtime(data_path):
+        return None
+    try:
+        flags = pd.read_parquet(path)
+    except (ImportError, OSError, ValueError):
+        return None
+    exclude = saved_exclude(path)
+    flags.attrs['exclude'] = DEFAULT_EXCLUDE if exclude is None else exclude
+    return flags
+
+
+def open_response_matrix(data_path=MERGED_XLSX):
+    """The memory-mapped response matrix, encoding the dataset when the matrix must be (re)built"""
+    matrix = load_response_matrix(data_path)
+    if matrix is None:
+        # Loading writes the matrix for the next reader
+        matrix = ResponseMatrix.from_frame(load_survey_data(data_path))
+    return matrix
+
+
+def get_quality_flags(data_path=MERGED_XLSX, path=None):
+    """Load the persisted flags when they are current, otherwise screen the dataset and persist them"""
+    path = path or quality_flags_path_for(data_path)
+    flags = load_quality_flags(data_path, path)
+    if flags is None:
+        matrix = open_response_matrix(data_path)
+        catalog = get_question_catalog(pd.DataFrame(columns=matrix.columns), data_path=data_path)
+        flags = screen_responses(matrix, catalog)
+        # A rescreen keeps the exclude set chosen last time
+        exclude = saved_exclude(path) if os.path.exists(path) else None
+        save_quality_flags(flags, path, DEFAULT_EXCLUDE if exclude is None else exclude)
+    return flags
+
+
+def kept_respondents(data_path=MERGED_XLSX, exclude=None):
+    """Respondents without any of the ``exclude`` flags, as a ``Bitmap`` selection"""
+    return Bitmap.from_mask(~flagged_mask(get_quality_flags(data_path), exclude))
+
+
+def screen_frame(df, data_path=MERGED_XLSX, exclude=None):
+    """Rows of the loaded dataset without any of the ``exclude`` flags (default: the saved set)"""
+    flags = get_quality_flags(data_path)
+    if len(flags) != len(df):
+        raise ValueError(f"Quality flags cover {len(flags)} rows but the dataset has {len(df)}")
+    return df[~flagged_mask(flags, exclude)].reset_index(drop=True)
+
+
+def write_screening_report(flags, matrix, exclude=None, output_file=QUALITY_REPORT):
+    """Write the flag counts and every flagged respondent to a workbook"""
+    exclude = flags.attrs.get('exclude', DEFAULT_EXCLUDE) if exclude is None else exclude
+    from openpyxl import Workbook
+    from data_processing.descriptive_analysis import _append_header
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Summary')
+    _append_header(ws, ['Flag', 'Respondents', 'Percentage', 'Excluded'])
+    total = max(len(flags), 1)
+    for flag in FLAGS:
+        count = int(flags[flag].sum())
+        ws.append([flag, count, round(count / total * 100, 2), 'yes' if flag in exclude else 'no'])
+    excluded = int(flagged_mask(flags, exclude).sum())
+    ws.append(['excluded (any)', excluded, round(excluded / total * 100, 2), None])
+    ws.append(['kept', len(flags) - excluded, round((len(flags) - excluded) / total * 100, 2), None])
+
+    ws = wb.create_sheet('Flagged Respondents')
+    # Rows are numbered as in merged_survey_data.xlsx (row 1 is the header)
+    _append_header(ws, ['Row', 'Source', 'Submitted'] + FLAGS
+                   + ['Duplicate of row', 'Likert items', 'Likert variance', 'Seconds since previous'])
+    rows = np.flatnonzero(flags[FLAGS].to_numpy().any(axis=1))
+    source = matrix.series('source') if 'source' in matrix.layout else pd.Series([None] * matrix.n_rows)
+    times = submission_times(matrix)
+    for row in rows:
+        record = flags.iloc[row]
+        submitted = pd.Timestamp(times[row]).to_pydatetime() if not np.isnat(times[row]) else None
+        ws.append([int(row) + 2, source.iloc[row], submitted]
+                  + ['yes' if record[flag] else None for flag in FLAGS]
+                  + [int(record['duplicate_of']) + 2 if record['duplicate_of'] >= 0 else None,
+                     int(record['likert_items']),
+                     None if pd.isna(record['likert_variance']) else round(float(record['likert_variance']), 3),
+                     None if pd.isna(record['seconds_since_previous'])
+                     else round(float(record['seconds_since_previous']), 1)])
+
+    wb.save(output_file)
+    print(f"✓ Quality screening saved to: {output_file}")
+    return output_file
+
+
+@traced()
+def screen_survey(input_file=MERGED_XLSX, output_file=QUALITY_REPORT, exclude=None, **options):
+    """Screen the merged dataset, persist the flag table next to it and write the workbook"""
+    path = quality_flags_path_for(input_file)
+    if exclude is None:
+        exclude = saved_exclude(path) if os.path.exists(path) else None
+    exclude = DEFAULT_EXCLUDE if exclude is None else exclude
+    matrix = open_response_matrix(input_file)
+    catalog = get_question_catalog(pd.DataFrame(columns=matrix.columns), data_path=input_file)
+    flags = screen_responses(matrix, catalog, **options)
+    save_quality_flags(flags, path, exclude)
+
+    print(f"Screened {len(flags)} responses:")
+    for flag in FLAGS:
+        marker = '' if flag in exclude else '  (reported only)'
+        print(f"  - {flag}: {int(flags[flag].sum())}{marker}")
+    excluded = int(flagged_mask(flags, exclude).sum())
+    print(f"  {excluded} flagged for exclusion, {len(flags) - excluded} kept")
+    write_screening_report(flags, matrix, exclude, output_file)
+    return flags
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--exclude', nargs='*', choices=FLAGS,
+                        help=f"flags that exclude a respondent, saved for every later --exclude-flagged run; "
+                             f"none to keep everyone (default: the previous choice, initially "
+                             f"{' '.join(DEFAULT_EXCLUDE)})")
+    parser.add_argument('--min-straight-line-items', type=int, default=MIN_STRAIGHT_LINE_ITEMS,
+                        help=f'answered task items before straight-lining counts (default: {MIN_STRAIGHT_LINE_ITEMS})')
+    parser.add_argument('--rapid-repeat-seconds', type=float, default=RAPID_REPEAT_SECONDS,
+                        help=f'gap between submissions flagged as rapid (default: {RAPID_REPEAT_SECONDS})')
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+    screen_survey(exclude=args.exclude, min_straight_line_items=args.min_straight_line_items,
+                  rapid_repeat_seconds=args.rapid_repeat_seconds)
@@ -0,0 +1,239 @@
+"""
+Question catalog: every survey column's columns.md code, group, question type and answer scale
+"""
+import json
+import os
+import re
+
+from data_processing.data_loader import MERGED_XLSX, TIMESTAMP_COLUMNS
+from data_processing.instrumentation import traced
+
+COLUMNS_MD = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'columns.md')
+
+# Question types
+LIKERT = 'likert'
+MULTI_SELECT = 'multi_select'
+SINGLE_CHOICE = 'single_choice'
+OPEN_TEXT = 'open_text'
+TIMESTAMP = 'timestamp'
+METADATA = 'metadata'
+
+# (code or code range, header prefix pattern, group, question type, answer scale)
+# Patterns are matched against the start of the normalized header, so a word
+# inside another question's text (e.g. 'age' in 'management') cannot match.
+QUESTION_RULES = [
+    ('002', r'do you agree to participate', 'Demographics', SINGLE_CHOICE, 'consent'),
+    ('003', r'in what country', 'Demographics', SINGLE_CHOICE, None),
+    ('004', r'what is your age group', 'Demographics', SINGLE_CHOICE, 'age_group'),
+    ('005', r'what is your academic education', 'Demographics', SINGLE_CHOICE, None),
+    ('006', r'how do you consider your knowledge level in scrum', 'Demographics', SINGLE_CHOICE, 'knowledge_level'),
+    ('007', r'what is your experience in years', 'Demographics', SINGLE_CHOICE, 'experience_years'),
+    ('008', r'do you hold any of the following scrum-role certifications', 'Demographics', MULTI_SELECT, None),
+    ('009', r'do you hold any of the following agile', 'Demographics', MULTI_SELECT, None),
+    ('010', r'what is the name of the organization', 'Demographics', OPEN_TEXT, None),
+    ('011', r"what is your organization.s main industry", 'Demographics', SINGLE_CHOICE, None),
+    ('012', r'what is the size of the organization', 'Demographics', SINGLE_CHOICE, 'organization_size'),
+    ('013', r'have you worked in a scrum initiative', 'Demographics', SINGLE_CHOICE, 'scrum_experience'),
+    ('014', r'what is your primary role', 'Demographics', SINGLE_CHOICE, None),
+    ('015', r'what is the main application domain', 'Demographics', SINGLE_CHOICE, None),
+    ('016', r'what is the main problem domain', 'Demographics', SINGLE_CHOICE, None),
+    ('017', r'how many members are there in the scrum team', 'Demographics', SINGLE_CHOICE, 'team_size'),
+    ('018', r'how long has the product been', 'Demographics', SINGLE_CHOICE, 'product_age'),
+    ('019', r'in the last 6 months, have you employed', 'AI Usage', SINGLE_CHOICE, 'yes_no'),
+    ('020', r'how often do you use ai chat assistants', 'AI Usage', LIKERT, 'usage_frequency'),
+    ('021', r'how do you consider your knowledge level in the use of ai', 'AI Usage', SINGLE_CHOICE, 'knowledge_level'),
+    ('022', r'which ai chat assistants do you currently use', 'AI Usage', MULTI_SELECT, None),
+    ('023', r'if you know which model', 'AI Usage', OPEN_TEXT, None),
+    ('024', r'how do you usually interact with ai chat assistants', 'AI Usage', MULTI_SELECT, None),
+    ('025', r'does your organization have a formal policy', 'AI Usage', SINGLE_CHOICE, None),
+    ('026', r'how formally do you use ai chat assistants', 'AI Usage', SINGLE_CHOICE, None),
+    ('027', r'on average, how much time per day', 'AI Usage', SINGLE_CHOICE, 'time_per_day'),
+    ('028-032', r'in what ways have you used ai chat assistants to learn', 'Scrum Activities', LIKERT, 'adoption'),
+    ('033', r'is there any other task .*(learning|exploring)', 'Scrum Activities', OPEN_TEXT, None),
+    ('034-053', r'in what ways do you use ai chat assistants to support your work with scrum artifacts',
+     'Scrum Activities', LIKERT, 'adoption'),
+    ('054', r'is there any other task .*scrum artifacts', 'Scrum Activities', OPEN_TEXT, None),
+    ('055', r'can you share one .*scrum artifacts', 'Scrum Activities', OPEN_TEXT, None),
+    ('056-075', r'in what ways do you use ai chat assistants to support your work with scrum events',
+     'Scrum Activities', LIKERT, 'adoption'),
+    ('076', r'is there any other task .*scrum events', 'Scrum Activities', OPEN_TEXT, None),
+    ('077', r'can you share one .*scrum events', 'Scrum Activities', OPEN_TEXT, None),
+    ('078-090', r'in what ways do you use ai chat assistants to support your work with other agile management',
+     'Scrum Activities', LIKERT, 'adoption'),
+    ('091', r'is there any other task .*other agile management', 'Scrum Activities', OPEN_TEXT, None),
+    ('092', r'can you share one .*other agile management', 'Scrum Activities', OPEN_TEXT, None),
+    ('093-095', r'to what extent are ai chat assistants helpful', 'Benefits', LIKERT, 'helpfulness'),
+    ('096', r'what benefits have you already experienced', 'Benefits', MULTI_SELECT, None),
+    ('097', r'do you agree that ai chatbots help you perform', 'Benefits', SINGLE_CHOICE, 'yes_no'),
+    ('098-102', r'to what extent do you agree with the following statements about the benefits',
+     'Benefits', LIKERT, 'agreement'),
+    ('103', r'please describe positive example', 'Benefits', OPEN_TEXT, None),
+    ('104', r'when using ai chat assistants for scrum management tasks, which of the following problems',
+     'Challenges', MULTI_SELECT, None),
+    ('105', r'in your opinion, what is the biggest risk', 'Challenges', OPEN_TEXT, None),
+    ('106-109', r'do you believe intensive use of ai chat assistants could cause', 'Challenges', LIKERT, 'agreement'),
+    ('110', r'please describe negative example', 'Challenges', OPEN_TEXT, None),
+    ('111', r'do you agree that ai chatbots rarely help', 'Challenges', SINGLE_CHOICE, 'yes_no'),
+    ('112', r'looking ahead, how do you imagine', 'Future Perspectives', SINGLE_CHOICE, None),
+    ('113', r'do you believe ai could replace', 'Future Perspectives', MULTI_SELECT, None),
+    ('114', r'what new skills do you believe', 'Future Perspectives', OPEN_TEXT, None),
+    ('115', r'please add any further comments', 'Future Perspectives', OPEN_TEXT, None),
+]
+
+_COMPILED_RULES = [(code, re.compile(pattern), group, qtype, scale)
+                   for code, pattern, group, qtype, scale in QUESTION_RULES]
+
+
+def normalize_header(text):
+    """Lower-case a header and collapse line breaks and repeated spaces"""
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+
+def parse_column_codes(path=COLUMNS_MD):
+    """Read the code -> description index from columns.md"""
+    labels = {}
+    if not os.path.exists(path):
+        return labels
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            match = re.match(r'^(\d{3}(?:-\d{3})?): (.+)$', line.strip())
+            # The metadata section reuses code 105 for 'source'; keep the question
+            if match:
+                labels.setdefault(match.group(1), match.group(2))
+    return labels
+
+
+def _item_label(column):
+    """Sub-item text of a matrix question ('[...]' part of the header)"""
+    match = re.search(r'\[(.*?)\]', column)
+    return match.group(1).strip() if match else None
+
+
+def _block_codes(code_range, n_items):
+    """Codes for the items of a matrix block, or '<start>.<item>' when there are more items than codes"""
+    start, end = (int(part) for part in code_range.split('-'))
+    if n_items <= end - start + 1:
+        return [f'{start + i:03d}' for i in range(n_items)]
+    return [f'{start:03d}.{i + 1:02d}' for i in range(n_items)]
+
+
+@traced()
+def build_question_catalog(columns, labels=None):
+    """Match every column header to its question code and metadata"""
+    labels = parse_column_codes() if labels is None else labels
+
+    entries = []
+    block_members = {}
+    for column in columns:
+        entry = {'column': column, 'code': None, 'label': None, 'group': 'Unmapped',
+                 'block': None, 'qtype': OPEN_TEXT, 'scale': None}
+        if column in TIMESTAMP_COLUMNS:
+            entry.update(code='001', label=labels.get('001'), group='Metadata', qtype=TIMESTAMP)
+        elif column == 'source':
+            entry.update(label='Origin of response', group='Metadata', qtype=METADATA)
+        else:
+            header = normalize_header(column)
+            for code, pattern, group, qtype, scale in _COMPILED_RULES:
+                if pattern.match(header):
+                    entry.update(group=group, qtype=qtype, scale=scale)
+                    if '-' in code:
+                        entry.update(block=code, label=_item_label(column) or labels.get(code))
+                        block_members.setdefault(code, []).append(entry)
+                    else:
+                        entry.update(code=code, label=labels.get(code))
+                    break
+        entries.append(entry)
+
+    for code_range, members in block_members.items():
+        for entry, code in zip(members, _block_codes(code_range, len(members))):
+            entry['code'] = code
+
+    return QuestionCatalog(entries)
+
+
+class QuestionCatalog:
+    """Column <-> question code index with constant-time lookups"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self._by_column = {entry['column']: entry for entry in entries}
+        self._by_code = {}
+        for entry in entries:
+            # Both timestamp headers share code 001; the first one wins
+            if entry['code'] is not None:
+                self._by_code.setdefault(entry['code'], entry)
+
+    def entry(self, column):
+        """Catalog entry of a column header"""
+        return self._by_column[column]
+
+    def code(self, column):
+        """Question code of a column header (None if unmapped)"""
+        return self._by_column[column]['code']
+
+    def column(self, code, default=None):
+        """Column header of a question code"""
+        entry = self._by_code.get(code)
+        return entry['column'] if entry else default
+
+    def columns(self, group=None, qtype=None, scale=None, block=None):
+        """Column headers matching the given metadata, in dataset order"""
+        selected = []
+        for entry in self.entries:
+            if group is not None and entry['group'] != group:
+                continue
+            if qtype is not None and entry['qtype'] not in _as_set(qtype):
+                continue
+            if scale is not None and entry['scale'] not in _as_set(scale):
+                continue
+            if block is not None and entry['block'] != block:
+                continue
+            selected.append(entry['column'])
+        return selected
+
+    def question_columns(self):
+        """All answer columns (everything except timestamps and source)"""
+        return [entry['column'] for entry in self.entries
+                if entry['qtype'] not in (TIMESTAMP, METADATA)]
+
+    def to_dict(self):
+        return {'entries': self.entries}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['entries'])
+
+
+def _as_set(value):
+    return {value} if isinstance(value, str) else set(value)
+
+
+def catalog_path_for(xlsx_path):
+    """Catalog file that sits next to the dataset (and its columnar cache)"""
+    return os.path.splitext(xlsx_path)[0] + '.catalog.json'
+
+
+def save_question_catalog(catalog, path):
+    """Write the catalog as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(catalog.to_dict(), f, ensure_ascii=False, indent=1)
+    return path
+
+
+def write_question_catalog(columns, data_path=MERGED_XLSX):
+    """Build the catalog for a dataset's columns and persist it next to the dataset"""
+    catalog = build_question_catalog(columns)
+    save_question_catalog(catalog, catalog_path_for(data_path))
+    return catalog
+
+
+def get_question_catalog(df, data_path=MERGED_XLSX):
+    """Load the persisted catalog when it covers ``df``'s columns, otherwise build and save it"""
+    path = catalog_path_for(data_path)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            catalog = QuestionCatalog.from_dict(json.load(f))
+        if [entry['column'] for entry in catalog.entries] == list(df.columns):
+            return catalog
+
+    return write_question_catalog(list(df.columns), data_path)
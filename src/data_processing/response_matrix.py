@@ -0,0 +1,218 @@
+"""
+Encoded response matrix: the survey as integer codes plus label tables, memory-mapped by every stage
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from data_processing.instrumentation import span
+
+LABELS_FILE = 'labels.json'
+CODE_DTYPES = [np.int8, np.int16, np.int32]
+
+# Matrices this process has mapped, by directory: (labels.json inode and mtime, matrix)
+_MAPPED = {}
+
+
+def matrix_dir_for(xlsx_path):
+    """Response matrix directory that sits next to the dataset"""
+    return os.path.splitext(xlsx_path)[0] + '.codes'
+
+
+def scales_fingerprint():
+    """Hash of the scale definitions and catalog rules that decide the coded labels"""
+    from data_processing.likert_scales import LIKERT_SCALES
+    from data_processing.question_catalog import QUESTION_RULES
+    return hashlib.sha1(json.dumps([LIKERT_SCALES, QUESTION_RULES]).encode('utf-8')).hexdigest()
+
+
+def _code_dtype(n_labels):
+    """Smallest signed integer type that holds the codes and -1 for missing"""
+    return next(dtype for dtype in CODE_DTYPES if n_labels <= np.iinfo(dtype).max)
+
+
+class ResponseMatrix:
+    """Survey answers as integer codes, one 2-D array per code width"""
+
+    def __init__(self, n_rows, columns, layout, groups, values):
+        self.n_rows = n_rows
+        self.columns = columns
+        self.layout = layout
+        self.groups = groups
+        self.values = values
+
+    @classmethod
+    def from_frame(cls, df):
+        """Encode a loaded dataset (string, Categorical, datetime and numeric columns)"""
+        layout = {}
+        values = {}
+        encoded = {}
+        for col in df.columns:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes = series.cat.codes.to_numpy()
+                labels = [str(label) for label in series.cat.categories]
+                layout[col] = {'labels': labels, 'ordered': bool(series.cat.ordered), 'kind': 'category'}
+            elif pd.api.types.is_string_dtype(series.dtype) and not pd.api.types.is_object_dtype(series.dtype):
+                codes, uniques = pd.factorize(series, sort=False)
+                layout[col] = {'labels': [str(label) for label in uniques], 'ordered': False, 'kind': 'string'}
+            elif pd.api.types.is_datetime64_any_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+                values[col] = series.to_numpy()
+                layout[col] = {'kind': 'values'}
+                continue
+            else:
+                raise TypeError(f"Column {col!r} has no encodable type ({series.dtype})")
+            encoded[col] = codes
+
+        groups = {}
+        for dtype in CODE_DTYPES:
+            members = [col for col in encoded if _code_dtype(len(layout[col]['labels'])) is dtype]
+            if not members:
+                continue
+            # Column-major, so every column is one contiguous slice of the file
+            group = np.empty((len(df), len(members)), dtype=dtype, order='F')
+            for j, col in enumerate(members):
+                group[:, j] = encoded[col]
+                layout[col].update(group=np.dtype(dtype).name, index=j)
+            groups[np.dtype(dtype).name] = group
+        return cls(len(df), list(df.columns), layout, groups, values)
+
+    def codes(self, col):
+        """Codes of one column (-1 = missing), a view into the matrix"""
+        entry = self.layout[col]
+        return self.groups[entry['group']][:, entry['index']]
+
+    def labels(self, col):
+        return self.layout[col]['labels']
+
+    def observed_codes(self, col, sort=False):
+        """(codes, labels) over the answers that occur in a column, as ``pd.factorize`` returns them"""
+        codes = self.codes(col)
+        labels = self.labels(col)
+        present, first = np.unique(codes, return_index=True)
+        answered = present >= 0
+        present, first = present[answered], first[answered]
+        if sort:
+            present = np.array(sorted(present, key=lambda code: labels[code]), dtype=np.int64)
+        else:
+            present = present[np.argsort(first, kind='stable')]
+        # The extra last slot maps missing (-1) to itself
+        remap = np.full(len(labels) + 1, -1, dtype=np.int32)
+        remap[present] = np.arange(len(present), dtype=np.int32)
+        return remap[codes], [labels[code] for code in present]
+
+    def categorical(self, col):
+        """Column as a Categorical over its codes (ordered for scales)"""
+        entry = self.layout[col]
+        return pd.Categorical.from_codes(self.codes(col), categories=entry['labels'], ordered=entry['ordered'])
+
+    def series(self, col):
+        """Column decoded to the type it was encoded from"""
+        entry = self.layout[col]
+        if entry['kind'] == 'values':
+            return pd.Series(self.values[col], name=col)
+        if entry['kind'] == 'category':
+            # The Categorical keeps the mapped codes as they are: no copy per process
+            return pd.Series(self.categorical(col), name=col, copy=False)
+        return pd.Series(_decode_strings(self.codes(col), entry['labels']), name=col)
+
+    def to_frame(self, columns=None):
+        """DataFrame of the given columns (default: all), decoded"""
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({col: self.series(col) for col in columns}, columns=columns, copy=False)
+
+
+def _decode_strings(codes, labels):
+    """String array of codes; pyarrow expands the label dictionary without Python objects"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        decoded = np.asarray(labels + [None], dtype=object)[codes]
+        return pd.array(decoded, dtype='string')
+    indices = pa.array(np.asarray(codes), mask=np.asarray(codes) < 0)
+    dictionary = pa.array(labels, type=pa.string())
+    return pd.array(pa.DictionaryArray.from_arrays(indices, dictionary).dictionary_decode(), dtype='string')
+
+
+def _save_array(path, array):
+    # Readers may map the files at any time, so each one is replaced whole
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        np.save(f, array)
+    os.replace(temporary, path)
+
+
+def save_response_matrix(matrix, path):
+    """Write the code arrays, value arrays and label tables (labels last)"""
+    os.makedirs(path, exist_ok=True)
+    for name, group in matrix.groups.items():
+        _save_array(os.path.join(path, f'{name}.npy'), group)
+    value_files = {}
+    for i, (col, array) in enumerate(matrix.values.items()):
+        value_files[col] = f'values_{i}.npy'
+        _save_array(os.path.join(path, value_files[col]), array)
+
+    meta = {'n_rows': matrix.n_rows, 'columns': matrix.columns, 'layout': matrix.layout,
+            'groups': list(matrix.groups), 'values': value_files, 'fingerprint': scales_fingerprint()}
+    temporary = os.path.join(path, f'{LABELS_FILE}.{os.getpid()}.tmp')
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(temporary, os.path.join(path, LABELS_FILE))
+    return path
+
+
+def load_response_matrix(xlsx_path, path=None):
+    """Memory-map the response matrix read-only, or None if it is missing, stale or incomplete"""
+    path = path or matrix_dir_for(xlsx_path)
+    labels_path = os.path.join(path, LABELS_FILE)
+    if not os.path.exists(labels_path):
+        return None
+    if os.path.exists(xlsx_path) and os.path.getmtime(labels_path) < os.path.getmtime(xlsx_path):
+        return None
+    # labels.json is replaced last, so the replacement file identifies the files' version
+    stat = os.stat(labels_path)
+    stamp = (stat.st_ino, stat.st_mtime_ns)
+    mapped = _MAPPED.get(os.path.abspath(path))
+    if mapped is not None and mapped[0] == stamp:
+        return mapped[1]
+    with open(labels_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('fingerprint') != scales_fingerprint():
+        return None
+
+    try:
+        groups = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in meta['groups']}
+        values = {col: np.load(os.path.join(path, name), mmap_mode='r') for col, name in meta['values'].items()}
+    except (OSError, ValueError):
+        return None
+    # A writer may be halfway through replacing the files
+    if any(len(array) != meta['n_rows'] for array in list(groups.values()) + list(values.values())):
+        return None
+    matrix = ResponseMatrix(meta['n_rows'], meta['columns'], meta['layout'], groups, values)
+    _MAPPED[os.path.abspath(path)] = (stamp, matrix)
+    return matrix
+
+
+def matrix_of(df, xlsx_path):
+    """The memory-mapped matrix ``df`` was decoded from, or None"""
+    matrix = load_response_matrix(xlsx_path)
+    if matrix is None or matrix.n_rows != len(df) or matrix.columns != list(df.columns):
+        return None
+    scales = [col for col in matrix.columns if matrix.layout[col]['kind'] == 'category']
+    if not scales or not all(isinstance(df[col].dtype, pd.CategoricalDtype)
+                             and np.may_share_memory(df[col].array.codes, matrix.codes(col)) for col in scales):
+        return None
+    return matrix
+
+
+def write_response_matrix(df, xlsx_path, path=None):
+    """Encode a loaded dataset and save it next to the dataset"""
+    with span('write_response_matrix', rows=len(df), columns=len(df.columns)):
+        try:
+            matrix = ResponseMatrix.from_frame(df)
+        except TypeError as exc:
+            print(f"⚠ Response matrix not written ({exc})")
+            return None
+        return save_response_matrix(matrix, path or matrix_dir_for(xlsx_path))
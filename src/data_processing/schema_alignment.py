@@ -0,0 +1,116 @@
+"""
+Raw export discovery and schema alignment onto one canonical column per question
+"""
+import difflib
+import glob
+import json
+import os
+
+from data_processing.data_loader import TIMESTAMP_COLUMNS
+from data_processing.question_catalog import build_question_catalog, normalize_header
+
+RAW_DIR = 'data/raw'
+# Optional {header: question code} map in the raw directory, for headers no
+# catalog rule matches (e.g. translated forms)
+HEADER_MAP = 'header_map.json'
+SCHEMA_ALIGNMENT = 'data/processed/schema_alignment.json'
+
+# Labels of the original exports; other workbooks are labelled by file name
+KNOWN_SOURCES = [
+    ('Exploring the Use of AI Chat Assistants in Scrum (respostas).xlsx', 'Survey 1 (respostas)'),
+    ('Exploring the Use of AI Chat Assistants in Scrum - Udemy (Responses).xlsx', 'Survey 2 (Udemy)'),
+]
+
+# Minimum difflib similarity for an unrecognized header to join an existing column
+FUZZY_CUTOFF = 0.85
+
+
+def discover_sources(raw_dir=RAW_DIR):
+    """(path, source label) of every workbook in ``raw_dir``, the original exports first"""
+    known = [name for name, _ in KNOWN_SOURCES]
+    labels = dict(KNOWN_SOURCES)
+    paths = [path for path in glob.glob(os.path.join(raw_dir, '*.xlsx'))
+             # Office lock files of workbooks open in Excel
+             if not os.path.basename(path).startswith('~$')]
+
+    def order(path):
+        name = os.path.basename(path)
+        return (known.index(name) if name in known else len(known), name)
+
+    return [(path, labels.get(os.path.basename(path), os.path.splitext(os.path.basename(path))[0]))
+            for path in sorted(paths, key=order)]
+
+
+def load_header_map(raw_dir=RAW_DIR):
+    """{normalized header: question code} from the optional header map"""
+    path = os.path.join(raw_dir, HEADER_MAP)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return {normalize_header(header): code for header, code in json.load(f).items()}
+
+
+def align_headers(headers_by_source, header_map=None, cutoff=FUZZY_CUTOFF):
+    """Map every source's headers onto one canonical column list"""
+    header_map = header_map or {}
+    columns = []
+    by_normalized = {}
+    by_code = {}
+    renames = {}
+    unmatched = {}
+
+    for source, header in headers_by_source.items():
+        # Codes of matrix items are positional within their block, so each source gets its own catalog
+        catalog = build_question_catalog(header, labels={})
+        renames[source] = {}
+        unmatched[source] = []
+        taken = set()
+        for col in header:
+            normalized = normalize_header(col)
+            code = header_map.get(normalized) or catalog.code(col)
+            if col in TIMESTAMP_COLUMNS or col == 'source':
+                canonical = col
+            elif normalized in by_normalized:
+                canonical = by_normalized[normalized]
+            elif code is not None:
+                canonical = by_code.get(code, col)
+            else:
+                # Sibling questions differ by a word or two, so only columns this export has not filled compete
+                candidates = [text for text, column in by_normalized.items() if column not in taken]
+                close = difflib.get_close_matches(normalized, candidates, n=1, cutoff=cutoff)
+                canonical = by_normalized[close[0]] if close else col
+                if not close:
+                    unmatched[source].append(col)
+
+            # Two headers of one export never share a column
+            if canonical in taken:
+                canonical = col
+            taken.add(canonical)
+            renames[source][col] = canonical
+            if canonical not in columns:
+                columns.append(canonical)
+            by_normalized.setdefault(normalized, canonical)
+            by_normalized.setdefault(normalize_header(canonical), canonical)
+            if code is not None:
+                by_code.setdefault(code, canonical)
+    return columns, renames, unmatched
+
+
+def save_alignment(renames, unmatched, path=SCHEMA_ALIGNMENT):
+    """Write which header of every source went to which column, and what matched nothing"""
+    report = {source: {'renamed': {header: column for header, column in mapping.items() if header != column},
+                       'unmatched': unmatched.get(source, [])}
+              for source, mapping in renames.items()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def print_alignment(renames, unmatched):
+    """Summarize the alignment of every source"""
+    for source, mapping in renames.items():
+        renamed = sum(header != column for header, column in mapping.items())
+        print(f"  {source}: {len(mapping)} columns, {renamed} aligned to another header, "
+              f"{len(unmatched[source])} unmatched")
+        for header in unmatched[source]:
+            print(f"    ⚠ No question code for: {normalize_header(header)[:100]}")
@@ -0,0 +1,374 @@
+"""
+Local survey-statistics service: an asyncio HTTP server answering frequency-table queries
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import sys
+import time
+from functools import reduce
+from urllib.parse import parse_qsl, urlsplit
+import numpy as np
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_processing.bitmap_index import open_bitmap_index
+from data_processing.data_loader import MERGED_XLSX, cache_path_for
+from data_processing.descriptive_analysis import frequency_records
+from data_processing.instrumentation import add_arguments, enable, record, span
+from data_processing.multi_select import answer_counts
+from data_processing.quality_screening import kept_respondents, quality_flags_path_for
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_BYTES = 16 * 1024 * 1024
+DEFAULT_TOP = 10
+# Seconds between checks of the dataset's modification time
+RELOAD_INTERVAL = 2.0
+# Latest requests per route kept for the latency percentiles
+LATENCY_WINDOW = 10000
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+MAX_BODY = 1024 * 1024
+ROUTES = ('/stats', '/questions', '/metrics', '/health')
+
+
+class QueryError(Exception):
+    """A request the service cannot answer; carries the HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """Encoded responses by key, least recently used evicted first once ``max_bytes`` is exceeded"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        body = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.bytes -= len(self.entries.pop(key))
+        self.entries[key] = body
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self.entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None}
+
+
+class LatencyStats:
+    """Request latencies per route over a sliding window"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.samples = {}
+        self.counts = collections.Counter()
+        self.errors = collections.Counter()
+
+    def observe(self, route, seconds, status):
+        self.samples.setdefault(route, collections.deque(maxlen=self.window)).append(seconds)
+        self.counts[route] += 1
+        if status >= 400:
+            self.errors[route] += 1
+
+    def summary(self):
+        routes = {}
+        for route, samples in self.samples.items():
+            ms = np.fromiter(samples, dtype=float) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            routes[route] = {'requests': self.counts[route], 'errors': self.errors[route],
+                             'p50_ms': round(float(p50), 3), 'p95_ms': round(float(p95), 3),
+                             'p99_ms': round(float(p99), 3), 'max_ms': round(float(ms.max()), 3)}
+        return routes
+
+
+def data_signature(data_path):
+    """Modification times of the dataset, its columnar cache and its quality flags (None where missing)"""
+    return tuple(os.path.getmtime(path) if os.path.exists(path) else None
+                 for path in (data_path, cache_path_for(data_path), quality_flags_path_for(data_path)))
+
+
+class SurveySnapshot:
+    """One loaded version of the dataset: the bitmap index plus the overall counts of every question"""
+
+    def __init__(self, data_path=MERGED_XLSX):
+        self.data_path = data_path
+        self.signature = data_signature(data_path)
+        self._kept = None
+        with span('load snapshot') as load:
+            self.index = open_bitmap_index(data_path)
+            # The unfiltered tables come from the same store and matrices as the frequency workbook
+            store = self.index.frequency_store(self.index.all())
+            matrices = self.index.multi_select_matrices()
+            self.totals = {col: answer_counts(col, store, matrices) for col in self.index.entries}
+            load.set(rows=self.index.n_rows, columns=len(self.totals))
+        self.codes = {col: code for code, col in self.index.aliases.items()}
+        self.version = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(max(filter(None, self.signature),
+                                                                               default=time.time())))
+
+    def questions(self):
+        return [{'column': col, 'code': self.codes.get(col), 'multi_select': 'options' in entry}
+                for col, entry in self.index.entries.items()]
+
+    def select(self, where):
+        """Respondents matched by a filter expression or a {question: answer(s)} object"""
+        if not where:
+            return None
+        try:
+            if isinstance(where, str):
+                return self.index.query(where)
+            if isinstance(where, dict):
+                terms = [self.index.where(name, *(values if isinstance(values, list) else [values]))
+                         for name, values in where.items()]
+                return reduce(lambda left, right: left & right, terms)
+        except KeyError as exc:
+            raise QueryError(400, exc.args[0] if exc.args else str(exc)) from None
+        except ValueError as exc:
+            raise QueryError(400, str(exc)) from None
+        raise QueryError(400, 'filter must be an expression or an object of answers')
+
+    def kept(self):
+        """Respondents without quality flags (see ``quality_screening``), loaded on first use"""
+        if self._kept is None:
+            self._kept = kept_respondents(self.data_path)
+        return self._kept
+
+    def question_stats(self, name, where=None, top=DEFAULT_TOP, exclude_flagged=False):
+        """Frequency table of a question within a segment (``frequency_records`` rows)"""
+        try:
+            col = self.index.column(name)
+        except KeyError as exc:
+            raise QueryError(404, exc.args[0]) from None
+        selection = self.select(where)
+        if exclude_flagged:
+            selection = self.kept() if selection is None else selection & self.kept()
+        if selection is None:
+            freq, answered = self.totals[col]
+            respondents = self.index.n_rows
+        else:
+            freq = self.index.counts(col, selection)
+            answered = self.index.respondents(col, selection)
+            respondents = selection.count()
+        rows = frequency_records(freq, top_n=top, total_valid=answered)
+        return {
+            'question': col,
+            'code': self.codes.get(col),
+            'filter': where,
+            'exclude_flagged': exclude_flagged,
+            'respondents': respondents,
+            'answered': answered,
+            'rows': [{'response': response, 'frequency': count, 'percentage': pct}
+                     for response, count, pct in rows],
+            'version': self.version,
+        }
+
+
+class StatsService:
+    """Routes requests to the current snapshot; swaps in a new one when the data changes"""
+
+    def __init__(self, data_path=MERGED_XLSX, cache_bytes=DEFAULT_CACHE_BYTES, reload_interval=RELOAD_INTERVAL):
+        self.data_path = data_path
+        self.reload_interval = reload_interval
+        self.cache = LRUCache(cache_bytes)
+        self.latency = LatencyStats()
+        self.snapshot = SurveySnapshot(data_path)
+        self.reloads = 0
+        self.started = time.time()
+
+    async def watch(self):
+        """Reload the snapshot in a worker thread whenever the dataset changes"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            if data_signature(self.data_path) == self.snapshot.signature:
+                continue
+            try:
+                snapshot = await loop.run_in_executor(None, SurveySnapshot, self.data_path)
+            except Exception as exc:
+                # Usually a merge still writing the dataset; the next check retries
+                print(f"⚠ Reload failed ({exc}); still serving {self.snapshot.version}", file=sys.stderr)
+                continue
+            # Requests in flight keep the snapshot they started with
+            self.snapshot = snapshot
+            self.cache.clear()
+            self.reloads += 1
+            print(f"✓ Reloaded {snapshot.index.n_rows} responses (data version {snapshot.version})")
+
+    def dispatch(self, method, route, query, body):
+        """JSON body bytes of one request"""
+        params = dict(parse_qsl(query))
+        if method == 'POST' and body:
+            try:
+                params.update(json.loads(body))
+            except (ValueError, TypeError):
+                raise QueryError(400, 'request body is not a JSON object') from None
+        elif method not in ('GET', 'HEAD'):
+            raise QueryError(405, f'{method} is not supported')
+
+        snapshot = self.snapshot
+        if route == '/stats':
+            return self.stats(snapshot, params)
+        if route == '/questions':
+            return _encode({'questions': snapshot.questions(), 'version': snapshot.version})
+        if route == '/metrics':
+            return _encode(self.metrics())
+        if route == '/health':
+            return _encode({'status': 'ok', 'rows': snapshot.index.n_rows, 'version': snapshot.version})
+        raise QueryError(404, f'no route {route}')
+
+    def stats(self, snapshot, params):
+        question = params.get('question')
+        if not question:
+            raise QueryError(400, 'question is required')
+        where = params.get('filter') or None
+        try:
+            top = int(params.get('top', DEFAULT_TOP))
+        except (TypeError, ValueError):
+            raise QueryError(400, 'top must be an integer') from None
+        exclude_flagged = str(params.get('exclude_flagged', '')).lower() in ('1', 'true', 'yes')
+        if where is None and not exclude_flagged:
+            # Overall tables are precomputed; encoding them is all that is left
+            return _encode(snapshot.question_stats(question, top=top))
+
+        key = (snapshot.version, question, json.dumps(where, sort_keys=True, ensure_ascii=False), top,
+               exclude_flagged)
+        body = self.cache.get(key)
+        if body is None:
+            body = _encode(snapshot.question_stats(question, where, top, exclude_flagged))
+            self.cache.put(key, body)
+        return body
+
+    def metrics(self):
+        return {
+            'version': self.snapshot.version,
+            'rows': self.snapshot.index.n_rows,
+            'uptime_s': round(time.time() - self.started, 1),
+            'reloads': self.reloads,
+            'cache': self.cache.stats(),
+            'latency': self.latency.summary(),
+        }
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one (keep-alive) connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                start = time.perf_counter()
+                route = None
+                method, protocol = 'GET', 'HTTP/1.0'
+                try:
+                    method, target, protocol = request_line.decode('latin-1').split()
+                    url = urlsplit(target)
+                    route = url.path.rstrip('/') or '/health'
+                    length = int(headers.get('content-length') or 0)
+                    if length > MAX_BODY:
+                        raise QueryError(413, f'request body over {MAX_BODY} bytes')
+                    body = await reader.readexactly(length) if length else b''
+                    payload = self.dispatch(method, route, url.query, body)
+                    status = 200
+                except QueryError as exc:
+                    status, payload = exc.status, _encode({'error': str(exc)})
+                except ValueError:
+                    # Malformed request line or Content-Length
+                    status, payload = 400, _encode({'error': 'malformed request'})
+                except Exception as exc:
+                    status, payload = 500, _encode({'error': f'{type(exc).__name__}: {exc}'})
+
+                keep_alive = protocol == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(_response(status, b'' if method == 'HEAD' else payload, keep_alive))
+                await writer.drain()
+                elapsed = time.perf_counter() - start
+                self.latency.observe(route if route in ROUTES else 'invalid', elapsed, status)
+                record('request', route=route, status=status, elapsed_s=round(elapsed, 6))
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _encode(payload):
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def _response(status, body, keep_alive):
+    head = (f'HTTP/1.1 {status} {_REASONS.get(status, "")}\r\n'
+            f'Content-Type: application/json; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    return head.encode('latin-1') + body
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Run the service until cancelled"""
+    server = await asyncio.start_server(service.handle, host, port)
+    watcher = asyncio.create_task(service.watch())
+    print(f"✓ Serving {service.snapshot.index.n_rows} responses on http://{host}:{port} "
+          f"(data version {service.snapshot.version})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--data', default=MERGED_XLSX, help=f'merged dataset (default: {MERGED_XLSX})')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'address to bind (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'port (default: {DEFAULT_PORT})')
+    parser.add_argument('--cache-mb', type=float, default=DEFAULT_CACHE_BYTES / 1024 / 1024,
+                        help='memory for cached filtered results, in MiB (default: 16)')
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL,
+                        help=f'seconds between checks for a changed dataset (default: {RELOAD_INTERVAL})')
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+
+    service = StatsService(args.data, int(args.cache_mb * 1024 * 1024), args.reload_interval)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,183 @@
+"""
+Synthetic survey responses for scaling tests, shaped like the real raw exports
+"""
+import argparse
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_processing.multi_select import MultiSelectMatrix
+from data_processing.question_catalog import MULTI_SELECT, OPEN_TEXT, TIMESTAMP, build_question_catalog
+
+SYNTHETIC_SEED = 20260101
+
+# Words that could identify a respondent are never reused in generated text
+_PRIVATE_WORD = re.compile(r'[@\d/]|^https?:|^www\.', re.IGNORECASE)
+
+
+def fit_column_model(series, qtype):
+    """Answer distribution of one column, in the form the generator samples from"""
+    n = len(series)
+    present = series.dropna()
+    model = {'qtype': qtype, 'missing': 1 - len(present) / n if n else 1.0}
+
+    if qtype == TIMESTAMP:
+        stamps = pd.to_datetime(present, errors='coerce').dropna()
+        model.update(start=stamps.min(), end=stamps.max())
+    elif qtype == MULTI_SELECT:
+        matrix = MultiSelectMatrix.from_series(series)
+        respondents = matrix.respondents()
+        counts = matrix.counts().reindex(matrix.options)
+        model.update(options=matrix.options,
+                     rates=(counts / respondents).to_numpy() if respondents else np.zeros(len(counts)))
+    elif qtype == OPEN_TEXT:
+        texts = present.astype(str)
+        words = sorted({word for text in texts for word in text.split() if not _PRIVATE_WORD.search(word)})
+        lengths = texts.str.split().str.len().to_numpy()
+        model.update(words=words, lengths=lengths if len(lengths) else np.array([1]))
+    else:
+        values = present.value_counts(sort=False)
+        model.update(values=values.index.to_numpy(dtype=object),
+                     weights=(values / values.sum()).to_numpy())
+    return model
+
+
+def fit_source_model(df):
+    """Per-column models of one raw export (headers kept in export order)"""
+    catalog = build_question_catalog(list(df.columns))
+    return {col: fit_column_model(df[col], catalog.entry(col)['qtype']) for col in df.columns}
+
+
+def _missing_mask(model, n_rows, rng):
+    return rng.random(n_rows) < model['missing']
+
+
+def _generate_timestamps(model, n_rows, rng, window):
+    """Sorted submission times inside this chunk's slice of the collection window"""
+    start, end = model['start'], model['end']
+    if pd.isna(start):
+        return pd.Series(pd.NaT, index=range(n_rows), dtype='datetime64[us]')
+    span = (end - start).value
+    low, high = window
+    offsets = np.sort(rng.uniform(low, high, n_rows)) * span
+    return pd.Series(start + pd.to_timedelta(offsets.astype(np.int64), unit='ns')).dt.round('ms')
+
+
+def _generate_multi_select(model, n_rows, rng):
+    """Joined selections; every answering respondent picks at least one option"""
+    options, rates = model['options'], model['rates']
+    if not options:
+        return np.full(n_rows, None, dtype=object)
+    picked = rng.random((n_rows, len(options))) < rates
+    # Respondents who drew nothing pick one option, weighted like the real answers
+    empty = ~picked.any(axis=1)
+    weights = rates / rates.sum() if rates.sum() else None
+    picked[np.flatnonzero(empty), rng.choice(len(options), empty.sum(), p=weights)] = True
+
+    # Join each distinct combination once
+    masks = np.packbits(picked, axis=1, bitorder='little')
+    combos, inverse = np.unique(masks, axis=0, return_inverse=True)
+    unpacked = np.unpackbits(combos, axis=1, count=len(options), bitorder='little').astype(bool)
+    joined = np.array([', '.join(o for o, chosen in zip(options, row) if chosen) for row in unpacked],
+                      dtype=object)
+    return joined[inverse.ravel()]
+
+
+def _generate_text(model, n_rows, rng, pool_size=5000):
+    """Free-text answers recombined from the column's own vocabulary"""
+    words = model['words']
+    if not words:
+        return np.full(n_rows, None, dtype=object)
+    pool = np.array([' '.join(rng.choice(words, max(int(length), 1)))
+                     for length in rng.choice(model['lengths'], min(pool_size, n_rows))], dtype=object)
+    return pool[rng.integers(len(pool), size=n_rows)]
+
+
+def generate_chunk(source_model, n_rows, rng, window=(0.0, 1.0)):
+    """``n_rows`` synthetic responses of one source"""
+    columns = {}
+    for col, model in source_model.items():
+        qtype = model['qtype']
+        if qtype == TIMESTAMP:
+            columns[col] = _generate_timestamps(model, n_rows, rng, window)
+            continue
+        if qtype == MULTI_SELECT:
+            values = _generate_multi_select(model, n_rows, rng)
+        elif qtype == OPEN_TEXT:
+            values = _generate_text(model, n_rows, rng)
+        elif len(model['values']):
+            values = model['values'][rng.choice(len(model['values']), n_rows, p=model['weights'])]
+        else:
+            values = np.full(n_rows, None, dtype=object)
+        values = np.asarray(values, dtype=object)
+        values[_missing_mask(model, n_rows, rng)] = None
+        columns[col] = values
+    return pd.DataFrame(columns)
+
+
+def split_rows(n_rows, shares):
+    """Split a row total over sources in proportion to their shares"""
+    shares = np.asarray(shares, dtype=float)
+    counts = np.floor(n_rows * shares / shares.sum()).astype(int)
+    counts[np.argmax(shares)] += n_rows - counts.sum()
+    return counts.tolist()
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return None if pd.isna(value) else value.to_pydatetime()
+    return value
+
+
+def write_export(source_model, n_rows, path, seed, chunk_size=50000):
+    """Stream ``n_rows`` synthetic responses of one source into an xlsx export"""
+    from openpyxl import Workbook
+
+    rng = np.random.default_rng(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(list(source_model))
+    for start in range(0, n_rows, chunk_size):
+        size = min(chunk_size, n_rows - start)
+        chunk = generate_chunk(source_model, size, rng, window=(start / n_rows, (start + size) / n_rows))
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append([_cell(value) for value in row])
+    wb.save(path)
+    return path
+
+
+def generate_raw_exports(n_rows, output_dir='data/raw', seed=SYNTHETIC_SEED, sources=None):
+    """Write synthetic versions of the raw exports (same file names) to ``output_dir``"""
+    from data_processing.merge_datasets import RAW_SOURCES
+
+    sources = sources or RAW_SOURCES
+    frames = [pd.read_excel(path) for path, _ in sources]
+    models = [fit_source_model(frame) for frame in frames]
+    shares = [len(frame) for frame in frames]
+    del frames
+    os.makedirs(output_dir, exist_ok=True)
+
+    written = {}
+    seeds = np.random.SeedSequence(seed).spawn(len(sources))
+    for (path, _), model, rows, child in zip(sources, models, split_rows(n_rows, shares), seeds):
+        out = os.path.join(output_dir, os.path.basename(path))
+        write_export(model, rows, out, child)
+        written[out] = rows
+        print(f"✓ {rows} synthetic responses written to {out}")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rows', type=int, default=10000, help='total responses over all sources (default: 10000)')
+    parser.add_argument('--output-dir', default='data/synthetic/raw',
+                        help='directory for the synthetic exports (default: data/synthetic/raw)')
+    parser.add_argument('--seed', type=int, default=SYNTHETIC_SEED, help='random seed')
+    args = parser.parse_args()
+    generate_raw_exports(args.rows, args.output_dir, args.seed)
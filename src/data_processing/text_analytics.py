@@ -0,0 +1,388 @@
+"""
+Open-ended answers: PT/EN keyword and phrase counts and near-duplicate groups, in streamed batches
+"""
+import argparse
+import functools
+import os
+import re
+import sys
+import unicodedata
+import zlib
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_processing.crosstabs import segment_columns
+from data_processing.data_loader import MERGED_XLSX, cache_is_fresh, cache_path_for, load_survey_data
+from data_processing.instrumentation import add_arguments, enable, span, traced
+from data_processing.quality_screening import flagged_mask, get_quality_flags
+from data_processing.question_catalog import OPEN_TEXT, get_question_catalog
+
+TEXT_ANALYSIS = 'data/processed/text_analysis.xlsx'
+
+# Free-text questions that name the respondent's organization are not analyzed
+EXCLUDED_CODES = {'010'}
+
+N_FEATURES = 2 ** 18
+NUM_PERM = 32
+LSH_BANDS = 8
+# Estimated Jaccard similarity (of character 5-grams) for two answers to count as near-duplicates
+NEAR_DUPLICATE_SIMILARITY = 0.5
+SHINGLE_SIZE = 5
+MINHASH_SEED = 20260101
+_MERSENNE_PRIME = (1 << 31) - 1
+_SHINGLE_BASE = 1000003
+
+STOPWORDS = {
+    'en': """a an the and or but if of to in on for with as at by from is are was were be been being it
+             its this that these those i me my we our you your he she they them their not no so than too
+             very can could would should will do does did have has had there what which who when where how
+             all any some more most such only also into about up out over just don't it's i'm etc""",
+    'pt': """a o as os um uma uns umas de do da dos das em no na nos nas por para pra com sem e ou mas que
+             se é são foi ser ter tem têm como mais menos muito muita muitos já não sim eu ele ela eles elas
+             nós você vocês meu minha seu sua seus suas isso isto esse essa este esta aquele aquela ao aos à
+             às pelo pela pelos pelas num numa também quando onde qual quais lhe me te há está estão sobre
+             entre até depois antes ainda só etc""",
+}
+
+# Words may contain digits ("4o") and inner apostrophes ("don't"); numbers alone are dropped
+_TOKEN = re.compile(r"[^\W_]+(?:['’][^\W_]+)*")
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def fold(text):
+    """Lower-case and strip accents, so 'Métricas' and 'metricas' count as one term"""
+    text = str(text).casefold()
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).replace('’', "'")
+
+
+_fold_word = functools.lru_cache(maxsize=1 << 16)(fold)
+_FOLDED_STOPWORDS = {lang: {fold(word) for word in words.split()} for lang, words in STOPWORDS.items()}
+# Words that tell the languages apart ('no', 'a', 'e' are stopwords in both)
+_MARKERS = {
+    'en': _FOLDED_STOPWORDS['en'] - _FOLDED_STOPWORDS['pt'],
+    'pt': _FOLDED_STOPWORDS['pt'] - _FOLDED_STOPWORDS['en'],
+}
+
+
+def detect_language(tokens):
+    """'pt' or 'en', whichever language's function words the answer uses more"""
+    pt = sum(token in _MARKERS['pt'] for token in tokens)
+    en = sum(token in _MARKERS['en'] for token in tokens)
+    return 'pt' if pt > en else 'en'
+
+
+def normalize_answer(text):
+    """Folded answer with punctuation collapsed to single spaces ('GPT-5' and 'gpt 5' match)"""
+    return _NON_ALNUM.sub(' ', fold(text)).strip()
+
+
+def tokenize(text):
+    """(language, content words) of an answer: lower-cased words minus that language's stopwords"""
+    tokens = [token.lower() for token in _TOKEN.findall(str(text))]
+    folded = [_fold_word(token) for token in tokens]
+    language = detect_language(folded)
+    stopwords = _FOLDED_STOPWORDS[language]
+    return language, [token for token, key in zip(tokens, folded)
+                      if len(key) > 1 and not key.isdigit() and key not in stopwords]
+
+
+def extract_terms(words):
+    """Keywords and two-word phrases of an answer (each counted once per answer)"""
+    return set(words) | {f'{first} {second}' for first, second in zip(words, words[1:])}
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def term_bucket(term, n_features=N_FEATURES):
+    """Feature index of a term, accent-insensitive and stable across runs (unlike ``hash``)"""
+    return zlib.crc32(fold(term).encode('utf-8')) % n_features
+
+
+def shingle_hashes(text):
+    """Distinct hashed character 5-grams of the normalized answer, for MinHash"""
+    codes = np.frombuffer(normalize_answer(text).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    width = min(SHINGLE_SIZE, len(codes))
+    hashes = np.zeros(len(codes) - width + 1, dtype=np.uint64)
+    for i in range(width):
+        hashes = hashes * np.uint64(_SHINGLE_BASE) + codes[i:len(codes) - width + 1 + i]
+    return np.unique(hashes & np.uint64(0xFFFFFFFF))
+
+
+def minhash_signatures(shingle_lists, coefficients, max_cells=1 << 21):
+    """MinHash signature (uint32 per permutation) of every shingle list"""
+    a, b = coefficients
+    signatures = np.empty((len(shingle_lists), len(a)), dtype=np.uint32)
+    start = 0
+    while start < len(shingle_lists):
+        stop, cells = start, 0
+        while stop < len(shingle_lists) and (stop == start or cells + len(shingle_lists[stop]) * len(a) <= max_cells):
+            cells += len(shingle_lists[stop]) * len(a)
+            stop += 1
+        hashes = np.concatenate(shingle_lists[start:stop])
+        offsets = np.cumsum([0] + [len(s) for s in shingle_lists[start:stop - 1]])
+        permuted = (a[:, None] * hashes[None, :] + b[:, None]) % _MERSENNE_PRIME
+        signatures[start:stop] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = stop
+    return signatures
+
+
+def connected_labels(n, left, right):
+    """Component label (smallest member) of every node of an undirected edge list"""
+    labels = np.arange(n)
+    while True:
+        smaller = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, smaller)
+        np.minimum.at(updated, right, smaller)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+class _QuestionText:
+    """Running state of one free-text question"""
+
+    def __init__(self, n_features):
+        self.term_counts = np.zeros(n_features, dtype=np.int64)
+        self.answers = 0
+        self.languages = Counter()
+        # Segment name -> level -> Counter of term buckets
+        self.segment_counts = {}
+        # Distinct answers (by normalized text): index, respondents, first wording, MinHash signature
+        self.distinct = {}
+        self.respondents = []
+        self.examples = []
+        self.signatures = []
+
+
+class TextAnalyzer:
+    """Streaming text statistics for a set of free-text columns"""
+
+    def __init__(self, questions, segments=(), n_features=N_FEATURES, num_perm=NUM_PERM,
+                 bands=LSH_BANDS, seed=MINHASH_SEED, example_chars=200):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.questions = list(questions)
+        self.segments = list(segments)
+        self.n_features = n_features
+        self.bands = bands
+        self.example_chars = example_chars
+        rng = np.random.default_rng(seed)
+        self.coefficients = (rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64),
+                             rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64))
+        self.band_multipliers = rng.integers(1, 2 ** 63, num_perm // bands, dtype=np.uint64) | np.uint64(1)
+        self.state = {col: _QuestionText(n_features) for col in self.questions}
+        # Bucket -> first term seen in it, to label the hashed counts
+        self.terms = {}
+
+    def update(self, chunk):
+        """Add a batch of rows (a DataFrame with the question and segment columns)"""
+        for col in self.questions:
+            if col in chunk.columns:
+                self._update_question(col, chunk)
+
+    def _update_question(self, col, chunk):
+        state = self.state[col]
+        codes, uniques = pd.factorize(chunk[col], sort=False)
+        weights = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+        buckets = []
+        new_shingles = []
+        for text, weight in zip(uniques, weights):
+            language, words = tokenize(text)
+            state.languages[language] += int(weight)
+            text_buckets = []
+            for term in extract_terms(words):
+                bucket = term_bucket(term, self.n_features)
+                self.terms.setdefault(bucket, term)
+                text_buckets.append(bucket)
+            buckets.append(text_buckets)
+
+            key = normalize_answer(text)
+            if key in state.distinct:
+                state.respondents[state.distinct[key]] += int(weight)
+            else:
+                state.distinct[key] = len(state.respondents)
+                state.respondents.append(int(weight))
+                state.examples.append(' '.join(str(text).split())[:self.example_chars])
+                new_shingles.append(shingle_hashes(text))
+        if new_shingles:
+            state.signatures.append(minhash_signatures(new_shingles, self.coefficients))
+
+        # Document frequencies: each answer counts a term once
+        if buckets:
+            flat = np.fromiter((bucket for text_buckets in buckets for bucket in text_buckets), dtype=np.int64)
+            repeats = np.repeat(weights, [len(b) for b in buckets])
+            state.term_counts += np.bincount(flat, weights=repeats, minlength=self.n_features).astype(np.int64)
+        state.answers += int(weights.sum())
+
+        for segment, seg_col in self.segments:
+            if seg_col not in chunk.columns:
+                continue
+            levels = chunk[seg_col].astype('string').fillna('Missing').to_numpy(dtype=object)
+            pairs = Counter(zip(levels[codes >= 0], codes[codes >= 0]))
+            by_level = state.segment_counts.setdefault(segment, {})
+            for (level, code), count in pairs.items():
+                counter = by_level.setdefault(level, Counter())
+                for bucket in buckets[code]:
+                    counter[bucket] += count
+
+    def top_terms(self, col, n=20):
+        """[(term, answers containing it)] of a question, most frequent first"""
+        counts = self.state[col].term_counts
+        top = np.argsort(-counts, kind='stable')[:n]
+        return [(self.terms[int(bucket)], int(counts[bucket])) for bucket in top if counts[bucket] > 0]
+
+    def top_terms_by_segment(self, col, segment, n=5):
+        """{segment level: [(term, answers)]} of a question"""
+        levels = self.state[col].segment_counts.get(segment, {})
+        return {level: [(self.terms[bucket], count) for bucket, count in counter.most_common(n)]
+                for level, counter in sorted(levels.items())}
+
+    def near_duplicate_groups(self, col, min_respondents=2, similarity=NEAR_DUPLICATE_SIMILARITY):
+        """Groups of identical or near-identical answers, largest first"""
+        state = self.state[col]
+        if not state.signatures:
+            return []
+        signatures = np.concatenate(state.signatures)
+        respondents = np.asarray(state.respondents, dtype=np.int64)
+        n, num_perm = signatures.shape
+        rows = num_perm // self.bands
+
+        keys = (signatures.reshape(n, self.bands, rows).astype(np.uint64) * self.band_multipliers).sum(axis=2)
+        left, right = [], []
+        for band in range(self.bands):
+            order = np.argsort(keys[:, band], kind='stable')
+            same = keys[order[1:], band] == keys[order[:-1], band]
+            left.append(order[:-1][same])
+            right.append(order[1:][same])
+        left, right = np.concatenate(left), np.concatenate(right)
+        agreement = (signatures[left] == signatures[right]).mean(axis=1) if len(left) else np.array([])
+        keep = agreement >= similarity
+        labels = connected_labels(n, left[keep], right[keep])
+
+        groups = []
+        group_respondents = np.bincount(labels, weights=respondents, minlength=n)
+        for label in np.flatnonzero(group_respondents >= min_respondents):
+            members = np.flatnonzero(labels == label)
+            example = members[np.argmax(respondents[members])]
+            groups.append({'respondents': int(group_respondents[label]), 'variants': len(members),
+                           'example': state.examples[example]})
+        return sorted(groups, key=lambda group: -group['respondents'])
+
+
+def text_columns(catalog):
+    """Free-text question columns to analyze"""
+    return [col for col in catalog.columns(qtype=OPEN_TEXT)
+            if catalog.code(col) is not None and catalog.code(col) not in EXCLUDED_CODES]
+
+
+def dataset_columns(data_path):
+    """Column names of a dataset, from the cache schema when it is fresh"""
+    cache_path = cache_path_for(data_path)
+    if cache_is_fresh(data_path, cache_path):
+        try:
+            import pyarrow.parquet as pq
+            return pq.read_schema(cache_path).names
+        except (ImportError, OSError, ValueError):
+            pass
+    # Also (re)writes the cache, so the batches below can stream from it
+    return list(load_survey_data(data_path, ordered_scales=False).columns)
+
+
+def iter_batches(data_path, columns, batch_size):
+    """Yield DataFrames of only ``columns``, read from the columnar cache in batches when it is fresh"""
+    cache_path = cache_path_for(data_path)
+    if cache_is_fresh(data_path, cache_path):
+        try:
+            import pyarrow.parquet as pq
+            parquet = pq.ParquetFile(cache_path)
+            for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+                yield batch.to_pandas()
+            return
+        except (ImportError, OSError, ValueError) as exc:
+            print(f"⚠ Could not stream {cache_path} ({exc}); loading the dataset")
+    df = load_survey_data(data_path, ordered_scales=False)
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size][columns]
+
+
+@traced()
+def analyze_text(data_path=MERGED_XLSX, batch_size=20000, exclude_flagged=False, **options):
+    """Stream the free-text columns (and the segment columns) of a dataset through a TextAnalyzer"""
+    header = pd.DataFrame(columns=dataset_columns(data_path))
+    catalog = get_question_catalog(header, data_path=data_path)
+    segments = segment_columns(header, catalog)
+    kept = ~flagged_mask(get_quality_flags(data_path)) if exclude_flagged else None
+
+    analyzer = TextAnalyzer(text_columns(catalog), segments, **options)
+    columns = analyzer.questions + [col for _, col in segments if col not in analyzer.questions]
+    offset = 0
+    rows = 0
+    for chunk in iter_batches(data_path, columns, batch_size):
+        if kept is not None:
+            chunk, offset = chunk[kept[offset:offset + len(chunk)]], offset + len(chunk)
+        with span('text batch', rows=len(chunk), columns=len(columns)):
+            analyzer.update(chunk)
+        rows += len(chunk)
+    print(f"✓ Analyzed {len(analyzer.questions)} free-text questions over {rows} responses")
+    return analyzer
+
+
+@traced()
+def write_text_analysis(analyzer, output_file=TEXT_ANALYSIS, top_n=20, segment_top_n=5, group_top_n=20):
+    """Write top terms per question and segment and near-duplicate groups to a workbook"""
+    from openpyxl import Workbook
+    from data_processing.descriptive_analysis import _append_header, clean_column_name
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Top Terms')
+    _append_header(ws, ['Question', 'Term', 'Kind', 'Answers', 'Percentage', 'Answers (total)',
+                        'Portuguese', 'English'])
+    for col in analyzer.questions:
+        state = analyzer.state[col]
+        question = clean_column_name(col)
+        for term, count in analyzer.top_terms(col, top_n):
+            ws.append([question, term, 'phrase' if ' ' in term else 'word', count,
+                       round(count / state.answers * 100, 2), state.answers,
+                       state.languages['pt'], state.languages['en']])
+
+    ws = wb.create_sheet('Terms by Segment')
+    _append_header(ws, ['Question', 'Segment', 'Level', 'Term', 'Answers'])
+    for col in analyzer.questions:
+        question = clean_column_name(col)
+        for segment, _ in analyzer.segments:
+            for level, terms in analyzer.top_terms_by_segment(col, segment, segment_top_n).items():
+                for term, count in terms:
+                    ws.append([question, segment, level, term, count])
+
+    ws = wb.create_sheet('Near Duplicates')
+    _append_header(ws, ['Question', 'Respondents', 'Distinct wordings', 'Example'])
+    for col in analyzer.questions:
+        question = clean_column_name(col)
+        for group in analyzer.near_duplicate_groups(col)[:group_top_n]:
+            ws.append([question, group['respondents'], group['variants'], group['example']])
+
+    wb.save(output_file)
+    print(f"✓ Text analysis saved to: {output_file}")
+    return output_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--top', type=int, default=20, help='top terms per question (default: 20)')
+    parser.add_argument('--segment-top', type=int, default=5, help='top terms per segment level (default: 5)')
+    parser.add_argument('--batch-size', type=int, default=20000, help='rows per streamed batch (default: 20000)')
+    parser.add_argument('--exclude-flagged', action='store_true',
+                        help='leave out respondents flagged by the quality screening')
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+    analyzer = analyze_text(batch_size=args.batch_size, exclude_flagged=args.exclude_flagged)
+    write_text_analysis(analyzer, top_n=args.top, segment_top_n=args.segment_top)
@@ -1,11 +1,20 @@
 """
 Generate a comprehensive summary report of the survey analysis
 """
-import pandas as pd
+import argparse
+import numpy as np
 import os
 from datetime import datetime
 
-def generate_summary_report():
+from data_processing.data_loader import load_survey_data
+from data_processing.frequency_store import build_frequency_store, frequency_series, get_frequency_store, response_count
+from data_processing.instrumentation import add_arguments, enable, span, traced
+from data_processing.missingness import COMPLETENESS_THRESHOLDS, build_missingness, missingness_tables
+from data_processing.multi_select import MultiSelectMatrix
+from data_processing.question_catalog import get_question_catalog
+
+@traced()
+def generate_summary_report(exclude_flagged=False):
     """Generate a comprehensive summary report"""
     
     print("="*70)
@@ -16,7 +25,17 @@ def generate_summary_report():
     
     # Load data
     print("\n📊 Loading data...")
-    df = pd.read_excel('data/processed/merged_survey_data.xlsx')
+    df = load_survey_data()
+    catalog = get_question_catalog(df)
+    if exclude_flagged:
+        from data_processing.quality_screening import screen_frame
+        total = len(df)
+        df = screen_frame(df)
+        # The shared store counts every respondent, so the kept ones are counted afresh
+        store = build_frequency_store(df)
+        print(f"Flagged responses excluded: {total - len(df)} of {total}")
+    else:
+        store = get_frequency_store(df)
     
     # Basic statistics
     print("\n" + "="*70)
@@ -25,80 +44,88 @@ def generate_summary_report():
     print(f"Total Responses: {len(df)}")
     print(f"Total Questions: {len(df.columns) - 1}")  # Excluding source
     print(f"\nResponses by Source:")
-    for source, count in df['source'].value_counts().items():
+    for source, count in frequency_series(store, 'source').items():
         percentage = (count / len(df)) * 100
         print(f"  • {source}: {count} ({percentage:.1f}%)")
     
     # Data completeness
-    print("\n" + "="*70)
-    print("2. DATA COMPLETENESS")
-    print("="*70)
-    
-    # Calculate response rate for each column
-    response_rates = {}
-    for col in df.columns:
-        if col not in ['Carimbo de data/hora', 'source']:
-            valid_responses = df[col].notna().sum()
-            rate = (valid_responses / len(df)) * 100
-            response_rates[col] = rate
-    
-    avg_response_rate = sum(response_rates.values()) / len(response_rates)
-    print(f"Average Response Rate: {avg_response_rate:.1f}%")
-    print(f"Questions with >90% response rate: {sum(1 for r in response_rates.values() if r > 90)}")
-    print(f"Questions with >80% response rate: {sum(1 for r in response_rates.values() if r > 80)}")
-    print(f"Questions with >70% response rate: {sum(1 for r in response_rates.values() if r > 70)}")
+    with span('section Data completeness'):
+        print("\n" + "="*70)
+        print("2. DATA COMPLETENESS")
+        print("="*70)
+        
+        # One packed not-null matrix answers every completeness question
+        missing = build_missingness(df, catalog)
+        tables = missingness_tables(missing, catalog, top_patterns=1)
+        print(f"Average Response Rate: {missing.completeness().mean() * 100:.1f}%")
+        for threshold, count in zip(COMPLETENESS_THRESHOLDS, missing.threshold_counts()):
+            print(f"Questions with >{threshold}% response rate: {count}")
+        answered = missing.answered()
+        print(f"Median questions answered per respondent: {np.median(answered):.0f} of {len(missing.columns)}")
+        print(f"Distinct missingness patterns: {tables['n_patterns']}")
+        
+        dropoff = tables['dropoff']
+        if not dropoff.empty:
+            print("\nLargest drop-off points:")
+            for row in dropoff.nlargest(3, 'stopped').itertuples():
+                print(f"  • after {row.after}: {row.stopped} respondents stopped ({row.remaining_pct:.1f}% continued)")
     
     # Key findings
-    print("\n" + "="*70)
-    print("3. KEY FINDINGS SUMMARY")
-    print("="*70)
-    
-    # AI Tools
-    ai_tool_cols = [col for col in df.columns if 'which ai' in col.lower() or 'what ai' in col.lower()]
-    if ai_tool_cols:
-        print("\n📱 Most Used AI Chat Assistants:")
-        top_tools = df[ai_tool_cols[0]].value_counts().head(5)
-        for i, (tool, count) in enumerate(top_tools.items(), 1):
-            percentage = (count / df[ai_tool_cols[0]].notna().sum()) * 100
-            print(f"  {i}. {tool}: {count} ({percentage:.1f}%)")
-    
-    # Roles
-    role_cols = [col for col in df.columns if 'role' in col.lower() and 'scrum' in col.lower()]
-    if role_cols:
-        print("\n👥 Participant Roles:")
-        top_roles = df[role_cols[0]].value_counts().head(5)
-        for i, (role, count) in enumerate(top_roles.items(), 1):
-            percentage = (count / df[role_cols[0]].notna().sum()) * 100
-            print(f"  {i}. {role}: {count} ({percentage:.1f}%)")
-    
-    # Experience
-    exp_cols = [col for col in df.columns if 'experience' in col.lower() and 'year' in col.lower()]
-    if exp_cols:
-        print("\n📅 Experience Levels:")
-        top_exp = df[exp_cols[0]].value_counts().head(5)
-        for i, (exp, count) in enumerate(top_exp.items(), 1):
-            percentage = (count / df[exp_cols[0]].notna().sum()) * 100
-            print(f"  {i}. {exp}: {count} ({percentage:.1f}%)")
-    
-    # Benefits
-    benefit_cols = [col for col in df.columns if 'benefits' in col.lower() and 'experienced' in col.lower()]
-    if benefit_cols:
-        print("\n✅ Top Benefits Experienced:")
-        top_benefits = df[benefit_cols[0]].value_counts().head(5)
-        for i, (benefit, count) in enumerate(top_benefits.items(), 1):
-            percentage = (count / df[benefit_cols[0]].notna().sum()) * 100
-            benefit_short = benefit[:60] + '...' if len(benefit) > 60 else benefit
-            print(f"  {i}. {benefit_short}: {count} ({percentage:.1f}%)")
-    
-    # Challenges
-    challenge_cols = [col for col in df.columns if 'problem' in col.lower() or 'frustration' in col.lower()]
-    if challenge_cols:
-        print("\n⚠️  Top Challenges Encountered:")
-        top_challenges = df[challenge_cols[0]].value_counts().head(5)
-        for i, (challenge, count) in enumerate(top_challenges.items(), 1):
-            percentage = (count / df[challenge_cols[0]].notna().sum()) * 100
-            challenge_short = challenge[:60] + '...' if len(challenge) > 60 else challenge
-            print(f"  {i}. {challenge_short}: {count} ({percentage:.1f}%)")
+    with span('section Key findings'):
+        print("\n" + "="*70)
+        print("3. KEY FINDINGS SUMMARY")
+        print("="*70)
+        
+        # AI Tools
+        ai_tool_col = catalog.column('022')
+        if ai_tool_col:
+            print("\n📱 Most Used AI Chat Assistants:")
+            # Check-all-that-apply: counted per option, as a share of respondents
+            tools = MultiSelectMatrix.from_series(df[ai_tool_col])
+            top_tools = tools.counts().head(5)
+            for i, (tool, count) in enumerate(top_tools.items(), 1):
+                percentage = (count / tools.respondents()) * 100
+                print(f"  {i}. {tool}: {count} ({percentage:.1f}%)")
+        
+        # Roles
+        role_col = catalog.column('014')
+        if role_col:
+            print("\n👥 Participant Roles:")
+            top_roles = frequency_series(store, role_col).head(5)
+            for i, (role, count) in enumerate(top_roles.items(), 1):
+                percentage = (count / response_count(store, role_col)) * 100
+                print(f"  {i}. {role}: {count} ({percentage:.1f}%)")
+        
+        # Experience
+        exp_col = catalog.column('007')
+        if exp_col:
+            print("\n📅 Experience Levels:")
+            top_exp = frequency_series(store, exp_col).head(5)
+            for i, (exp, count) in enumerate(top_exp.items(), 1):
+                percentage = (count / response_count(store, exp_col)) * 100
+                print(f"  {i}. {exp}: {count} ({percentage:.1f}%)")
+        
+        # Benefits
+        benefit_col = catalog.column('096')
+        if benefit_col:
+            print("\n✅ Top Benefits Experienced:")
+            benefits = MultiSelectMatrix.from_series(df[benefit_col])
+            top_benefits = benefits.counts().head(5)
+            for i, (benefit, count) in enumerate(top_benefits.items(), 1):
+                percentage = (count / benefits.respondents()) * 100
+                benefit_short = benefit[:60] + '...' if len(benefit) > 60 else benefit
+                print(f"  {i}. {benefit_short}: {count} ({percentage:.1f}%)")
+        
+        # Challenges
+        challenge_col = catalog.column('104')
+        if challenge_col:
+            print("\n⚠️  Top Challenges Encountered:")
+            challenges = MultiSelectMatrix.from_series(df[challenge_col])
+            top_challenges = challenges.counts().head(5)
+            for i, (challenge, count) in enumerate(top_challenges.items(), 1):
+                percentage = (count / challenges.respondents()) * 100
+                challenge_short = challenge[:60] + '...' if len(challenge) > 60 else challenge
+                print(f"  {i}. {challenge_short}: {count} ({percentage:.1f}%)")
     
     # Files generated
     print("\n" + "="*70)
@@ -195,4 +222,10 @@ smjss26/
     print("="*70)
 
 if __name__ == "__main__":
-    generate_summary_report()
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--exclude-flagged', action='store_true',
+                        help='leave out respondents flagged by the quality screening')
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+    generate_summary_report(exclude_flagged=args.exclude_flagged)
@@ -2,231 +2,506 @@
 Create visualizations for survey data analysis
 """
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
+import argparse
+import functools
+import hashlib
+import json
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-# Set style
-sns.set_style("whitegrid")
-plt.rcParams['figure.figsize'] = (12, 8)
-plt.rcParams['font.size'] = 10
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_processing.bootstrap import bootstrap_cis, bootstrap_job
+from data_processing.crosstabs import build_crosstabs, crosstab_frame, get_crosstabs
+from data_processing.data_loader import load_survey_data
+from data_processing.frequency_store import build_frequency_store, frequency_series, get_frequency_store
+from data_processing.instrumentation import add_arguments, enable, record, span, traced
+from data_processing.likert_scales import scale_categories
+from data_processing.quality_screening import screen_frame
+from data_processing.multi_select import MultiSelectMatrix
+from data_processing.question_catalog import LIKERT, MULTI_SELECT, get_question_catalog
+
+# Plot style, applied when pyplot is first needed
+PLOT_STYLE = "whitegrid"
+PLOT_RC_PARAMS = {'figure.figsize': (12, 8), 'font.size': 10}
+PLOT_DPI = 300
+# One color per survey source, in store order (cycled when there are more sources)
+SOURCE_COLORS = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c']
+_style_applied = False
+
+# Records the input hash of every rendered figure
+PLOT_MANIFEST = 'outputs/plots/plot_manifest.json'
+
+def _pyplot():
+    """pyplot with the plot style applied"""
+    global _style_applied
+    import matplotlib.pyplot as plt
+    if not _style_applied:
+        import seaborn as sns
+        sns.set_style(PLOT_STYLE)
+        plt.rcParams.update(PLOT_RC_PARAMS)
+        _style_applied = True
+    return plt
 
 def ensure_output_dir():
     """Ensure output directory exists"""
     os.makedirs('outputs/plots', exist_ok=True)
 
-def plot_response_distribution(df):
-    """Plot distribution of responses by source"""
-    ensure_output_dir()
-    
+def response_distribution_spec(freq):
+    """Plot spec (counts and labels, no drawing) for the responses-by-source chart"""
+    # Sources in name order, so each keeps its bar position and color
+    freq = freq.sort_index()
+    return {
+        'kind': 'response_distribution',
+        'output_name': 'response_distribution',
+        'title': 'Distribution of Survey Responses by Source',
+        'labels': [str(label) for label in freq.index],
+        'counts': [int(count) for count in freq.values],
+    }
+
+def likert_plot_spec(freq, title, output_name, categories=None):
+    """Plot spec for a Likert question, with answers in scale order"""
+    freq = freq[freq > 0]
+    total_valid = int(freq.sum())
+    if total_valid == 0:
+        return None
+    
+    ordered_responses = [answer for answer in (categories or []) if answer in freq.index]
+    ordered_responses += [answer for answer in freq.index if answer not in ordered_responses]
+    
+    return {
+        'kind': 'likert',
+        'output_name': output_name,
+        'title': title,
+        'labels': [str(r) for r in ordered_responses],
+        'counts': [int(freq[r]) for r in ordered_responses],
+        'total_valid': total_valid,
+    }
+
+def multiple_choice_plot_spec(freq, title, output_name, top_n=10, respondents=None):
+    """Plot spec for the top N answers of a multiple choice question"""
+    total_valid = int(freq.sum()) if respondents is None else int(respondents)
+    if total_valid == 0:
+        return None
+    
+    freq = freq.head(top_n)
+    return {
+        'kind': 'multiple_choice',
+        'output_name': output_name,
+        'title': title,
+        'labels': [str(label) for label in freq.index],
+        'counts': [int(count) for count in freq.values],
+        'total_valid': total_valid,
+        'multi_select': respondents is not None,
+    }
+
+def crosstab_plot_spec(frame, title, output_name, max_levels=8):
+    """Plot spec for one question broken down by a segment (largest segment levels first)"""
+    frame = frame[frame.sum(axis=1) > 0]
+    if frame.empty:
+        return None
+    
+    n = frame.sum(axis=1).sort_values(ascending=False, kind='stable').head(max_levels)
+    frame = frame.loc[n.index]
+    return {
+        'kind': 'crosstab',
+        'output_name': output_name,
+        'title': title,
+        'labels': [str(level) for level in frame.index],
+        'answers': [str(answer) for answer in frame.columns],
+        'counts': frame.to_numpy().astype(int).tolist(),
+    }
+
+def render_response_distribution(spec):
+    """Draw and save the responses-by-source chart"""
+    plt = _pyplot()
     fig, ax = plt.subplots(figsize=(10, 6))
     
-    source_counts = df['source'].value_counts()
-    bars = ax.bar(range(len(source_counts)), source_counts.values, 
-                  edgecolor='black', color=['#3498db', '#e74c3c'])
+    counts = spec['counts']
+    colors = [SOURCE_COLORS[i % len(SOURCE_COLORS)] for i in range(len(counts))]
+    bars = ax.bar(range(len(counts)), counts,
+                  edgecolor='black', color=colors)
     
     # Add value labels on bars
-    for i, (bar, count) in enumerate(zip(bars, source_counts.values)):
+    for i, (bar, count) in enumerate(zip(bars, counts)):
         ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 2,
                 f'{count}', ha='center', va='bottom', fontsize=12, fontweight='bold')
     
-    ax.set_xticks(range(len(source_counts)))
-    ax.set_xticklabels(['Survey 1\n(respostas)', 'Survey 2\n(Udemy)'], fontsize=11)
+    ax.set_xticks(range(len(counts)))
+    # "Survey 1 (respostas)" -> "Survey 1" over "(respostas)"
+    ax.set_xticklabels([label.replace(' (', '\n(', 1) for label in spec['labels']], fontsize=11)
     ax.set_ylabel('Number of Responses', fontsize=12)
-    ax.set_title('Distribution of Survey Responses by Source', fontsize=14, fontweight='bold')
-    ax.set_ylim(0, max(source_counts.values) * 1.15)
+    ax.set_title(spec['title'], fontsize=14, fontweight='bold')
+    ax.set_ylim(0, max(counts) * 1.15)
     
     plt.tight_layout()
-    plt.savefig('outputs/plots/response_distribution.png', dpi=300, bbox_inches='tight')
-    print("✓ Saved: response_distribution.png")
+    plt.savefig(f"outputs/plots/{spec['output_name']}.png", dpi=PLOT_DPI, bbox_inches='tight')
     plt.close()
+    return f"✓ Saved: {spec['output_name']}.png"
 
-def plot_likert_scale_question(df, column, title, output_name):
-    """Plot a Likert scale question - percentages add up to 100%"""
-    ensure_output_dir()
-    
-    # Define Likert scale order
-    likert_order = [
-        'Never',
-        'Rarely',
-        'Sometimes',
-        'Often',
-        'Always',
-        'Very Low',
-        'Low',
-        'Moderate',
-        'High',
-        'Very High',
-        'Strongly Disagree',
-        'Disagree',
-        'Neutral',
-        'Agree',
-        'Strongly Agree',
-        'Not at all helpful',
-        'Slightly helpful',
-        'Moderately helpful',
-        'Very helpful',
-        'Extremely helpful'
-    ]
-    
-    # Get value counts (excluding NaN)
-    valid_responses = df[column].dropna()
-    if len(valid_responses) == 0:
-        return
-    
-    total_valid = len(valid_responses)
-    freq = valid_responses.value_counts()
-    
-    # Try to order by Likert scale
-    ordered_responses = []
-    for scale_val in likert_order:
-        if scale_val in freq.index:
-            ordered_responses.append(scale_val)
-    
-    # Add any remaining responses not in the predefined order
-    for val in freq.index:
-        if val not in ordered_responses:
-            ordered_responses.append(val)
-    
-    # Filter to only include responses that exist
-    ordered_responses = [r for r in ordered_responses if r in freq.index]
-    
-    if not ordered_responses:
-        return
-    
-    # Create plot
+def ci_error_bars(ax, spec, counts, vertical=True):
+    """Draw the spec's bootstrap 95% CIs as error bars; returns the top of each bar or whisker"""
+    if 'ci_low' not in spec:
+        return list(counts)
+    
+    scale = spec['total_valid'] / 100
+    low = [pct * scale for pct in spec['ci_low']]
+    high = [pct * scale for pct in spec['ci_high']]
+    yerr = [[max(c - l, 0) for c, l in zip(counts, low)], [max(h - c, 0) for c, h in zip(counts, high)]]
+    positions = range(len(counts))
+    if vertical:
+        ax.errorbar(positions, counts, yerr=yerr, fmt='none', ecolor='black', capsize=4, linewidth=1)
+    else:
+        ax.errorbar(counts, positions, xerr=yerr, fmt='none', ecolor='black', capsize=4, linewidth=1)
+    return [max(c, h) for c, h in zip(counts, high)]
+
+def render_likert_plot(spec):
+    """Draw and save a Likert bar chart - percentages add up to 100%"""
+    plt = _pyplot()
     fig, ax = plt.subplots(figsize=(12, 6))
     
-    frequencies = [freq[r] for r in ordered_responses]
+    ordered_responses = spec['labels']
+    frequencies = spec['counts']
+    total_valid = spec['total_valid']
     # Calculate percentages based on total valid responses (should sum to 100%)
     percentages = [(f/total_valid*100) for f in frequencies]
     
-    bars = ax.bar(range(len(ordered_responses)), frequencies, 
+    bars = ax.bar(range(len(ordered_responses)), frequencies,
                   edgecolor='black', color='#2ecc71')
+    tops = ci_error_bars(ax, spec, frequencies, vertical=True)
     
     # Add value labels
     for i, (bar, count, pct) in enumerate(zip(bars, frequencies, percentages)):
-        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5,
+        ax.text(bar.get_x() + bar.get_width()/2, tops[i] + 0.5,
                 f'{count}\n({pct:.1f}%)', ha='center', va='bottom', fontsize=9)
     
     # Add total percentage check in title
     total_pct = sum(percentages)
-    title_with_check = f"{title}\n(n={total_valid}, total={total_pct:.1f}%)"
+    title_with_check = f"{spec['title']}\n(n={total_valid}, total={total_pct:.1f}%)"
     
     ax.set_xticks(range(len(ordered_responses)))
     ax.set_xticklabels(ordered_responses, rotation=45, ha='right')
     ax.set_ylabel('Frequency', fontsize=12)
     ax.set_title(title_with_check, fontsize=13, fontweight='bold')
-    ax.set_ylim(0, max(frequencies) * 1.25)
+    ax.set_ylim(0, max(tops) * 1.25)
     
     plt.tight_layout()
-    plt.savefig(f'outputs/plots/{output_name}.png', dpi=300, bbox_inches='tight')
-    print(f"✓ Saved: {output_name}.png (n={total_valid}, Σ%={total_pct:.1f}%)")
+    plt.savefig(f"outputs/plots/{spec['output_name']}.png", dpi=PLOT_DPI, bbox_inches='tight')
     plt.close()
+    return f"✓ Saved: {spec['output_name']}.png (n={total_valid}, Σ%={total_pct:.1f}%)"
 
-def plot_multiple_choice_question(df, column, title, output_name, top_n=10):
-    """Plot a multiple choice question with top N responses - percentages based on valid responses"""
-    ensure_output_dir()
-    
-    valid_responses = df[column].dropna()
-    if len(valid_responses) == 0:
-        return
-    
-    total_valid = len(valid_responses)
-    freq = valid_responses.value_counts().head(top_n)
-    
+def render_multiple_choice_plot(spec):
+    """Draw and save a horizontal bar chart of the top answers"""
+    plt = _pyplot()
     fig, ax = plt.subplots(figsize=(14, 8))
     
+    counts = spec['counts']
+    total_valid = spec['total_valid']
+    
     # Shorten labels if too long
-    labels = [str(label)[:60] + '...' if len(str(label)) > 60 else str(label) 
-              for label in freq.index]
+    labels = [label[:60] + '...' if len(label) > 60 else label
+              for label in spec['labels']]
     
-    bars = ax.barh(range(len(freq)), freq.values, edgecolor='black', color='#9b59b6')
+    bars = ax.barh(range(len(counts)), counts, edgecolor='black', color='#9b59b6')
+    tops = ci_error_bars(ax, spec, counts, vertical=False)
     
     # Calculate percentages based on total valid responses
-    percentages = [(count / total_valid * 100) for count in freq.values]
+    percentages = [(count / total_valid * 100) for count in counts]
     total_shown_pct = sum(percentages)
     
     # Add value labels
-    for i, (bar, count, pct) in enumerate(zip(bars, freq.values, percentages)):
-        ax.text(bar.get_width() + 0.5, bar.get_y() + bar.get_height()/2,
+    for i, (bar, count, pct) in enumerate(zip(bars, counts, percentages)):
+        ax.text(tops[i] + 0.5, bar.get_y() + bar.get_height()/2,
                 f'{count} ({pct:.1f}%)', va='center', fontsize=9)
     
-    ax.set_yticks(range(len(freq)))
+    ax.set_yticks(range(len(counts)))
     ax.set_yticklabels(labels, fontsize=9)
     ax.set_xlabel('Frequency', fontsize=12)
     
     # Add sample size and coverage to title
-    title_with_info = f"{title}\n(n={total_valid}, showing top {len(freq)}, coverage={total_shown_pct:.1f}%)"
-    ax.set_title(title_with_info, fontsize=13, fontweight='bold')
-    ax.set_xlim(0, max(freq.values) * 1.15)
+    if spec.get('multi_select'):
+        # Respondents can pick several options, so shares do not add up to 100%
+        info = f"n={total_valid} respondents, showing top {len(counts)} options, % of respondents"
+    else:
+        info = f"n={total_valid}, showing top {len(counts)}, coverage={total_shown_pct:.1f}%"
+    ax.set_title(f"{spec['title']}\n({info})", fontsize=13, fontweight='bold')
+    ax.set_xlim(0, max(tops) * 1.15)
     
     plt.tight_layout()
-    plt.savefig(f'outputs/plots/{output_name}.png', dpi=300, bbox_inches='tight')
-    print(f"✓ Saved: {output_name}.png (n={total_valid}, coverage={total_shown_pct:.1f}%)")
+    plt.savefig(f"outputs/plots/{spec['output_name']}.png", dpi=PLOT_DPI, bbox_inches='tight')
     plt.close()
+    if spec.get('multi_select'):
+        return f"✓ Saved: {spec['output_name']}.png (n={total_valid} respondents, {len(counts)} options)"
+    return f"✓ Saved: {spec['output_name']}.png (n={total_valid}, coverage={total_shown_pct:.1f}%)"
 
-def create_all_visualizations():
-    """Create all visualizations for the survey"""
+def render_crosstab_plot(spec):
+    """Draw and save stacked bars of answer shares within each segment level"""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(14, 8))
     
-    print("Loading data...")
-    df = pd.read_excel('data/processed/merged_survey_data.xlsx')
+    counts = np.array(spec['counts'], dtype=float)
+    totals = counts.sum(axis=1)
+    shares = counts / totals[:, None] * 100
+    import seaborn as sns
+    colors = sns.color_palette('RdYlGn', len(spec['answers']))
+    
+    left = np.zeros(len(spec['labels']))
+    for j, answer in enumerate(spec['answers']):
+        ax.barh(range(len(spec['labels'])), shares[:, j], left=left,
+                edgecolor='black', color=colors[j], label=answer)
+        left += shares[:, j]
+    
+    ax.set_yticks(range(len(spec['labels'])))
+    ax.set_yticklabels([f"{label} (n={int(total)})" for label, total in zip(spec['labels'], totals)], fontsize=9)
+    ax.invert_yaxis()
+    ax.set_xlabel('Percentage of segment', fontsize=12)
+    ax.set_xlim(0, 100)
+    ax.set_title(spec['title'], fontsize=13, fontweight='bold')
+    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.08), ncol=min(len(spec['answers']), 3), fontsize=9)
     
-    print(f"\nCreating visualizations for {len(df)} responses...\n")
+    plt.tight_layout()
+    plt.savefig(f"outputs/plots/{spec['output_name']}.png", dpi=PLOT_DPI, bbox_inches='tight')
+    plt.close()
+    return f"✓ Saved: {spec['output_name']}.png ({len(spec['labels'])} segments, n={int(totals.sum())})"
+
+RENDERERS = {
+    'response_distribution': render_response_distribution,
+    'likert': render_likert_plot,
+    'multiple_choice': render_multiple_choice_plot,
+    'crosstab': render_crosstab_plot,
+}
+
+def render_plot(spec):
+    """Render one plot spec; returns (output name, seconds, status message)"""
+    start = time.perf_counter()
+    with span(f"plot {spec['output_name']}", kind=spec['kind']):
+        message = RENDERERS[spec['kind']](spec)
+    return spec['output_name'], time.perf_counter() - start, message
+
+def _init_render_worker():
+    """Worker processes render headless with the Agg backend"""
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+@functools.lru_cache(maxsize=None)
+def renderer_digest(kind):
+    """Hash of the source of the code that draws a kind of plot, so editing it redraws those figures"""
+    import inspect
+    source = ''.join(inspect.getsource(func) for func in (_pyplot, ci_error_bars, render_plot, RENDERERS[kind]))
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+def plot_digest(spec):
+    """Content hash of everything that ends up in a figure: counts, labels, title, style, DPI and drawing code"""
+    key = {
+        'spec': spec,
+        'style': PLOT_STYLE,
+        'rc_params': PLOT_RC_PARAMS,
+        'dpi': PLOT_DPI,
+        'renderer': renderer_digest(spec['kind']),
+    }
+    payload = json.dumps(key, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def plot_path(output_name):
+    return f'outputs/plots/{output_name}.png'
+
+def load_plot_manifest(path=PLOT_MANIFEST):
+    """Output name -> input hash of the figures rendered by the last run"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_plot_manifest(manifest, path=PLOT_MANIFEST):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def plan_plot_cache(specs, digests, manifest, force=False):
+    """Split specs into (to render, unchanged) and list the stale figures the manifest still tracks"""
+    to_render, unchanged = [], []
+    for spec in specs:
+        name = spec['output_name']
+        if not force and manifest.get(name) == digests[name] and os.path.exists(plot_path(name)):
+            unchanged.append(spec)
+        else:
+            to_render.append(spec)
+
+    current = {spec['output_name'] for spec in specs}
+    stale = sorted(name for name in manifest if name not in current)
+    return to_render, unchanged, stale
+
+def plot_response_distribution(df, freq=None):
+    """Plot distribution of responses by source"""
+    ensure_output_dir()
+    
+    source_counts = df['source'].value_counts() if freq is None else freq
+    print(render_plot(response_distribution_spec(source_counts))[2])
+
+def plot_likert_scale_question(df, column, title, output_name, freq=None):
+    """Plot a Likert scale question - percentages add up to 100%"""
+    ensure_output_dir()
     
-    # 1. Response distribution
-    print("Creating response distribution plot...")
-    plot_response_distribution(df)
+    # Get value counts (excluding NaN)
+    if freq is None:
+        freq = df[column].dropna().value_counts()
+    
+    # Ordered Categorical columns carry their scale
+    categories = list(df[column].cat.categories) if isinstance(df[column].dtype, pd.CategoricalDtype) else None
+    spec = likert_plot_spec(freq, title, output_name, categories)
+    if spec is not None:
+        print(render_plot(spec)[2])
+
+def plot_multiple_choice_question(df, column, title, output_name, top_n=10, freq=None):
+    """Plot a multiple choice question with top N responses - percentages based on valid responses"""
+    ensure_output_dir()
     
-    # 2. Find and plot key Likert scale questions
-    likert_columns = [col for col in df.columns if any(x in col.lower() for x in 
-                     ['how often', 'to what extent', 'do you agree', 'helpful'])]
+    if freq is None:
+        freq = df[column].dropna().value_counts()
     
-    print(f"\nFound {len(likert_columns)} Likert-scale questions")
+    spec = multiple_choice_plot_spec(freq, title, output_name, top_n=top_n)
+    if spec is not None:
+        print(render_plot(spec)[2])
+
+@traced()
+def build_plot_specs(df, store, catalog, crosstabs=None):
+    """Precompute counts, labels and titles for every figure"""
+    specs = [response_distribution_spec(frequency_series(store, 'source'))]
+    
+    # Key Likert scale questions
+    likert_columns = catalog.columns(qtype=LIKERT, scale=['usage_frequency', 'helpfulness', 'agreement'])
+    print(f"Found {len(likert_columns)} Likert-scale questions")
     
     # Plot first few Likert questions
     for i, col in enumerate(likert_columns[:10]):  # Limit to 10
         short_title = col.split('?')[0][:80] if '?' in col else col[:80]
-        plot_likert_scale_question(df, col, short_title, f'likert_{i+1}')
-    
-    # 3. Find and plot multiple choice questions
-    print("\nCreating multiple choice visualizations...")
-    
-    # AI tools used
-    ai_tool_cols = [col for col in df.columns if 'which ai' in col.lower() or 'what ai' in col.lower()]
-    if ai_tool_cols:
-        plot_multiple_choice_question(df, ai_tool_cols[0], 
-                                     'AI Chat Assistants Used', 
-                                     'ai_tools_used', top_n=10)
-    
-    # Roles
-    role_cols = [col for col in df.columns if 'role' in col.lower() and 'scrum' in col.lower()]
-    if role_cols:
-        plot_multiple_choice_question(df, role_cols[0], 
-                                     'Scrum Roles', 
-                                     'scrum_roles', top_n=8)
-    
-    # Experience
-    exp_cols = [col for col in df.columns if 'experience' in col.lower() and 'year' in col.lower()]
-    if exp_cols:
-        plot_multiple_choice_question(df, exp_cols[0], 
-                                     'Years of Experience', 
-                                     'experience_years', top_n=8)
-    
-    # Benefits
-    benefit_cols = [col for col in df.columns if 'benefits' in col.lower() and 'experienced' in col.lower()]
-    if benefit_cols:
-        plot_multiple_choice_question(df, benefit_cols[0], 
-                                     'Benefits Experienced with AI Chat Assistants', 
-                                     'benefits_experienced', top_n=12)
-    
-    # Challenges
-    challenge_cols = [col for col in df.columns if 'problem' in col.lower() or 'frustration' in col.lower()]
-    if challenge_cols:
-        plot_multiple_choice_question(df, challenge_cols[0], 
-                                     'Problems and Frustrations Encountered', 
-                                     'problems_frustrations', top_n=12)
+        categories = scale_categories(catalog.entry(col)['scale'])
+        specs.append(likert_plot_spec(frequency_series(store, col), short_title, f'likert_{i+1}', categories))
+    
+    # Multiple choice questions: (catalog code, title, output name, top N)
+    multiple_choice = [
+        ('022', 'AI Chat Assistants Used', 'ai_tools_used', 10),
+        ('014', 'Scrum Roles', 'scrum_roles', 8),
+        ('007', 'Years of Experience', 'experience_years', 8),
+        ('096', 'Benefits Experienced with AI Chat Assistants', 'benefits_experienced', 12),
+        ('104', 'Problems and Frustrations Encountered', 'problems_frustrations', 12),
+    ]
+    for code, title, output_name, top_n in multiple_choice:
+        col = catalog.column(code)
+        if col:
+            # Multi-select questions are counted per option, not per joined answer
+            if catalog.entry(col)['qtype'] == MULTI_SELECT:
+                matrix = MultiSelectMatrix.from_series(df[col], col)
+                specs.append(multiple_choice_plot_spec(matrix.counts(), title, output_name,
+                                                       top_n=top_n, respondents=matrix.respondents()))
+            else:
+                specs.append(multiple_choice_plot_spec(frequency_series(store, col), title,
+                                                       output_name, top_n=top_n))
+    
+    # Segment breakdowns, read from the crosstab cache
+    usage_col = catalog.column('020')
+    if crosstabs is not None and usage_col in crosstabs['questions']:
+        for segment, output_name in [('Primary role', 'usage_frequency_by_role'),
+                                     ('Experience', 'usage_frequency_by_experience')]:
+            if segment in crosstabs['segments']:
+                specs.append(crosstab_plot_spec(crosstab_frame(crosstabs, segment, usage_col),
+                                                f'AI Chat Assistant Usage Frequency by {segment}',
+                                                output_name))
+    
+    return [spec for spec in specs if spec is not None]
+
+@traced()
+def add_bootstrap_cis(specs, workers=1):
+    """Attach bootstrap 95% CIs (in percent) to every bar of the Likert and multiple choice specs"""
+    jobs = {}
+    for spec in specs:
+        if spec['kind'] not in ('likert', 'multiple_choice'):
+            continue
+        counts = list(spec['counts'])
+        if spec.get('multi_select'):
+            jobs[spec['output_name']] = bootstrap_job(counts, n=spec['total_valid'], exclusive=False)
+        else:
+            # Answers beyond the top N stay in the resample as one remainder slot
+            remainder = spec['total_valid'] - sum(counts)
+            jobs[spec['output_name']] = bootstrap_job(counts + ([remainder] if remainder else []))
+    
+    cis = bootstrap_cis(jobs, workers=workers)
+    for spec in specs:
+        ci = cis.get(spec['output_name'])
+        if ci and 'pct_low' in ci:
+            shown = len(spec['counts'])
+            spec['ci_low'] = [round(v, 4) for v in ci['pct_low'][:shown]]
+            spec['ci_high'] = [round(v, 4) for v in ci['pct_high'][:shown]]
+    return specs
+
+def print_timing_summary(timings, wall_time):
+    """Print per-plot render times, slowest first"""
+    print("\nRender timing (slowest first):")
+    for name, seconds in sorted(timings, key=lambda t: t[1], reverse=True):
+        print(f"  {name:<28} {seconds:6.2f}s")
+    total = sum(seconds for _, seconds in timings)
+    print(f"  {'total render time':<28} {total:6.2f}s")
+    print(f"  {'wall time':<28} {wall_time:6.2f}s")
+
+@traced()
+def create_all_visualizations(jobs=1, force=False, exclude_flagged=False):
+    """Create all visualizations for the survey"""
+    # 0 = one worker per CPU, for the bootstrap as well as the rendering
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    
+    print("Loading data...")
+    df = load_survey_data()
+    catalog = get_question_catalog(df)
+    if exclude_flagged:
+        # The shared store and crosstabs cover every respondent, so the kept ones are counted afresh
+        df = screen_frame(df)
+        store = build_frequency_store(df)
+        crosstabs = build_crosstabs(df, catalog)
+    else:
+        store = get_frequency_store(df)
+        crosstabs = get_crosstabs(df, catalog)
+    
+    print(f"\nCreating visualizations for {len(df)} responses...\n")
+    ensure_output_dir()
+    specs = add_bootstrap_cis(build_plot_specs(df, store, catalog, crosstabs), workers=jobs)
+    
+    # Skip figures whose input hash matches the manifest
+    manifest = load_plot_manifest()
+    digests = {spec['output_name']: plot_digest(spec) for spec in specs}
+    to_render, unchanged, stale = plan_plot_cache(specs, digests, manifest, force=force)
+    for spec in unchanged:
+        print(f"✓ Unchanged: {spec['output_name']}.png (cached)")
+    
+    start = time.perf_counter()
+    timings = []
+    if jobs > 1 and len(to_render) > 1:
+        print(f"\nRendering {len(to_render)} plots with {jobs} worker processes...")
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_render_worker) as pool:
+            for name, seconds, message in pool.map(render_plot, to_render):
+                print(message)
+                timings.append((name, seconds))
+                # Worker spans are not traced; keep their render times
+                record(f'plot {name}', wall_s=round(seconds, 6), worker=True)
+    else:
+        print(f"\nRendering {len(to_render)} plots...")
+        for spec in to_render:
+            name, seconds, message = render_plot(spec)
+            print(message)
+            timings.append((name, seconds))
+    
+    # Garbage-collect figures no current spec produces
+    for name in stale:
+        if os.path.exists(plot_path(name)):
+            os.remove(plot_path(name))
+        print(f"✓ Removed stale plot: {name}.png")
+    
+    save_plot_manifest(digests)
+    
+    print_timing_summary(timings, time.perf_counter() - start)
+    print(f"  {len(to_render)} rendered, {len(unchanged)} unchanged, {len(stale)} removed")
     
     print("\n" + "="*50)
     print("All visualizations created successfully!")
@@ -234,4 +509,15 @@ def create_all_visualizations():
     print("="*50)
 
 if __name__ == "__main__":
-    create_all_visualizations()
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='number of worker processes for rendering (0 = one per CPU; default: 1)')
+    parser.add_argument('--force', action='store_true',
+                        help='redraw every figure even if its inputs are unchanged')
+    parser.add_argument('--exclude-flagged', action='store_true',
+                        help='leave out respondents flagged by the quality screening')
+    add_arguments(parser)
+    args = parser.parse_args()
+    enable(args.trace, args.profile)
+    create_all_visualizations(jobs=args.jobs, force=args.force,
+                              exclude_flagged=args.exclude_flagged)
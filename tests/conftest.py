@@ -0,0 +1,47 @@
+"""Make the src packages and the scripts importable, plus data shared by the tests"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+# File names of the two form exports in data/raw
+PT_EXPORT = 'Exploring the Use of AI Chat Assistants in Scrum (respostas).xlsx'
+EN_EXPORT = 'Exploring the Use of AI Chat Assistants in Scrum - Udemy (Responses).xlsx'
+ROLE = 'What is your primary role in the Scrum Team?'
+YEARS = 'How many years have you worked with Scrum?'
+TOOL = 'Which AI chat assistant do you use most?'
+
+
+def entry(column, code, qtype, block=None):
+    """A question catalog entry"""
+    return {'column': column, 'code': code, 'label': None, 'group': 'Test', 'block': block,
+            'qtype': qtype, 'scale': None}
+
+
+def raw_export(timestamp, n, seed, start='2024-02-01'):
+    """A small form export: submission times, a choice, a whole number with blanks and free text"""
+    rng = np.random.default_rng(seed)
+    years = rng.integers(1, 15, n).astype(float)
+    # Blank cells make the whole-number column a float one in pd.read_excel
+    years[::4] = np.nan
+    return pd.DataFrame({
+        timestamp: pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, 10 ** 6, n)), unit='s'),
+        ROLE: rng.choice(['Developer', 'Scrum Master', 'Product Owner'], n),
+        YEARS: years,
+        TOOL: rng.choice(['ChatGPT', '4', 'N/A', 'Gemini'], n),
+    })
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty repository layout; the merges read and write data/ relative to the working directory"""
+    os.makedirs(tmp_path / 'data' / 'raw')
+    os.makedirs(tmp_path / 'data' / 'processed')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
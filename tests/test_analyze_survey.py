@@ -0,0 +1,97 @@
+"""Descriptive report: segment statistics from the bitmap index and rendering them in parallel"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import analyze_survey
+from analyze_survey import compute_report_stats, render_report, segment_report_paths, write_segment_reports
+from data_processing.crosstabs import build_crosstabs
+from data_processing.frequency_store import build_frequency_store
+from data_processing.likert_scales import LIKERT_SCALES, apply_likert_scales
+from data_processing.question_catalog import build_question_catalog
+
+ROLE = 'What is your primary role in the Scrum Team?'
+COUNTRY = 'In what country do you currently work?'
+USAGE = 'How often do you use AI chat assistants in your Scrum work?'
+TOOLS = 'Which AI chat assistants do you currently use?'
+HELPFUL = 'To what extent are AI chat assistants helpful for the following roles? [{}]'
+
+
+def survey(n=120, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(n), unit='h'),
+        ROLE: rng.choice(['Developer', 'Scrum Master', 'Product Owner', 'Agile Coach / Other'], n),
+        COUNTRY: rng.choice(['Brazil', 'Portugal', None], n),
+        USAGE: rng.choice(LIKERT_SCALES['usage_frequency'], n),
+        TOOLS: rng.choice(['ChatGPT (OpenAI)', 'ChatGPT (OpenAI), Gemini', 'Copilot', None], n),
+    })
+    for role in ('Developers', 'Scrum Masters', 'Product Owners'):
+        df[HELPFUL.format(role)] = rng.choice(LIKERT_SCALES['helpfulness'], n)
+    df['source'] = rng.choice(['Survey 1 (respostas)', 'Survey 2 (Udemy)'], n)
+    for col in df.columns[1:]:
+        df[col] = df[col].astype('string')
+    catalog = build_question_catalog(list(df.columns), labels={})
+    return apply_likert_scales(df, catalog), catalog
+
+
+def stats_of(df, catalog, tmp_path, **options):
+    return compute_report_stats(df, build_frequency_store(df), catalog, build_crosstabs(df, catalog),
+                                data_path=tmp_path / 'merged.xlsx', **options)
+
+
+@pytest.fixture
+def computed(tmp_path):
+    df, catalog = survey()
+    return df, catalog, stats_of(df, catalog, tmp_path, segments=['Primary role'], min_responses=20)
+
+
+def test_segment_tables_match_recounting_the_segment(computed, tmp_path):
+    df, catalog, stats = computed
+    roles = df[ROLE].value_counts()
+    assert set(stats) == {None} | {('Primary role', role) for role, n in roles.items() if n >= 20}
+    for key, population in stats.items():
+        if key is None:
+            continue
+        subset = df[df[ROLE] == key[1]].reset_index(drop=True)
+        alone = stats_of(subset, catalog, tmp_path / key[1].replace('/', '-'))[None]
+        assert population.total == alone.total == len(subset)
+        for col, counts in alone.question_table.items():
+            pd.testing.assert_series_equal(population.question_table[col], counts, check_names=False)
+        assert population.store['columns'][HELPFUL.format('Developers')] == \
+            alone.store['columns'][HELPFUL.format('Developers')]
+
+
+def test_report_of_the_whole_sample(computed):
+    df, _, stats = computed
+    report = render_report(stats[None])
+    assert report.startswith('# Descriptive Statistics\n')
+    assert f'- **Total responses**: {len(df)}' in report
+    assert '## AI Chat Assistant Usage Frequency by Segment' in report
+    assert '### By Primary role' in report
+    # Only the chosen segment's own breakdown is left out of its reports
+    segment = render_report(stats[('Primary role', 'Developer')])
+    assert segment.startswith('# Descriptive Statistics: Primary role = Developer\n')
+    assert '### By Primary role' not in segment and '### By Source' in segment
+
+
+def test_parallel_rendering_writes_the_same_reports(computed, tmp_path, monkeypatch):
+    _, _, stats = computed
+    monkeypatch.setattr(analyze_survey, 'OUTPUT_DIR', tmp_path / 'sequential')
+    sequential = write_segment_reports(stats, formats=('md', 'html'), workers=1)
+    monkeypatch.setattr(analyze_survey, 'OUTPUT_DIR', tmp_path / 'parallel')
+    parallel = write_segment_reports(stats, formats=('md', 'html'), workers=2)
+    assert len(sequential) == len(parallel) == 2 * (len(stats) - 1)
+    for a, b in zip(sequential, parallel):
+        assert a.relative_to(tmp_path / 'sequential') == b.relative_to(tmp_path / 'parallel')
+        assert a.read_text(encoding='utf-8') == b.read_text(encoding='utf-8')
+    assert (tmp_path / 'parallel' / 'segments' / 'primary-role' / 'developer.html').exists()
+
+
+def test_colliding_level_names_get_a_suffix(computed, monkeypatch, tmp_path):
+    _, _, stats = computed
+    monkeypatch.setattr(analyze_survey, 'OUTPUT_DIR', tmp_path)
+    population = stats[None]
+    paths = [path for _, path, _ in segment_report_paths({None: population, ('Role', 'A/B'): population,
+                                                          ('Role', 'a b'): population})]
+    assert [path.name for path in paths] == ['a-b.md', 'a-b-2.md']
@@ -0,0 +1,106 @@
+"""Association analysis: chi-square tail, FDR adjustment and the all-pairs statistics"""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processing.associations import _gammaincc, association_statistics, chi2_sf, fdr_bh, gram_matrix
+
+XS = np.array([0.01, 0.5, 1.0, 3.841458820694124, 7.5, 20.0, 60.0])
+
+
+@pytest.mark.parametrize('dof, closed_form', [
+    (1, lambda x: math.erfc(math.sqrt(x / 2))),
+    (2, lambda x: math.exp(-x / 2)),
+    (4, lambda x: math.exp(-x / 2) * (1 + x / 2)),
+])
+def test_chi2_sf_matches_closed_forms(dof, closed_form):
+    # Small x takes the power series, large x the continued fraction
+    expected = [closed_form(x) for x in XS]
+    assert np.allclose(chi2_sf(XS, dof), expected, rtol=1e-9, atol=1e-300)
+    assert np.allclose(_gammaincc(np.full(len(XS), dof / 2), XS / 2), expected, rtol=1e-9, atol=1e-300)
+
+
+def test_chi2_sf_reference_values():
+    assert chi2_sf(3.841458820694124, 1) == pytest.approx(0.05, rel=1e-9)
+    assert chi2_sf(10, 5) == pytest.approx(0.0752352, rel=1e-5)
+    assert chi2_sf(0, 3) == 1.0
+
+
+def test_gammaincc_is_nan_outside_its_domain():
+    q = _gammaincc(np.array([0.0, 1.0, -1.0]), np.array([1.0, -1.0, 1.0]))
+    assert np.isnan(q).all()
+
+
+def test_fdr_bh_by_hand():
+    # Sorted: 0.01, 0.03, 0.04, 0.2 -> p * 4 / rank = 0.04, 0.06, 0.0533, 0.2, then made monotone
+    q = fdr_bh([0.04, 0.01, np.nan, 0.2, 0.03])
+    assert np.isnan(q[2])
+    assert np.allclose(q[[0, 1, 3, 4]], [0.16 / 3, 0.04, 0.2, 0.16 / 3])
+
+
+def test_fdr_bh_is_capped_at_one():
+    assert fdr_bh([0.9, 0.95]).tolist() == [0.95, 0.95]
+    assert np.isnan(fdr_bh([np.nan])).all()
+
+
+def survey(n=400, seed=1):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 3, n)
+    # b depends on a, c does not
+    b = np.where(rng.random(n) < 0.6, a, rng.integers(0, 3, n))
+    df = pd.DataFrame({
+        'a': pd.Series(np.array(['low', 'mid', 'high'])[a], dtype='string'),
+        'b': pd.Series(np.array(['x', 'y', 'z'])[b], dtype='string'),
+        'c': pd.Series(np.array(['u', 'v'])[rng.integers(0, 2, n)], dtype='string'),
+    })
+    # Some respondents skipped questions; tables only count those who answered both
+    for col, frac in (('a', 0.1), ('b', 0.05), ('c', 0.2)):
+        df.loc[rng.random(n) < frac, col] = pd.NA
+    return df
+
+
+def by_hand(df, first, second):
+    table = pd.crosstab(df[first], df[second]).to_numpy().astype(float)
+    n = table.sum()
+    expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / n
+    chi2 = ((table - expected) ** 2 / expected).sum()
+    k = min(table.shape) - 1
+    return {'n': n, 'chi2': chi2, 'dof': (table.shape[0] - 1) * (table.shape[1] - 1),
+            'cramers_v': math.sqrt(chi2 / n / k), 'min_expected': expected.min()}
+
+
+def test_gram_matrix_holds_the_contingency_tables():
+    df = survey()
+    gram, starts, labels = gram_matrix(df, ['a', 'b', 'c'], chunk_size=64)
+    table = gram[starts[0]:starts[1], starts[1]:starts[2]]
+    expected = pd.crosstab(df['a'], df['b']).reindex(index=labels[0], columns=labels[1])
+    assert table.tolist() == expected.to_numpy().tolist()
+    # The diagonal block counts each answer of a question
+    assert np.diag(gram)[starts[2]:starts[3]].tolist() == df['c'].value_counts().reindex(labels[2]).tolist()
+
+
+def test_statistics_match_the_textbook_formulas():
+    df = survey()
+    columns = ['a', 'b', 'c']
+    stats = association_statistics(*gram_matrix(df, columns)[:2])
+    for i, j in ((0, 1), (0, 2), (1, 2)):
+        expected = by_hand(df, columns[i], columns[j])
+        for name, value in expected.items():
+            assert stats[name][i, j] == pytest.approx(value, rel=1e-9)
+            assert stats[name][j, i] == pytest.approx(value, rel=1e-9)
+        assert stats['p_value'][i, j] == pytest.approx(chi2_sf(expected['chi2'], expected['dof']), rel=1e-9)
+    assert stats['p_value'][0, 1] < 1e-10
+    assert stats['p_value'][0, 2] > 0.01
+    assert np.isnan(np.diag(stats['chi2'])).all()
+
+
+def test_answers_nobody_in_the_pair_chose_are_not_levels():
+    df = survey()
+    # Nobody who answered 'c' chose 'high'
+    df.loc[df['c'].notna() & (df['a'] == 'high'), 'a'] = pd.NA
+    stats = association_statistics(*gram_matrix(df, ['a', 'c'])[:2])
+    assert stats['levels_a'][0, 1] == 2
+    assert stats['dof'][0, 1] == 1
+    assert stats['chi2'][0, 1] == pytest.approx(by_hand(df, 'a', 'c')['chi2'], rel=1e-9)
@@ -0,0 +1,106 @@
+"""Bitmap index: filter expressions, counts and the padding bits"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import entry
+from data_processing.bitmap_index import Bitmap, build_bitmap_index
+from data_processing.question_catalog import METADATA, MULTI_SELECT, OPEN_TEXT, SINGLE_CHOICE, QuestionCatalog
+
+
+# Nine respondents, so the last byte of every bitmap is padded
+DF = pd.DataFrame({
+    'Primary role': pd.Series(['Scrum Master', 'Developer', 'Developer', None, 'Product Owner',
+                               'Scrum Master', 'Developer', 'Scrum Master', 'Developer'], dtype='string'),
+    'Country': pd.Series(['Brazil', 'Brazil', 'Portugal', 'Brazil', None,
+                          'Portugal', 'Brazil', 'Brazil', 'Portugal'], dtype='string'),
+    'Uses': pd.Series(['Code, Tests', 'Code', None, 'Docs', 'Code, Docs',
+                       'Tests', None, 'Code', 'Docs, Tests'], dtype='string'),
+    'Comment': pd.Series(['ok', None, 'ok', 'great', None, None, 'meh', None, 'ok'], dtype='string'),
+    'source': pd.Series(['pt'] * 5 + ['en'] * 4, dtype='string'),
+})
+CATALOG = QuestionCatalog([entry('Primary role', '014', SINGLE_CHOICE), entry('Country', '003', SINGLE_CHOICE),
+                           entry('Uses', '030', MULTI_SELECT), entry('Comment', '120', OPEN_TEXT),
+                           entry('source', None, METADATA)])
+
+
+@pytest.fixture(scope='module')
+def index():
+    return build_bitmap_index(DF, CATALOG)
+
+
+def rows(selection):
+    return np.flatnonzero(selection.mask()).tolist()
+
+
+def expected(mask):
+    return np.flatnonzero(mask.fillna(False).to_numpy(dtype=bool)).tolist()
+
+
+@pytest.mark.parametrize('expression, mask', [
+    ('014="Scrum Master"', DF['Primary role'] == 'Scrum Master'),
+    ('"Primary role"=Developer & Country=Brazil', (DF['Primary role'] == 'Developer') & (DF['Country'] == 'Brazil')),
+    ("003=Portugal | source=pt", (DF['Country'] == 'Portugal') | (DF['source'] == 'pt')),
+    ('014=Developer,"Product Owner"', DF['Primary role'].isin(['Developer', 'Product Owner'])),
+    ('~014=Developer', ~(DF['Primary role'] == 'Developer').fillna(False)),
+    ('~(014=Developer | 003=Brazil) & source=en',
+     ~((DF['Primary role'] == 'Developer') | (DF['Country'] == 'Brazil')).fillna(False) & (DF['source'] == 'en')),
+    ('014=Developer | 014="Scrum Master" & 003=Portugal',
+     (DF['Primary role'] == 'Developer')
+     | ((DF['Primary role'] == 'Scrum Master') & (DF['Country'] == 'Portugal'))),
+    ('Uses=Tests', DF['Uses'].str.contains('Tests')),
+    ('Comment=ok & 030=Code', (DF['Comment'] == 'ok') & DF['Uses'].str.contains('Code')),
+])
+def test_query_matches_pandas(index, expression, mask):
+    assert rows(index.query(expression)) == expected(mask)
+
+
+def test_complement_keeps_padding_clear(index):
+    everyone = index.all()
+    assert everyone.count() == len(DF)
+    assert (~index.query('source=pt')).count() == 4
+    assert (~everyone).count() == 0
+
+
+def test_missing_and_respondents(index):
+    assert rows(index.missing('Primary role')) == [3]
+    assert index.respondents('Uses') == 7
+    assert index.respondents('Country', index.query('source=en')) == 4
+
+
+@pytest.mark.parametrize('expression, error', [
+    ('014=Developer &', ValueError),
+    ('(014=Developer', ValueError),
+    ('014 Developer', ValueError),
+    ('014=Developer)', ValueError),
+    ('014=Astronaut', KeyError),
+    ('999=Developer', KeyError),
+])
+def test_bad_filters_are_rejected(index, expression, error):
+    with pytest.raises(error):
+        index.query(expression)
+
+
+def test_counts_within_a_selection(index):
+    selection = index.query('source=pt')
+    assert index.counts('Primary role', selection).to_dict() == {'Developer': 2, 'Scrum Master': 1,
+                                                                 'Product Owner': 1}
+    assert index.counts('Comment', selection).to_dict() == {'ok': 2, 'great': 1}
+    assert index.counts('Uses', selection).to_dict() == {'Code': 3, 'Docs': 2, 'Tests': 1}
+
+
+def test_frequency_store_matches_counting_the_filtered_frame(index):
+    selection = index.query('003=Brazil')
+    subset = DF[selection.mask()]
+    store = index.frequency_store(selection)
+    assert store['total_rows'] == len(subset)
+    for col in ('Primary role', 'Comment', 'source'):
+        assert store['columns'][col]['counts'] == subset[col].value_counts().to_dict()
+        assert store['columns'][col]['missing'] == int(subset[col].isna().sum())
+
+
+def test_bitmap_from_mask_round_trips():
+    mask = np.array([True, False, True, True, False, False, False, True, True, False])
+    bitmap = Bitmap.from_mask(mask)
+    assert bitmap.count() == 5
+    assert bitmap.mask().tolist() == mask.tolist()
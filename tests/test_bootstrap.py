@@ -0,0 +1,54 @@
+"""Bootstrap CIs: seeded per job, independent of workers and chunking, and sane intervals"""
+import numpy as np
+import pytest
+
+from data_processing.bootstrap import bootstrap_cis, bootstrap_job, bootstrap_one, format_ci, resample_counts
+
+
+def jobs():
+    return {
+        'likert': bootstrap_job([5, 10, 20, 15], scores=[1, 2, 3, np.nan]),
+        'choice': bootstrap_job([30, 12, 8]),
+        'tools': bootstrap_job([40, 25, 5], n=60, exclusive=False),
+        'empty': bootstrap_job([0, 0]),
+    }
+
+
+def test_results_do_not_depend_on_workers_or_chunks():
+    expected = bootstrap_cis(jobs(), n_resamples=300, workers=1, chunk_size=64)
+    assert bootstrap_cis(jobs(), n_resamples=300, workers=2, chunk_size=1) == expected
+    assert bootstrap_cis(jobs(), n_resamples=300, workers=1, chunk_size=3) == expected
+    assert bootstrap_cis(jobs(), n_resamples=300, seed=1) != expected
+
+
+def test_intervals_contain_the_observed_percentages():
+    cis = bootstrap_cis(jobs(), n_resamples=500)
+    for key in ('likert', 'choice', 'tools'):
+        job = jobs()[key]
+        observed = job['counts'] / job['n'] * 100
+        assert np.all(np.array(cis[key]['pct_low']) <= observed)
+        assert np.all(observed <= np.array(cis[key]['pct_high']))
+    # Not Applicable (NaN score) is left out of the mean
+    assert cis['likert']['mean'] == pytest.approx((5 + 20 + 60) / 35)
+    assert cis['likert']['mean_low'] <= cis['likert']['mean'] <= cis['likert']['mean_high']
+    assert cis['empty'] == {}
+
+
+def test_resamples_keep_the_respondent_count():
+    rng = np.random.default_rng(0)
+    draws = resample_counts(rng, bootstrap_job([30, 12, 8]), 100)
+    assert draws.shape == (100, 3)
+    assert (draws.sum(axis=1) == 50).all()
+    # Options of a multi-select question are drawn independently, each out of n
+    draws = resample_counts(rng, bootstrap_job([40, 25], n=60, exclusive=False), 100)
+    assert (draws <= 60).all() and (draws.sum(axis=1) != 60).any()
+
+
+def test_one_answer_for_everyone_has_no_spread():
+    result = bootstrap_one(bootstrap_job([20, 0]), np.random.default_rng(0), n_resamples=50)
+    assert result == {'pct_low': [100.0, 0.0], 'pct_high': [100.0, 0.0]}
+
+
+def test_format_ci():
+    assert format_ci(12.345, 20) == '[12.3–20.0%]'
+    assert format_ci(2.5, 3.25, digits=2, unit='') == '[2.50–3.25]'
@@ -0,0 +1,38 @@
+"""Import-time check: reading -X importtime traces and keeping heavy libraries out of entry points"""
+import pytest
+
+from check_import_time import IMPORT_BUDGETS, base_import_time, import_trace, measure
+
+# As -X importtime prints it (a module after its imports), with pandas' own numpy import nested
+TRACE = [
+    ('numpy.core', 2, 300),
+    ('numpy', 1, 1000),
+    ('pytz', 1, 200),
+    ('pandas', 0, 5000),
+    ('data_processing.instrumentation', 1, 400),
+    ('numpy.random', 1, 150),
+    ('data_processing', 0, 600),
+    ('stage', 0, 7000),
+]
+
+
+def test_base_time_counts_outermost_pandas_and_numpy_imports_once():
+    # pandas (5000, its numpy included) plus numpy.random imported outside it
+    assert base_import_time(TRACE) == 5150
+    assert base_import_time([('json', 0, 80)]) == 0
+
+
+def test_trace_lists_every_import_with_its_depth():
+    trace = import_trace('json')
+    names = [name for name, _, _ in trace]
+    assert names[-1] == 'json'
+    assert 'json.decoder' in names
+    assert all(depth >= 0 and cumulative >= 0 for _, depth, cumulative in trace)
+    assert dict((name, depth) for name, depth, _ in trace)['json'] == 0
+
+
+@pytest.mark.parametrize('module', list(IMPORT_BUDGETS))
+def test_entry_points_do_not_import_heavy_libraries(module):
+    total, overhead, heavy = measure(module)
+    assert heavy == []
+    assert 0 <= overhead <= total
@@ -0,0 +1,88 @@
+"""Plot cache: a figure is redrawn only when its spec or the code drawing it changes"""
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import EN_EXPORT, PT_EXPORT, raw_export
+from data_processing.merge_datasets import merge_survey_data
+from visualization import create_plots
+from visualization.create_plots import (PLOT_MANIFEST, create_all_visualizations, plan_plot_cache, plot_digest,
+                                        plot_path, renderer_digest, response_distribution_spec)
+
+
+@pytest.fixture
+def merged(workdir):
+    raw_export('Carimbo de data/hora', 15, 0).to_excel(f'data/raw/{PT_EXPORT}', index=False)
+    raw_export('Timestamp', 12, 1).to_excel(f'data/raw/{EN_EXPORT}', index=False)
+    merge_survey_data()
+    return workdir
+
+
+@pytest.fixture
+def fresh_renderer_digests():
+    renderer_digest.cache_clear()
+    yield
+    renderer_digest.cache_clear()
+
+
+def spec(name, counts):
+    return dict(response_distribution_spec(pd.Series(counts)), output_name=name)
+
+
+def test_changed_spec_is_rendered_and_unchanged_one_skipped(workdir):
+    os.makedirs('outputs/plots')
+    specs = [spec('a', {'en': 3, 'pt': 5}), spec('b', {'en': 4, 'pt': 4})]
+    manifest = {s['output_name']: plot_digest(s) for s in specs}
+    for name in manifest:
+        open(plot_path(name), 'wb').close()
+
+    specs[1] = spec('b', {'en': 5, 'pt': 4})
+    digests = {s['output_name']: plot_digest(s) for s in specs}
+    to_render, unchanged, stale = plan_plot_cache(specs, digests, manifest)
+    assert [s['output_name'] for s in to_render] == ['b']
+    assert [s['output_name'] for s in unchanged] == ['a']
+    assert stale == []
+    assert len(plan_plot_cache(specs, digests, manifest, force=True)[0]) == 2
+
+
+def test_editing_a_renderer_changes_only_its_figures(monkeypatch, fresh_renderer_digests):
+    bars = spec('a', {'en': 3, 'pt': 5})
+    likert = dict(bars, kind='likert')
+    before = plot_digest(bars), plot_digest(likert)
+
+    def redrawn(spec):
+        return create_plots.render_response_distribution(spec)
+
+    monkeypatch.setitem(create_plots.RENDERERS, 'response_distribution', redrawn)
+    renderer_digest.cache_clear()
+    assert plot_digest(bars) != before[0]
+    assert plot_digest(likert) == before[1]
+
+
+def test_second_run_skips_unchanged_figures(merged):
+    create_all_visualizations()
+    with open(PLOT_MANIFEST, encoding='utf-8') as f:
+        manifest = json.load(f)
+    mtimes = {name: os.stat(plot_path(name)).st_mtime_ns for name in manifest}
+    assert mtimes
+
+    create_all_visualizations()
+    with open(PLOT_MANIFEST, encoding='utf-8') as f:
+        assert json.load(f) == manifest
+    assert {name: os.stat(plot_path(name)).st_mtime_ns for name in manifest} == mtimes
+
+
+def test_parallel_and_sequential_runs_agree(merged):
+    create_all_visualizations(jobs=1)
+    with open(PLOT_MANIFEST, encoding='utf-8') as f:
+        sequential = json.load(f)
+
+    create_all_visualizations(jobs=2, force=True)
+    with open(PLOT_MANIFEST, encoding='utf-8') as f:
+        assert json.load(f) == sequential
+    # One worker per CPU, resolved before the bootstrap as well as the rendering
+    create_all_visualizations(jobs=0, force=True)
+    with open(PLOT_MANIFEST, encoding='utf-8') as f:
+        assert json.load(f) == sequential
@@ -0,0 +1,62 @@
+"""Crosstab engine: one-hot slot layout and segment x question tables"""
+import numpy as np
+import pandas as pd
+
+from conftest import entry
+from data_processing.crosstabs import _one_hot_layout, build_crosstabs, crosstab_frame, encode_column
+from data_processing.question_catalog import LIKERT, METADATA, SINGLE_CHOICE, QuestionCatalog
+
+AGREEMENT = ['Disagree', 'Neutral', 'Agree']
+
+
+def survey():
+    df = pd.DataFrame({
+        'role': pd.Series(['Dev', 'PO', 'Dev', None, 'SM', 'Dev'], dtype='string'),
+        'agree': pd.Categorical(['Agree', 'Agree', None, 'Disagree', 'Agree', 'Neutral'],
+                                categories=AGREEMENT, ordered=True),
+        'source': pd.Series(['pt', 'en', 'pt', 'pt', 'en', 'en'], dtype='string'),
+    })
+    catalog = QuestionCatalog([entry('role', '014', SINGLE_CHOICE), entry('agree', '020', LIKERT),
+                               entry('source', None, METADATA)])
+    return df, catalog
+
+
+def test_encode_column_keeps_scale_order_and_sorts_text():
+    df, _ = survey()
+    codes, labels = encode_column(df['agree'])
+    assert labels == AGREEMENT
+    assert codes.tolist() == [2, 2, -1, 0, 2, 1]
+    codes, labels = encode_column(df['role'])
+    assert labels == ['Dev', 'PO', 'SM']
+    assert codes.tolist() == [0, 1, 0, -1, 2, 0]
+
+
+def test_each_column_gets_its_own_slots_and_a_missing_slot():
+    df, _ = survey()
+    codes, layout, slots = _one_hot_layout(df, ['role', 'agree'])
+    assert [(col, offset) for col, offset, _ in layout] == [('role', 0), ('agree', 4)]
+    assert slots == 8
+    # Missing answers land in the slot right after the column's answers
+    assert codes[3, 0] == 3
+    assert codes[2, 1] == 4 + 3
+    assert np.all(codes[:, 0] < 4) and np.all(codes[:, 1] >= 4)
+
+
+def test_tables_match_pandas_crosstab():
+    df, catalog = survey()
+    crosstabs = build_crosstabs(df, catalog, chunk_size=4)
+    assert crosstabs['total_rows'] == len(df)
+    assert set(crosstabs['segments']) == {'Primary role', 'Source'}
+    for segment, column in (('Primary role', 'role'), ('Source', 'source')):
+        for question in ('role', 'agree'):
+            table = crosstab_frame(crosstabs, segment, question)
+            expected = pd.crosstab(df[column].astype(object), df[question].astype(object))
+            expected = expected.reindex(index=table.index, columns=table.columns, fill_value=0)
+            assert table.to_numpy().tolist() == expected.to_numpy().tolist()
+
+
+def test_unchosen_scale_answers_keep_their_column():
+    df, catalog = survey()
+    crosstabs = build_crosstabs(df[df['agree'] != 'Neutral'], catalog)
+    assert crosstabs['questions']['agree']['labels'] == AGREEMENT
+    assert crosstab_frame(crosstabs, 'Source', 'agree')['Neutral'].sum() == 0
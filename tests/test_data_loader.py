@@ -0,0 +1,58 @@
+"""Shared loader: the Parquet cache next to the merged workbook and when it is trusted"""
+import os
+
+import pandas as pd
+
+from data_processing.data_loader import cache_is_fresh, cache_path_for, load_survey_data
+
+
+def write_survey(path, answers):
+    pd.DataFrame({
+        'Timestamp': pd.to_datetime(['2024-01-01 10:00', '2024-01-02 11:30', '2024-01-03 09:15']),
+        'Model': answers,
+    }).to_excel(path, index=False)
+
+
+def age(path, seconds):
+    mtime = os.path.getmtime(path) - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_cache_sits_next_to_the_workbook():
+    assert cache_path_for(os.path.join('data', 'merged.xlsx')) == os.path.join('data', 'merged.parquet')
+
+
+def test_cache_is_fresh_only_when_not_older_than_the_workbook(tmp_path):
+    xlsx, cache = str(tmp_path / 'merged.xlsx'), str(tmp_path / 'merged.parquet')
+    write_survey(xlsx, ['a', 'b', 'c'])
+    assert not cache_is_fresh(xlsx, cache)
+    pd.DataFrame({'x': [1]}).to_parquet(cache)
+    assert cache_is_fresh(xlsx, cache)
+    age(cache, 60)
+    assert not cache_is_fresh(xlsx, cache)
+    # Without the workbook the cache is all there is
+    os.remove(xlsx)
+    assert cache_is_fresh(xlsx, cache)
+
+
+def test_first_load_writes_the_cache(tmp_path):
+    xlsx = str(tmp_path / 'merged.xlsx')
+    # A free-text column mixing a number and text is cached as text
+    write_survey(xlsx, [4, 'GPT', None])
+    df = load_survey_data(xlsx)
+    assert os.path.exists(cache_path_for(xlsx))
+    assert df['Model'].tolist()[:2] == ['4', 'GPT']
+    assert df['Model'].isna().tolist() == [False, False, True]
+    cached = pd.read_parquet(cache_path_for(xlsx))
+    assert cached['Model'].tolist()[:2] == ['4', 'GPT']
+    assert cached['Timestamp'].tolist() == df['Timestamp'].tolist()
+
+
+def test_stale_cache_is_rebuilt(tmp_path):
+    xlsx = str(tmp_path / 'merged.xlsx')
+    write_survey(xlsx, ['a', 'b', 'c'])
+    load_survey_data(xlsx)
+    age(cache_path_for(xlsx), 60)
+    write_survey(xlsx, ['x', 'y', 'z'])
+    assert load_survey_data(xlsx)['Model'].tolist() == ['x', 'y', 'z']
+    assert pd.read_parquet(cache_path_for(xlsx))['Model'].tolist() == ['x', 'y', 'z']
@@ -0,0 +1,76 @@
+"""Frequency store: per-column counts, incremental updates and the store path"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_processing.frequency_store import (build_frequency_store, count_columns, frequency_series,
+                                             frequency_store_path_for, response_count, update_frequency_store)
+
+
+def survey():
+    return pd.DataFrame({
+        'Timestamp': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04']),
+        'role': pd.Series(['Dev', 'PO', 'Dev', None], dtype='string'),
+        'team': pd.Series(['5', None, None, '7'], dtype='string'),
+        'source': pd.Series(['pt', 'pt', 'en', 'en'], dtype='string'),
+    })
+
+
+def test_counts_match_value_counts():
+    df = survey()
+    counted = count_columns(df)
+    assert 'Timestamp' not in counted
+    for col, entry in counted.items():
+        expected = df[col].value_counts()
+        assert entry['counts'] == {str(value): int(count) for value, count in expected.items()}
+        assert entry['missing'] == int(df[col].isna().sum())
+
+
+def test_missing_slot_does_not_collide_with_answers():
+    # The missing slot sits right after the answers; a column of one answer and gaps
+    df = pd.DataFrame({'only': pd.Series([None, 'x', None, None], dtype='string')})
+    assert count_columns(df) == {'only': {'counts': {'x': 1}, 'missing': 3}}
+
+
+def test_values_sharing_a_label_are_merged():
+    df = pd.DataFrame({'mixed': pd.Series([5, '5', 'five', np.nan], dtype=object)})
+    assert count_columns(df)['mixed'] == {'counts': {'5': 2, 'five': 1}, 'missing': 1}
+
+
+def test_empty_frame_counts_nothing():
+    assert count_columns(survey().iloc[:0]) == {
+        col: {'counts': {}, 'missing': 0} for col in ('role', 'team', 'source')}
+
+
+def test_update_matches_a_full_count():
+    df = survey()
+    store = update_frequency_store(build_frequency_store(df.iloc[:3]), df.iloc[3:])
+    assert store == build_frequency_store(df)
+
+
+def test_update_adds_new_columns_as_missing_before():
+    df = survey()
+    delta = df.iloc[3:].assign(extra=pd.Series(['y'], index=[3], dtype='string'))
+    store = update_frequency_store(build_frequency_store(df.iloc[:3]), delta)
+    assert store['columns']['extra'] == {'counts': {'y': 1}, 'missing': 3}
+    assert store['total_rows'] == 4
+
+
+def test_update_counts_columns_the_delta_lacks_as_missing():
+    df = survey()
+    store = update_frequency_store(build_frequency_store(df.iloc[:3]), df.iloc[3:].drop(columns='team'))
+    assert store['columns']['team']['missing'] == 3
+
+
+def test_frequency_series_and_response_count():
+    store = build_frequency_store(survey())
+    assert frequency_series(store, 'role').to_dict() == {'Dev': 2, 'PO': 1}
+    assert frequency_series(store, 'role', dropna=False).isna().sum() == 0
+    assert frequency_series(store, 'role', dropna=False).index.isna().sum() == 1
+    assert response_count(store, 'team') == 2
+
+
+def test_store_path_sits_next_to_the_dataset():
+    path = frequency_store_path_for(os.path.join('some', 'dir', 'merged.xlsx'))
+    assert path == os.path.join('some', 'dir', 'frequency_store.json')
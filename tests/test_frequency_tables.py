@@ -0,0 +1,61 @@
+"""Frequency workbook: streamed rows, the same figures as analyze_column and no per-sheet caps"""
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from data_processing.descriptive_analysis import analyze_column, create_frequency_tables, frequency_records
+
+ROLE = 'What is your primary role in the Scrum Team?'
+ARTIFACT = ('In what ways do you use AI chat assistants to support your work with Scrum artifacts? '
+            '[Artifact {}]')
+ADOPTION = ["Don't Plan to Use AI Chat Assistant for This Task", 'Plan to Partially Use AI Chat Assistant',
+            'Currently Mostly AI Chat Assistant']
+
+
+def test_records_match_analyze_column():
+    freq = pd.Series([9, 7, 5, 3, 2, 1], index=list('abcdef'))
+    expected = analyze_column(None, None, top_n=4, freq=freq)
+    rows = frequency_records(freq, top_n=4)
+    assert [row[0] for row in rows] == expected['Response'].tolist() == ['a', 'b', 'c', 'd', 'Others']
+    assert [row[1] for row in rows] == expected['Frequency'].tolist()
+    assert np.allclose([row[2] for row in rows], expected['Percentage'].tolist())
+    assert frequency_records(pd.Series([], dtype='int64')) == []
+
+
+def sheet_rows(path, name):
+    wb = load_workbook(path, read_only=True)
+    try:
+        # Blank separator rows come back empty
+        return [row for row in wb[name].iter_rows(values_only=True) if any(cell is not None for cell in row)]
+    finally:
+        wb.close()
+
+
+def test_every_question_gets_a_table(workdir):
+    rng = np.random.default_rng(0)
+    n = 40
+    df = pd.DataFrame({
+        'Timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(n), unit='h'),
+        ROLE: rng.choice(['Developer', 'Scrum Master', 'Product Owner'], n),
+    })
+    # More questions in one group than the old 20-question cap
+    for i in range(22):
+        df[ARTIFACT.format(i + 1)] = rng.choice(ADOPTION, n)
+    df['source'] = rng.choice(['Survey 1 (respostas)', 'Survey 2 (Udemy)'], n)
+    data_path = 'data/processed/merged_survey_data.xlsx'
+    df.to_excel(data_path, index=False)
+
+    output = create_frequency_tables(data_path, 'data/processed/frequency_analysis.xlsx')
+
+    summary = sheet_rows(output, 'Summary')
+    assert summary[0] == ('Metric', 'Value')
+    assert ('Total Responses', n) in summary
+    activities = sheet_rows(output, 'Scrum Activities')
+    titles = [row[0] for row in activities if str(row[0]).startswith('Q')]
+    assert titles == [f'Q{i + 1}: Artifact {i + 1}' for i in range(22)]
+
+    everything = sheet_rows(output, 'All Frequencies')
+    assert everything[0] == ('Question', 'Response', 'Frequency', 'Percentage')
+    assert len({row[0] for row in everything[1:]}) == 23
+    roles = {row[1]: row[2] for row in everything if row[0] == 'What is your primary role in the Scrum Team'}
+    assert roles == df[ROLE].value_counts().to_dict()
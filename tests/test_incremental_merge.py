@@ -0,0 +1,42 @@
+"""Incremental merge: appending the new export rows gives the dataset a full merge would"""
+import pandas as pd
+
+from conftest import EN_EXPORT, PT_EXPORT, raw_export
+from data_processing.merge_datasets import (load_merge_state, merge_survey_data,
+                                            merge_survey_data_incremental)
+
+MERGED = 'data/processed/merged_survey_data'
+
+
+def write_exports(pt, en):
+    pt.to_excel(f'data/raw/{PT_EXPORT}', index=False)
+    en.to_excel(f'data/raw/{EN_EXPORT}', index=False)
+
+
+def by_content(df):
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def test_new_rows_are_appended_once(workdir):
+    pt, en = raw_export('Carimbo de data/hora', 9, 0), raw_export('Timestamp', 6, 1)
+    write_exports(pt, en)
+    merge_survey_data_incremental()
+    assert len(pd.read_parquet(f'{MERGED}.parquet')) == 15
+
+    # Later submissions arrive in both exports
+    write_exports(pd.concat([pt, raw_export('Carimbo de data/hora', 3, 2, start='2024-03-01')]),
+                  pd.concat([en, raw_export('Timestamp', 2, 3, start='2024-03-01')]))
+    merge_survey_data_incremental()
+    appended = pd.read_parquet(f'{MERGED}.parquet')
+    appended_xlsx = pd.read_excel(f'{MERGED}.xlsx')
+    assert len(appended) == len(appended_xlsx) == 20
+    assert load_merge_state()['watermarks']['Survey 2 (Udemy)'] == \
+        appended['Timestamp'].max().isoformat()
+
+    # Nothing new: the dataset stays as it is
+    merge_survey_data_incremental()
+    assert len(pd.read_parquet(f'{MERGED}.parquet')) == 20
+
+    merge_survey_data()
+    pd.testing.assert_frame_equal(by_content(appended), by_content(pd.read_parquet(f'{MERGED}.parquet')))
+    pd.testing.assert_frame_equal(by_content(appended_xlsx), by_content(pd.read_excel(f'{MERGED}.xlsx')))
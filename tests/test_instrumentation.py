@@ -0,0 +1,95 @@
+"""Instrumentation: no-op while off, nested span records and the JSON/CSV traces"""
+import csv
+import json
+import tracemalloc
+
+import pytest
+
+from data_processing import instrumentation
+from data_processing.instrumentation import Tracer, record, span, traced
+
+
+@pytest.fixture
+def tracer(tmp_path, monkeypatch):
+    tracer = Tracer(str(tmp_path / 'trace.json'), memory=False)
+    monkeypatch.setattr(instrumentation, '_tracer', tracer)
+    return tracer
+
+
+@traced()
+def add(a, b):
+    return a + b
+
+
+@traced('named stage')
+def fail():
+    raise ValueError('boom')
+
+
+def test_spans_are_no_ops_while_off(monkeypatch):
+    monkeypatch.setattr(instrumentation, '_tracer', None)
+    assert span('a') is span('b')
+    with span('a') as region:
+        region.set(rows=1)
+    assert add(1, 2) == 3
+    assert add.__name__ == 'add'
+
+
+def test_nested_spans_record_their_path_and_fields(tracer):
+    with span('outer', stage='merge') as outer:
+        with span('inner') as inner:
+            inner.set(rows=10)
+        assert add(2, 3) == 5
+        outer.set(columns=4)
+    by_name = {r['name']: r for r in tracer.records}
+    assert [r['name'] for r in tracer.records] == ['inner', 'add', 'outer']
+    assert by_name['inner']['path'] == 'outer/inner'
+    assert by_name['add']['depth'] == 1
+    assert by_name['inner']['rows'] == 10
+    assert (by_name['outer']['stage'], by_name['outer']['columns']) == ('merge', 4)
+    assert by_name['outer']['wall_s'] >= by_name['inner']['wall_s'] + by_name['add']['wall_s']
+
+
+def test_failed_span_is_marked(tracer):
+    with pytest.raises(ValueError):
+        fail()
+    assert tracer.records[0]['name'] == 'named stage'
+    assert tracer.records[0]['error'] is True
+
+
+def test_memory_peaks_are_recorded(monkeypatch):
+    tracer = Tracer(memory=True)
+    monkeypatch.setattr(instrumentation, '_tracer', tracer)
+    try:
+        with span('allocate'):
+            block = bytearray(4 << 20)
+            del block
+    finally:
+        tracemalloc.stop()
+    assert tracer.records[0]['alloc_peak_kb'] >= 4096
+    assert tracer.records[0]['alloc_net_kb'] < 1024
+
+
+def test_external_spans_join_the_current_path(tracer):
+    with span('plots'):
+        record('plot likert_1', wall_s=0.5, worker=True)
+    assert tracer.records[0] == {'name': 'plot likert_1', 'path': 'plots/plot likert_1', 'depth': 1,
+                                 'wall_s': 0.5, 'worker': True}
+
+
+def test_trace_is_written_as_json_or_csv(tracer, tmp_path):
+    with span('stage'):
+        record('worker', wall_s=1.0)
+    tracer.write()
+    with open(tmp_path / 'trace.json', encoding='utf-8') as f:
+        trace = json.load(f)
+    assert trace['memory'] is False
+    # Spans are ordered by start time; externally measured ones last
+    assert [s['name'] for s in trace['spans']] == ['stage', 'worker']
+
+    tracer.trace_path = str(tmp_path / 'trace.csv')
+    tracer.write()
+    with open(tmp_path / 'trace.csv', newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['name'] for row in rows] == ['stage', 'worker']
+    assert rows[1]['wall_s'] == '1.0'
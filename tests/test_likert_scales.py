@@ -0,0 +1,51 @@
+"""Answer scales: ordered Categoricals in registry order, folded variants and unscored answers"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import entry
+from data_processing.likert_scales import LIKERT_SCALES, UNSCORED_ANSWERS, apply_likert_scales, scale_scores, to_scale
+from data_processing.question_catalog import LIKERT, QuestionCatalog
+
+
+@pytest.mark.parametrize('scale', sorted(LIKERT_SCALES))
+def test_categories_come_out_in_registry_order(scale):
+    labels = LIKERT_SCALES[scale]
+    # Reversed, upper-cased and padded: variants fold onto the registered labels
+    series = pd.Series([f'  {label.upper()} ' for label in labels[::-1]] + [None])
+    converted = to_scale(series, scale)
+    assert converted.dtype == pd.CategoricalDtype(labels, ordered=True)
+    assert converted.tolist()[:-1] == labels[::-1]
+    assert pd.isna(converted.iloc[-1])
+
+
+def test_helpfulness_ratings_are_ordered_from_neutral_up():
+    converted = to_scale(pd.Series(['Very Helpful', 'Neutral', 'Slightly Helpful', 'Helpful']), 'helpfulness')
+    assert converted.sort_values().tolist() == ['Neutral', 'Slightly Helpful', 'Helpful', 'Very Helpful']
+    assert (converted.iloc[2] > converted.iloc[1]) and (converted.iloc[0] > converted.iloc[3])
+
+
+def test_off_scale_answers_follow_the_scale():
+    converted = to_scale(pd.Series(['Yes', 'Sometimes', 'no']), 'yes_no')
+    assert list(converted.cat.categories) == ['No', 'Maybe', 'Yes', 'Sometimes']
+    assert converted.tolist() == ['Yes', 'Sometimes', 'No']
+
+
+def test_not_applicable_is_on_the_scale_but_unscored():
+    assert 'Not Applicable' in UNSCORED_ANSWERS
+    labels = ['Not Applicable', 'Neutral', 'Slightly Helpful', 'Helpful', 'Very Helpful', 'Unsure']
+    scores = scale_scores(labels, 'helpfulness')
+    assert np.isnan(scores[0]) and np.isnan(scores[-1])
+    assert scores[1:-1] == [1.0, 2.0, 3.0, 4.0]
+    assert scale_scores(['Strongly Disagree', 'Strongly Agree'], 'agreement') == [1.0, 5.0]
+
+
+def test_catalog_scales_are_applied():
+    catalog = QuestionCatalog([dict(entry('helpful', '093', LIKERT), scale='helpfulness'),
+                               entry('comment', '120', LIKERT)])
+    df = apply_likert_scales(pd.DataFrame({'helpful': ['helpful', 'Not applicable'], 'comment': ['a', 'b']}),
+                             catalog)
+    assert df['helpful'].dtype == pd.CategoricalDtype(LIKERT_SCALES['helpfulness'], ordered=True)
+    assert df['helpful'].tolist() == ['Helpful', 'Not Applicable']
+    # Columns without a registered scale are left alone
+    assert not isinstance(df['comment'].dtype, pd.CategoricalDtype)
@@ -0,0 +1,77 @@
+"""Watermarks of the incremental merge: which export rows are new"""
+from collections import Counter
+
+import pandas as pd
+
+from data_processing.merge_datasets import advance_merge_state, row_fingerprint, unmerged_rows
+
+TS = 'Carimbo de data/hora'
+
+
+def export(rows):
+    return pd.DataFrame(rows, columns=[TS, 'answer', 'source'])
+
+
+def rows_of(state, source):
+    mark = state['watermarks'].get(source)
+    return (pd.Timestamp(mark) if mark else None,
+            Counter(state['boundary'].get(source, [])), Counter(state['undated'].get(source, [])))
+
+
+def test_first_merge_takes_every_dated_row():
+    chunk = export([['2024-01-01 10:00', 'a', 'pt'], ['2024-01-02 10:00', 'b', 'pt']])
+    assert unmerged_rows(chunk, None, Counter(), Counter()).tolist() == [True, True]
+
+
+def test_watermark_is_the_latest_submission_per_source():
+    state = advance_merge_state({}, export([
+        ['2024-01-01 10:00', 'a', 'pt'],
+        ['2024-01-03 09:00', 'b', 'pt'],
+        ['2024-01-02 10:00', 'c', 'en'],
+    ]))
+    assert state['watermarks'] == {'pt': '2024-01-03T09:00:00', 'en': '2024-01-02T10:00:00'}
+    assert len(state['boundary']['pt']) == 1
+
+
+def test_only_rows_after_the_watermark_are_new():
+    merged = export([['2024-01-01 10:00', 'a', 'pt'], ['2024-01-02 10:00', 'b', 'pt']])
+    state = advance_merge_state({}, merged)
+    again = export([
+        ['2024-01-01 10:00', 'a', 'pt'],
+        ['2024-01-02 10:00', 'b', 'pt'],
+        ['2024-01-03 10:00', 'c', 'pt'],
+    ])
+    assert unmerged_rows(again, *rows_of(state, 'pt')).tolist() == [False, False, True]
+
+
+def test_new_row_at_the_watermark_is_kept():
+    # A second submission in the same second as the last merged one
+    state = advance_merge_state({}, export([['2024-01-02 10:00', 'b', 'pt']]))
+    again = export([['2024-01-02 10:00', 'b', 'pt'], ['2024-01-02 10:00', 'late', 'pt']])
+    assert unmerged_rows(again, *rows_of(state, 'pt')).tolist() == [False, True]
+
+
+def test_identical_rows_at_the_watermark_are_counted():
+    state = advance_merge_state({}, export([['2024-01-02 10:00', 'b', 'pt']]))
+    again = export([['2024-01-02 10:00', 'b', 'pt'], ['2024-01-02 10:00', 'b', 'pt']])
+    assert unmerged_rows(again, *rows_of(state, 'pt')).tolist() == [False, True]
+
+
+def test_undated_rows_are_matched_by_fingerprint():
+    merged = export([['2024-01-01 10:00', 'a', 'pt'], [None, 'undated', 'pt']])
+    state = advance_merge_state({}, merged)
+    assert state['undated']['pt'] == [row_fingerprint(merged.iloc[1])]
+    again = export([[None, 'undated', 'pt'], [None, 'another', 'pt']])
+    assert unmerged_rows(again, *rows_of(state, 'pt')).tolist() == [False, True]
+
+
+def test_older_chunk_does_not_move_the_watermark_back():
+    state = advance_merge_state({}, export([['2024-01-05 10:00', 'x', 'pt']]))
+    state = advance_merge_state(state, export([['2024-01-01 10:00', 'y', 'pt']]))
+    assert state['watermarks']['pt'] == '2024-01-05T10:00:00'
+    assert len(state['boundary']['pt']) == 1
+
+
+def test_fingerprint_ignores_missing_cells():
+    row = pd.Series({'answer': 'a', 'source': 'pt'})
+    assert row_fingerprint(row) == row_fingerprint(pd.Series({'answer': 'a', 'source': 'pt', 'added': None}))
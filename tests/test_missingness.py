@@ -0,0 +1,59 @@
+"""Missingness matrix: completeness, patterns, drop-off and blocks skipped together"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processing.missingness import MissingnessMatrix
+
+
+def sparse_frame(n_rows, n_columns, seed=0):
+    rng = np.random.default_rng(seed)
+    # Few distinct patterns, so most of them repeat
+    patterns = rng.random((6, n_columns)) < 0.7
+    answered = patterns[rng.integers(0, len(patterns), n_rows)]
+    return pd.DataFrame(np.where(answered, 'x', None), columns=[f'q{j}' for j in range(n_columns)])
+
+
+def test_counts_and_completeness():
+    df = pd.DataFrame({'a': ['x', None, 'y', None], 'b': ['x', 'y', None, None], 'c': [None] * 4})
+    missing = MissingnessMatrix.from_frame(df, chunk_size=3)
+    assert missing.column_counts.tolist() == [2, 2, 0]
+    assert missing.completeness().tolist() == [0.5, 0.5, 0.0]
+    assert missing.answered().tolist() == [2, 1, 1, 0]
+    assert missing.threshold_counts([40, 50]).tolist() == [2, 0]
+    assert missing.mask().tolist() == df.notna().to_numpy().tolist()
+
+
+@pytest.mark.parametrize('n_columns', [6, 70])
+def test_patterns_match_grouping_the_mask(n_columns):
+    # Up to 64 questions the packed row is its own hash; beyond that rows are hashed
+    df = sparse_frame(500, n_columns)
+    missing = MissingnessMatrix.from_frame(df, chunk_size=128)
+    ids, first, counts = missing.patterns()
+
+    mask = df.notna()
+    groups = mask.groupby(list(mask.columns), sort=False).size().sort_values(ascending=False, kind='stable')
+    assert counts.tolist() == groups.tolist()
+    # Every respondent of a pattern has the same answered questions as its first respondent
+    assert (missing.mask()[first[ids]] == mask.to_numpy()).all()
+    assert len(set(first.tolist())) == len(first)
+    assert np.all(np.diff(counts) <= 0)
+
+
+def test_last_answered_question():
+    df = pd.DataFrame({'a': ['x', None, None], 'b': [None, 'y', None], 'c': ['z', None, None]})
+    assert MissingnessMatrix.from_frame(df).last_answered(chunk_size=2).tolist() == [2, 1, -1]
+
+
+def test_blocks_skipped_together():
+    df = pd.DataFrame({
+        'a1': ['x', None, None, 'x'],
+        'a2': [None, None, None, 'x'],
+        'b1': ['x', 'x', None, None],
+        'c1': ['x', None, None, 'x'],
+    })
+    names, skipped, pairs = MissingnessMatrix.from_frame(df).skipped_together(['A', 'A', 'B', 'C'], chunk_size=3)
+    assert names == ['A', 'B', 'C']
+    # A block counts as skipped only when none of its questions were answered
+    assert skipped.tolist() == [2, 2, 2]
+    assert pairs.tolist() == [[2, 1, 2], [1, 2, 1], [2, 1, 2]]
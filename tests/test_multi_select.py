@@ -0,0 +1,70 @@
+"""Multi-select engine: splitting joined answers, re-joining split options and per-option counts"""
+import numpy as np
+import pandas as pd
+
+from data_processing.multi_select import (MultiSelectMatrix, learn_continuations, pack_mask, popcount,
+                                          split_selections, tokenize_selections)
+
+
+def test_commas_inside_parentheses_do_not_split():
+    assert split_selections('ChatGPT (OpenAI), Developer (e.g., PSD, CSD), Gemini') == \
+        ['ChatGPT (OpenAI)', 'Developer (e.g., PSD, CSD)', 'Gemini']
+    assert split_selections(' Copilot ,, ') == ['Copilot']
+    # An unbalanced closing parenthesis does not swallow the commas after it
+    assert split_selections('odd), a, b') == ['odd)', 'a', 'b']
+
+
+def test_lower_case_fragment_after_one_option_is_a_continuation():
+    lists = [['Solutions that are almost right', 'but not quite', 'Hallucinations'],
+             ['Solutions that are almost right', 'but not quite'],
+             ['Hallucinations']]
+    continuations = learn_continuations(lists)
+    assert continuations == {'but not quite': 'Solutions that are almost right'}
+    assert tokenize_selections(lists[0], continuations) == \
+        ['Solutions that are almost right, but not quite', 'Hallucinations']
+
+
+def test_option_that_never_ends_a_selection_absorbs_its_follower():
+    # 'Yes' is never a whole selection on its own: 'Product Owner' always completes it
+    lists = [['Yes', 'Product Owner'], ['Yes', 'Product Owner', 'No']]
+    assert learn_continuations(lists) == {'Product Owner': 'Yes'}
+    # Once 'Yes' ends a selection too, the two are separate options
+    assert learn_continuations(lists + [['Yes']]) == {}
+
+
+def test_continuations_need_support():
+    lists = [['Solutions that are almost right', 'but not quite']]
+    assert learn_continuations(lists) == {}
+    assert learn_continuations(lists, weights=[2]) == {'but not quite': 'Solutions that are almost right'}
+
+
+def matrix():
+    series = pd.Series(['ChatGPT (OpenAI), Gemini', 'Gemini', None, 'ChatGPT (OpenAI)',
+                        'ChatGPT (OpenAI), Copilot, Gemini', 'Gemini', None, 'Copilot', 'Gemini'],
+                       dtype='string', name='tools')
+    return MultiSelectMatrix.from_series(series)
+
+
+def test_counts_are_per_option():
+    tools = matrix()
+    assert tools.column == 'tools'
+    assert tools.counts().to_dict() == {'Gemini': 5, 'ChatGPT (OpenAI)': 3, 'Copilot': 2}
+    assert tools.respondents() == 7
+    assert tools.indicators().sum(axis=1).tolist() == [2, 1, 0, 1, 3, 1, 0, 1, 1]
+
+
+def test_co_selection_and_segments():
+    tools = matrix()
+    both = tools.co_selection()
+    assert both.loc['ChatGPT (OpenAI)', 'Gemini'] == 2
+    assert both.loc['Copilot', 'Copilot'] == 2
+    first_half = tools.segment(np.arange(9) < 5)
+    assert first_half.counts().to_dict() == {'ChatGPT (OpenAI)': 3, 'Gemini': 3, 'Copilot': 1}
+    assert first_half.respondents() == 4
+
+
+def test_popcount_counts_every_bit():
+    rng = np.random.default_rng(0)
+    mask = rng.random((3, 200)) < 0.3
+    packed = np.stack([pack_mask(row) for row in mask])
+    assert popcount(packed, axis=1).tolist() == mask.sum(axis=1).tolist()
@@ -0,0 +1,130 @@
+"""Quality screening: each flag, the exclude mask and the persisted exclude set"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import entry
+from data_processing import quality_screening
+from data_processing.quality_screening import (DEFAULT_EXCLUDE, flagged_mask, load_quality_flags,
+                                               save_quality_flags, saved_exclude, screen_responses)
+from data_processing.question_catalog import LIKERT, METADATA, SINGLE_CHOICE, TIMESTAMP, QuestionCatalog
+from data_processing.response_matrix import ResponseMatrix
+
+SCALE = ['1', '2', '3', '4', '5']
+ITEMS = [f'Artifact [{i}]' for i in range(12)]
+
+
+CATALOG = QuestionCatalog(
+    [entry('Timestamp', '001', TIMESTAMP), entry('Consent', '002', SINGLE_CHOICE),
+     entry('Scrum', '013', SINGLE_CHOICE)]
+    + [entry(col, f'{34 + i:03d}', LIKERT, block='034-053') for i, col in enumerate(ITEMS)]
+    + [entry('source', None, METADATA)])
+
+YES = 'Yes, I agree'
+WORKED = 'Yes, I currently work in one'
+VARIED = ['1', '3', '5', '2', '4', '4', '3', '1', '2', '5', '3', '4']
+
+
+def respondent(time, consent=YES, scrum=WORKED, answers=VARIED, source='pt'):
+    row = {'Timestamp': pd.Timestamp(time), 'Consent': consent, 'Scrum': scrum, 'source': source}
+    row.update(zip(ITEMS, list(answers) + [None] * (len(ITEMS) - len(answers))))
+    return row
+
+
+ROWS = [
+    respondent('2024-03-01 08:00'),                                                     # 0 fine
+    respondent('2024-03-01 09:00', consent='no, I do NOT agree  (end of survey)',
+               scrum=None, answers=[]),                                                 # 1 declined
+    respondent('2024-03-01 10:00', scrum='No, I have never worked in one'),            # 2 not Scrum
+    respondent('2024-03-01 11:00', answers=['4'] * 12),                                 # 3 straight line
+    respondent('2024-03-01 12:00', source='en'),                                        # 4 same as 0
+    respondent('2024-03-01 13:00', answers=['4'] * 5),                                  # 5 too few items
+    respondent('2024-03-01 13:00:30', answers=VARIED[::-1]),                            # 6 30 s after 5
+]
+
+
+def responses():
+    df = pd.DataFrame(ROWS)
+    for col in ('Consent', 'Scrum', 'source'):
+        df[col] = df[col].astype('string')
+    for col in ITEMS:
+        df[col] = pd.Categorical(df[col], categories=SCALE, ordered=True)
+    return ResponseMatrix.from_frame(df)
+
+
+@pytest.fixture(scope='module')
+def flags():
+    return screen_responses(responses(), CATALOG)
+
+
+def flagged(flags, name):
+    return np.flatnonzero(flags[name].to_numpy()).tolist()
+
+
+def test_declined_consent_is_matched_ignoring_case_and_spacing(flags):
+    assert flagged(flags, 'no_consent') == [1]
+
+
+def test_no_scrum_experience(flags):
+    assert flagged(flags, 'not_scrum') == [2]
+
+
+def test_straight_lining_needs_enough_items(flags):
+    assert flagged(flags, 'straight_lining') == [3]
+    assert flags['likert_items'].tolist() == [12, 0, 12, 12, 12, 5, 12]
+    assert flags['likert_variance'][3] == 0
+    assert flags['likert_variance'][0] > 0
+    assert np.isnan(flags['likert_variance'][1])
+
+
+def test_duplicates_point_at_the_first_submission(flags):
+    # The source does not count: the same answers through another channel are a duplicate
+    assert flagged(flags, 'duplicate') == [4]
+    assert flags['duplicate_of'].tolist() == [-1, -1, -1, -1, 0, -1, -1]
+
+
+def test_rows_sharing_a_hash_are_compared_answer_by_answer(monkeypatch):
+    hashed = quality_screening.answer_hashes
+
+    def colliding(matrix, columns):
+        hashes, answered = hashed(matrix, columns)
+        return np.zeros_like(hashes), answered
+
+    monkeypatch.setattr(quality_screening, 'answer_hashes', colliding)
+    flag, duplicate_of = quality_screening.duplicates(responses())
+    assert np.flatnonzero(flag).tolist() == [4]
+    assert duplicate_of.tolist() == [-1, -1, -1, -1, 0, -1, -1]
+
+
+def test_rapid_repeats_within_a_source(flags):
+    assert flagged(flags, 'rapid_repeat') == [6]
+    assert flags['seconds_since_previous'][6] == 30
+    assert flags['seconds_since_previous'][1] == 3600
+    # First of its source
+    assert np.isnan(flags['seconds_since_previous'][0])
+    assert np.isnan(flags['seconds_since_previous'][4])
+
+
+def test_default_exclude_leaves_rapid_repeats_in(flags):
+    assert np.flatnonzero(flagged_mask(flags)).tolist() == [1, 2, 3, 4]
+    assert np.flatnonzero(flagged_mask(flags, ['rapid_repeat'])).tolist() == [6]
+    assert not flagged_mask(flags, []).any()
+    with pytest.raises(KeyError):
+        flagged_mask(flags, ['speeding'])
+
+
+@pytest.mark.parametrize('exclude', [('rapid_repeat', 'duplicate'), ()])
+def test_exclude_set_is_saved_with_the_flags(tmp_path, flags, exclude):
+    path = str(tmp_path / 'merged.quality.parquet')
+    save_quality_flags(flags.copy(), path, exclude)
+    assert saved_exclude(path) == exclude
+    loaded = load_quality_flags(str(tmp_path / 'merged.xlsx'), path)
+    assert loaded.attrs['exclude'] == exclude
+    assert flagged_mask(loaded).tolist() == flagged_mask(flags, exclude).tolist()
+
+
+def test_flags_without_a_saved_set_use_the_default(tmp_path, flags):
+    path = str(tmp_path / 'plain.parquet')
+    flags.to_parquet(path)
+    assert saved_exclude(path) is None
+    assert load_quality_flags(str(tmp_path / 'merged.xlsx'), path).attrs['exclude'] == DEFAULT_EXCLUDE
@@ -0,0 +1,72 @@
+"""Question catalog: header rules, matrix block codes and the catalog saved next to the dataset"""
+import pandas as pd
+
+from data_processing.question_catalog import (LIKERT, METADATA, MULTI_SELECT, OPEN_TEXT, SINGLE_CHOICE,
+                                              TIMESTAMP, build_question_catalog, catalog_path_for,
+                                              get_question_catalog, parse_column_codes)
+
+ROLE = 'What is your primary role in the Scrum Team?'
+TOOLS = 'Which AI chat assistants do you currently use?'
+LEARN = 'In what ways have you used AI chat assistants to learn about Scrum? [{}]'
+OTHER_AGILE = ('In what ways do you use AI chat assistants to support your work with other agile '
+               'management practices? [Practice {}]')
+
+
+def test_headers_match_rules_by_their_start():
+    catalog = build_question_catalog(['Carimbo de data/hora', 'Timestamp', ROLE, TOOLS,
+                                      'Any thoughts on what is your age group?', 'source'], labels={})
+    assert [catalog.entry(col)['qtype'] for col in catalog.columns()] == [
+        TIMESTAMP, TIMESTAMP, SINGLE_CHOICE, MULTI_SELECT, OPEN_TEXT, METADATA]
+    assert catalog.code(ROLE) == '014'
+    # The age rule matches only a header that starts with it
+    assert catalog.entry('Any thoughts on what is your age group?')['group'] == 'Unmapped'
+    # Both timestamp headers share code 001; the first one is the column of the code
+    assert catalog.column('001') == 'Carimbo de data/hora'
+    assert catalog.column('999', default='none') == 'none'
+
+
+def test_block_items_take_the_codes_of_their_range():
+    items = ['Theory', 'Values', 'Roles', 'Events', 'Artifacts']
+    catalog = build_question_catalog([LEARN.format(item) for item in items], labels={'028-032': 'Learning'})
+    assert [catalog.code(LEARN.format(item)) for item in items] == ['028', '029', '030', '031', '032']
+    entry = catalog.entry(LEARN.format('Roles'))
+    assert (entry['block'], entry['label'], entry['qtype'], entry['scale']) == \
+        ('028-032', 'Roles', LIKERT, 'adoption')
+
+
+def test_block_with_more_items_than_codes_falls_back_to_item_numbers():
+    # 078-090 has 13 codes
+    columns = [OTHER_AGILE.format(i) for i in range(15)]
+    catalog = build_question_catalog(columns, labels={})
+    assert [catalog.code(col) for col in columns] == [f'078.{i:02d}' for i in range(1, 16)]
+    assert catalog.columns(block='078-090') == columns
+
+
+def test_columns_filter_by_metadata():
+    catalog = build_question_catalog(['Timestamp', ROLE, LEARN.format('Theory'), TOOLS, 'source'], labels={})
+    assert catalog.columns(qtype=[MULTI_SELECT, SINGLE_CHOICE]) == [ROLE, TOOLS]
+    assert catalog.columns(scale='adoption') == [LEARN.format('Theory')]
+    assert catalog.columns(group='Demographics') == [ROLE]
+    assert catalog.question_columns() == [ROLE, LEARN.format('Theory'), TOOLS]
+
+
+def test_column_codes_are_read_from_the_markdown_index(tmp_path):
+    path = tmp_path / 'columns.md'
+    path.write_text('# Columns\n014: Primary role\n028-032: Learning\n105: Biggest risk\n105: source\n',
+                    encoding='utf-8')
+    assert parse_column_codes(str(path)) == {'014': 'Primary role', '028-032': 'Learning', '105': 'Biggest risk'}
+    assert parse_column_codes(str(tmp_path / 'missing.md')) == {}
+
+
+def test_saved_catalog_is_reused_while_the_columns_match(tmp_path):
+    data_path = str(tmp_path / 'merged.xlsx')
+    df = pd.DataFrame(columns=['Timestamp', ROLE, 'source'])
+    catalog = get_question_catalog(df, data_path)
+    assert catalog_path_for(data_path) == str(tmp_path / 'merged.catalog.json')
+    assert get_question_catalog(df, data_path).entries == catalog.entries
+
+    # New columns: the catalog is built again and replaces the saved one
+    wider = get_question_catalog(pd.DataFrame(columns=['Timestamp', ROLE, TOOLS, 'source']), data_path)
+    assert wider.code(TOOLS) == '022'
+    assert get_question_catalog(pd.DataFrame(columns=['Timestamp', ROLE, TOOLS, 'source']),
+                                data_path).entries == wider.entries
@@ -0,0 +1,107 @@
+"""Response matrix: round trip, shared codes and counting straight from the mapped codes"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import entry
+from data_processing.bitmap_index import build_bitmap_index
+from data_processing.crosstabs import build_crosstabs
+from data_processing.frequency_store import build_frequency_store
+from data_processing.question_catalog import LIKERT, METADATA, OPEN_TEXT, SINGLE_CHOICE, TIMESTAMP, QuestionCatalog
+from data_processing.response_matrix import (ResponseMatrix, load_response_matrix, matrix_of,
+                                             write_response_matrix)
+
+AGREEMENT = ['Disagree', 'Neutral', 'Agree']
+
+
+def survey(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+
+    def pick(options):
+        return pd.Series(np.array(options, dtype=object)[rng.integers(0, len(options), n)], dtype='string')
+
+    return pd.DataFrame({
+        'Timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 10 ** 6, n), unit='s'),
+        'Primary role': pick(['Scrum Master', 'Developer', 'Product Owner', None]),
+        'agree': pd.Categorical(pd.Series(AGREEMENT + [None])[rng.integers(0, 4, n)],
+                                categories=AGREEMENT, ordered=True),
+        'Comment': pick(['ok', 'meh', None, None, 'great']),
+        'source': pick(['pt', 'en']),
+    })
+
+
+CATALOG = QuestionCatalog([entry('Timestamp', '001', TIMESTAMP), entry('Primary role', '014', SINGLE_CHOICE),
+                           entry('agree', '020', LIKERT), entry('Comment', '120', OPEN_TEXT),
+                           entry('source', None, METADATA)])
+
+
+@pytest.fixture
+def mapped(tmp_path):
+    df = survey()
+    xlsx = str(tmp_path / 'merged.xlsx')
+    write_response_matrix(df, xlsx)
+    return df, xlsx, load_response_matrix(xlsx)
+
+
+def test_round_trip(mapped):
+    df, _, matrix = mapped
+    decoded = matrix.to_frame()
+    for col in df.columns:
+        assert decoded[col].astype(object).where(decoded[col].notna(), None).tolist() == \
+            df[col].astype(object).where(df[col].notna(), None).tolist()
+    assert decoded['agree'].cat.ordered
+
+
+def test_loads_share_one_mapping(mapped):
+    _, xlsx, matrix = mapped
+    assert load_response_matrix(xlsx) is matrix
+
+
+def test_rewritten_matrix_is_mapped_again(mapped):
+    df, xlsx, matrix = mapped
+    write_response_matrix(df.iloc[:50], xlsx)
+    assert load_response_matrix(xlsx).n_rows == 50
+
+
+def test_observed_codes_match_factorize(mapped):
+    df, _, matrix = mapped
+    for col in ('Primary role', 'Comment', 'source'):
+        for sort in (False, True):
+            codes, labels = matrix.observed_codes(col, sort)
+            expected_codes, uniques = pd.factorize(df[col], sort=sort)
+            assert codes.tolist() == expected_codes.tolist()
+            assert labels == [str(value) for value in uniques]
+
+
+def test_scale_columns_are_views_of_the_mapped_codes(mapped):
+    _, xlsx, matrix = mapped
+    decoded = matrix.to_frame()
+    assert np.shares_memory(decoded['agree'].array.codes, matrix.codes('agree'))
+    assert matrix_of(decoded, xlsx) is matrix
+
+
+def test_other_frames_are_not_taken_for_the_matrix(mapped):
+    df, xlsx, matrix = mapped
+    decoded = matrix.to_frame()
+    assert matrix_of(df, xlsx) is None
+    assert matrix_of(decoded.copy(), xlsx) is None
+    assert matrix_of(decoded.iloc[:10], xlsx) is None
+    assert matrix_of(decoded[decoded.columns[::-1]], xlsx) is None
+
+
+def test_counts_from_the_codes_equal_counts_from_the_frame(mapped):
+    _, _, matrix = mapped
+    decoded = matrix.to_frame()
+    assert build_frequency_store(decoded, matrix) == build_frequency_store(decoded)
+    assert build_crosstabs(decoded, CATALOG, responses=matrix) == build_crosstabs(decoded, CATALOG)
+    from_codes = build_bitmap_index(decoded, CATALOG, matrix)
+    from_frame = build_bitmap_index(decoded, CATALOG)
+    assert np.array_equal(from_codes.bits, from_frame.bits)
+    assert from_codes.entries == from_frame.entries
+    assert {col: codes.tolist() for col, codes in from_codes.codes.items()} == \
+        {col: codes.tolist() for col, codes in from_frame.codes.items()}
+
+
+def test_unencodable_column_is_rejected():
+    with pytest.raises(TypeError):
+        ResponseMatrix.from_frame(pd.DataFrame({'mixed': pd.Series([1, 'a'], dtype=object)}))
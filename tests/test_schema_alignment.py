@@ -0,0 +1,62 @@
+"""Schema alignment: export discovery and mapping every export's headers onto one column per question"""
+import json
+
+from data_processing.schema_alignment import (FUZZY_CUTOFF, align_headers, discover_sources, load_header_map,
+                                              save_alignment)
+
+ROLE = 'What is your primary role in the Scrum Team?'
+COMMENT = 'Anything you would like to tell the research team'
+
+
+def test_original_exports_come_first(tmp_path):
+    for name in ['zeta.xlsx', 'Exploring the Use of AI Chat Assistants in Scrum - Udemy (Responses).xlsx',
+                 'alpha.xlsx', 'Exploring the Use of AI Chat Assistants in Scrum (respostas).xlsx',
+                 '~$alpha.xlsx', 'notes.txt']:
+        (tmp_path / name).write_bytes(b'')
+    assert [label for _, label in discover_sources(str(tmp_path))] == [
+        'Survey 1 (respostas)', 'Survey 2 (Udemy)', 'alpha', 'zeta']
+
+
+def test_same_text_or_same_code_joins_a_column():
+    columns, renames, unmatched = align_headers({
+        'pt': ['Carimbo de data/hora', ROLE, 'source'],
+        # Other spacing and case, and a code from the header map
+        'en': ['Timestamp', '  what is your PRIMARY role in the scrum team?', 'Função principal', 'source'],
+    }, header_map={'função principal': '014'})
+    assert columns == ['Carimbo de data/hora', ROLE, 'source', 'Timestamp', 'Função principal']
+    assert renames['en']['  what is your PRIMARY role in the scrum team?'] == ROLE
+    # A second header with the code of a column this export already filled stays apart
+    assert renames['en']['Função principal'] == 'Função principal'
+    assert unmatched == {'pt': [], 'en': []}
+
+
+def test_header_map_codes_join_columns():
+    columns, renames, _ = align_headers({'pt': [ROLE], 'es': ['¿Cuál es tu rol principal?']},
+                                        header_map={'¿cuál es tu rol principal?': '014'})
+    assert columns == [ROLE]
+    assert renames['es'] == {'¿Cuál es tu rol principal?': ROLE}
+
+
+def test_uncoded_headers_join_only_close_enough_columns():
+    close = COMMENT + 's'
+    far = 'Anything else for the team'
+    columns, renames, unmatched = align_headers({'a': [COMMENT], 'b': [close], 'c': [far]})
+    assert renames['b'][close] == COMMENT
+    assert renames['c'][far] == far
+    assert unmatched == {'a': [COMMENT], 'b': [], 'c': [far]}
+    assert columns == [COMMENT, far]
+    # A stricter cutoff keeps the near match apart too
+    columns, _, _ = align_headers({'a': [COMMENT], 'b': [close]}, cutoff=0.999)
+    assert columns == [COMMENT, close]
+    assert FUZZY_CUTOFF < 0.999
+
+
+def test_header_map_and_alignment_report(tmp_path):
+    (tmp_path / 'header_map.json').write_text(json.dumps({'  Função   Principal ': '014'}), encoding='utf-8')
+    assert load_header_map(str(tmp_path)) == {'função principal': '014'}
+    assert load_header_map(str(tmp_path / 'elsewhere')) == {}
+
+    path = save_alignment({'en': {'Timestamp': 'Timestamp', 'Role?': ROLE}}, {'en': ['Other']},
+                          str(tmp_path / 'alignment.json'))
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'en': {'renamed': {'Role?': ROLE}, 'unmatched': ['Other']}}
@@ -0,0 +1,58 @@
+"""Stats service: the size-bounded LRU cache of encoded responses"""
+from data_processing.stats_service import LRUCache
+
+
+def test_hit_and_miss_are_counted():
+    cache = LRUCache(max_bytes=100)
+    assert cache.get('a') is None
+    cache.put('a', b'x' * 10)
+    assert cache.get('a') == b'x' * 10
+    assert cache.stats() == {'entries': 1, 'bytes': 10, 'max_bytes': 100, 'hits': 1, 'misses': 1,
+                             'evictions': 0, 'hit_rate': 0.5}
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = LRUCache(max_bytes=30)
+    for key in 'abc':
+        cache.put(key, b'x' * 10)
+    cache.get('a')
+    cache.put('d', b'x' * 10)
+    assert list(cache.entries) == ['c', 'a', 'd']
+    assert cache.bytes == 30
+    assert cache.evictions == 1
+
+
+def test_large_entry_evicts_as_many_as_needed():
+    cache = LRUCache(max_bytes=30)
+    for key in 'abc':
+        cache.put(key, b'x' * 10)
+    cache.put('big', b'x' * 25)
+    assert list(cache.entries) == ['big']
+    assert cache.bytes == 25
+    assert cache.evictions == 3
+
+
+def test_entry_larger_than_the_cache_is_not_stored():
+    cache = LRUCache(max_bytes=10)
+    cache.put('a', b'x' * 5)
+    cache.put('huge', b'x' * 11)
+    assert list(cache.entries) == ['a']
+    assert cache.bytes == 5
+
+
+def test_replacing_a_key_updates_the_size():
+    cache = LRUCache(max_bytes=100)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+    cache.put('a', b'x' * 40)
+    assert list(cache.entries) == ['b', 'a']
+    assert cache.bytes == 50
+
+
+def test_clear_empties_the_cache():
+    cache = LRUCache(max_bytes=100)
+    cache.put('a', b'x' * 10)
+    cache.clear()
+    assert cache.get('a') is None
+    assert cache.bytes == 0
+    assert cache.stats()['hit_rate'] == 0.0
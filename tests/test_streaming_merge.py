@@ -0,0 +1,22 @@
+"""Streaming merge: chunk by chunk it writes the same dataset as the in-memory merge"""
+import pandas as pd
+
+from conftest import EN_EXPORT, PT_EXPORT, raw_export
+from data_processing.merge_datasets import merge_survey_data, merge_survey_data_streaming
+
+
+def test_streaming_merge_matches_the_full_merge(workdir):
+    raw_export('Carimbo de data/hora', 11, 0).to_excel(f'data/raw/{PT_EXPORT}', index=False)
+    raw_export('Timestamp', 7, 1).to_excel(f'data/raw/{EN_EXPORT}', index=False)
+    merged = merge_survey_data()
+    full = pd.read_parquet('data/processed/merged_survey_data.parquet')
+
+    stats = merge_survey_data_streaming(chunk_size=3, output_path='data/processed/streamed.xlsx')
+    streamed = pd.read_parquet('data/processed/streamed.parquet')
+
+    assert stats['rows'] == len(merged) == 18
+    assert stats['rows_by_source'] == {'Survey 1 (respostas)': 11, 'Survey 2 (Udemy)': 7}
+    pd.testing.assert_frame_equal(streamed, full)
+    # The workbooks hold the same cells too
+    pd.testing.assert_frame_equal(pd.read_excel('data/processed/streamed.xlsx'),
+                                  pd.read_excel('data/processed/merged_survey_data.xlsx'))
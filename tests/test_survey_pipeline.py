@@ -0,0 +1,118 @@
+"""Pipeline runner: what is stale and why, and stages running in dependency order"""
+import os
+
+import pytest
+
+import survey_pipeline
+from survey_pipeline import Stage, execute, file_digest, input_digests, plan, select_stages, stale_reason
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(survey_pipeline, 'ROOT', tmp_path)
+    monkeypatch.setattr(survey_pipeline, 'save_state', lambda state, path=None: None)
+    (tmp_path / 'raw.xlsx').write_text('answers')
+    (tmp_path / 'code.py').write_text('print(1)')
+    return tmp_path
+
+
+def stages():
+    return [
+        Stage('merge', None, inputs=['raw.xlsx', 'code.py'], outputs=['merged.xlsx'], deps=[]),
+        Stage('report', None, inputs=['merged.xlsx'], outputs=['report.md'], deps=['merge']),
+    ]
+
+
+def empty_state():
+    return {'files': {}, 'stages': {}}
+
+
+def ran(stage, state):
+    """Record a successful run the way ``execute`` does"""
+    for path in stage.outputs:
+        (survey_pipeline.ROOT / path).write_text(stage.name)
+    state['stages'][stage.name] = {'inputs': input_digests(stage, state), 'seconds': 0.1}
+
+
+def reasons(state, **options):
+    return [reason for _, reason in plan(stages(), state, **options)]
+
+
+def test_nothing_rebuilds_once_every_stage_ran(root):
+    state = empty_state()
+    assert reasons(state) == ['missing output merged.xlsx', 'upstream merge rebuilds']
+    for stage in stages():
+        ran(stage, state)
+    assert reasons(state) == [None, None]
+    assert reasons(state, force=True) == ['forced', 'forced']
+
+
+def test_changed_input_rebuilds_the_stage_and_what_depends_on_it(root):
+    state = empty_state()
+    for stage in stages():
+        ran(stage, state)
+    (root / 'code.py').write_text('print(2)')
+    assert reasons(state) == ['input changed: code.py', 'upstream merge rebuilds']
+
+
+def test_touched_but_unchanged_input_is_up_to_date(root):
+    state = empty_state()
+    for stage in stages():
+        ran(stage, state)
+    (root / 'raw.xlsx').write_text('answers')
+    os.utime(root / 'raw.xlsx', (1, 1))
+    assert reasons(state) == [None, None]
+
+
+def test_missing_output_rebuilds(root):
+    state = empty_state()
+    for stage in stages():
+        ran(stage, state)
+    os.remove(root / 'report.md')
+    assert reasons(state) == [None, 'missing output report.md']
+    assert stale_reason(stages()[0]._replace(name='new'), state, set()) == 'never run'
+
+
+def test_optional_input_counts_once_it_appears(root):
+    state = empty_state()
+    merge = stages()[0]._replace(inputs=['raw.xlsx', 'header_map.json'])
+    ran(merge, state)
+    assert stale_reason(merge, state, set()) is None
+    (root / 'header_map.json').write_text('{}')
+    assert stale_reason(merge, state, set()) == 'input changed: header_map.json'
+
+
+def test_digest_is_reused_while_size_and_mtime_match(root):
+    state = empty_state()
+    digest = file_digest('raw.xlsx', state)
+    state['files']['raw.xlsx']['sha256'] = 'cached'
+    assert file_digest('raw.xlsx', state) == 'cached'
+    os.utime(root / 'raw.xlsx', (1, 1))
+    assert file_digest('raw.xlsx', state) == digest
+    assert file_digest('absent.xlsx', state) is None
+
+
+def test_targets_bring_their_dependencies():
+    names = [stage.name for stage in select_stages(['summary'])]
+    assert names[:2] == ['merge', 'caches']
+    assert {'frequency_tables', 'plots', 'summary'} <= set(names)
+    assert 'report' not in names
+    assert len(select_stages(None)) == len(survey_pipeline.STAGES)
+
+
+def test_stages_run_after_their_dependencies(root, monkeypatch):
+    order = []
+
+    def run_stage(stage, options=None):
+        order.append(stage.name)
+        if stage.name == 'broken':
+            raise RuntimeError('stage broken failed')
+        return 0.0
+
+    monkeypatch.setattr(survey_pipeline, 'run_stage', run_stage)
+    graph = stages() + [Stage('broken', None, [], [], deps=['merge']),
+                        Stage('after_broken', None, [], [], deps=['broken'])]
+    state = empty_state()
+    assert not execute([(stage, 'never run') for stage in graph], state, jobs=2)
+    assert order[0] == 'merge' and set(order) == {'merge', 'report', 'broken'}
+    assert set(state['stages']) == {'merge', 'report'}
@@ -0,0 +1,71 @@
+"""Synthetic exports: seeded, shaped like the export they model and free of identifying words"""
+import numpy as np
+import pandas as pd
+
+from conftest import ROLE, raw_export
+from data_processing.multi_select import split_selections
+from data_processing.synthetic_data import (fit_source_model, generate_chunk, generate_raw_exports,
+                                            split_rows)
+
+TOOLS = 'Which AI chat assistants do you currently use?'
+COMMENTS = 'Please add any further comments'
+
+
+def export(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    df = raw_export('Timestamp', n, seed)
+    df[TOOLS] = rng.choice(['ChatGPT (OpenAI)', 'ChatGPT (OpenAI), Gemini', 'Copilot, Gemini', None], n)
+    df[COMMENTS] = rng.choice(['great for refinement', 'mail me at someone@example.com', 'see www.example.com',
+                               'used it 3 times', None], n)
+    return df
+
+
+def test_rows_are_split_by_share():
+    assert split_rows(100, [3, 1]) == [75, 25]
+    # The largest source takes the remainder
+    assert split_rows(10, [1, 1, 2]) == [2, 2, 6]
+    assert sum(split_rows(1001, [215, 116])) == 1001
+
+
+def test_same_seed_same_responses():
+    model = fit_source_model(export())
+    first = generate_chunk(model, 200, np.random.default_rng(7))
+    pd.testing.assert_frame_equal(first, generate_chunk(model, 200, np.random.default_rng(7)))
+    assert not first.equals(generate_chunk(model, 200, np.random.default_rng(8)))
+
+
+def test_generated_answers_look_like_the_export():
+    df = export()
+    chunk = generate_chunk(fit_source_model(df), 500, np.random.default_rng(0), window=(0.5, 1.0))
+    assert list(chunk.columns) == list(df.columns)
+    assert set(chunk[ROLE].dropna()) <= set(df[ROLE])
+    stamps = chunk['Timestamp']
+    assert stamps.is_monotonic_increasing
+    assert stamps.min() >= df['Timestamp'].min() + (df['Timestamp'].max() - df['Timestamp'].min()) / 2 \
+        - pd.Timedelta('1ms')
+    # Every respondent who answered a multi-select question picked known options
+    options = {'ChatGPT (OpenAI)', 'Gemini', 'Copilot'}
+    for answer in chunk[TOOLS].dropna():
+        assert split_selections(answer) and set(split_selections(answer)) <= options
+
+
+def test_text_never_reuses_identifying_words():
+    words = {word for text in generate_chunk(fit_source_model(export()), 500,
+                                             np.random.default_rng(0))[COMMENTS].dropna()
+             for word in text.split()}
+    assert words and words <= {'great', 'for', 'refinement', 'mail', 'me', 'at', 'see', 'used', 'it', 'times'}
+
+
+def test_raw_exports_are_reproducible(tmp_path):
+    sources = []
+    for i, (name, source) in enumerate([('pt.xlsx', 'Survey 1'), ('en.xlsx', 'Survey 2')]):
+        path = str(tmp_path / name)
+        export(30 if i == 0 else 10, seed=i).to_excel(path, index=False)
+        sources.append((path, source))
+
+    first = generate_raw_exports(40, str(tmp_path / 'a'), seed=1, sources=sources)
+    second = generate_raw_exports(40, str(tmp_path / 'b'), seed=1, sources=sources)
+    assert list(first.values()) == [30, 10]
+    for a, b in zip(first, second):
+        pd.testing.assert_frame_equal(pd.read_excel(a), pd.read_excel(b))
+    assert list(pd.read_excel(next(iter(first))).columns) == list(export().columns)
@@ -0,0 +1,73 @@
+"""Text analytics: PT/EN tokenization, hashed term counts per segment and near-duplicate groups"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processing.text_analytics import (TextAnalyzer, connected_labels, extract_terms, fold,
+                                            normalize_answer, term_bucket, tokenize)
+
+
+def test_tokenize_drops_the_stopwords_of_the_answers_language():
+    assert tokenize('The estimates are faster with ChatGPT 4o') == ('en', ['estimates', 'faster', 'chatgpt', '4o'])
+    assert tokenize('Ajuda muito nas métricas da sprint, e não 2 vezes') == \
+        ('pt', ['ajuda', 'métricas', 'sprint', 'vezes'])
+
+
+def test_accents_and_punctuation_are_folded():
+    assert fold('Métricas') == 'metricas'
+    assert normalize_answer('  GPT-5, really!') == normalize_answer('gpt 5 really') == 'gpt 5 really'
+    assert term_bucket('métricas') == term_bucket('Metricas')
+
+
+def test_terms_are_words_and_adjacent_pairs():
+    assert extract_terms(['sprint', 'review', 'notes']) == {
+        'sprint', 'review', 'notes', 'sprint review', 'review notes'}
+
+
+def test_connected_labels_follow_chains():
+    assert connected_labels(6, np.array([4, 1, 2]), np.array([5, 2, 3])).tolist() == [0, 1, 1, 1, 4, 4]
+
+
+def answers():
+    return pd.DataFrame({
+        'q': pd.Series(['Writing user stories faster', 'writing user stories faster!', 'Writing user stories faster.',
+                        'Refinement of the backlog', None, 'Ajuda a escrever histórias de usuário',
+                        'Writing user stories quickly'], dtype='string'),
+        'role': pd.Series(['Dev', 'Dev', 'PO', 'PO', 'Dev', None, 'SM'], dtype='string'),
+    })
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = TextAnalyzer(['q'], segments=[('Role', 'role')])
+    df = answers()
+    # Streamed in batches, like the dataset
+    analyzer.update(df.iloc[:3])
+    analyzer.update(df.iloc[3:])
+    return analyzer
+
+
+def test_term_counts_are_answers_containing_the_term(analyzer):
+    top = dict(analyzer.top_terms('q', n=50))
+    assert top['writing'] == 4
+    assert top['user stories'] == 4
+    assert top['stories faster'] == 3
+    assert 'the' not in top
+    assert analyzer.state['q'].answers == 6
+    assert analyzer.state['q'].languages == {'en': 5, 'pt': 1}
+
+
+def test_terms_by_segment(analyzer):
+    by_role = analyzer.top_terms_by_segment('q', 'Role', n=50)
+    assert set(by_role) == {'Dev', 'PO', 'SM', 'Missing'}
+    assert dict(by_role['Dev'])['writing'] == 2
+    assert dict(by_role['PO'])['refinement'] == 1
+
+
+def test_same_answer_in_other_wording_is_grouped(analyzer):
+    groups = analyzer.near_duplicate_groups('q')
+    assert groups[0]['respondents'] >= 3
+    assert groups[0]['example'] == 'Writing user stories faster'
+    assert all(group['respondents'] >= 2 for group in groups)
+    # The streamed batches share the distinct answers
+    assert analyzer.state['q'].respondents[0] == 3